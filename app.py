@@ -1,15 +1,30 @@
 # app.py
+import atexit
+import json
 import os
+import threading
+from datetime import datetime, timezone
 from functools import wraps
-from time import time
+from time import time, sleep
 from flask import (
     Flask, render_template, request, redirect, url_for,
-    session, Response, jsonify, flash
+    session, Response, jsonify, flash, send_file
 )
-from camera import VideoCamera, mjpeg_generator, latest_counts
+from async_server import AsyncStreamServer
+from camera import mjpeg_generator, JPEG_TIERS
+from metrics import REGISTRY
+from model_registry import MODELS
+from batching import BatchInferenceService
+from detection_cache import DetectionCache
+from export import (
+    FORMATS as EXPORT_FORMATS, iter_export, gzip_stream, parse_cursor, plan_export
+)
+from recorder import ClipRecorder
+from streams import StreamManager, DEFAULT_STREAM_ID
 from db import (
-    init_db, close_db,
-    log_detection, get_recent_detections,
+    init_db, close_db, get_db_path, pool_stats, DetectionWriter,
+    get_recent_detections, query_history, parse_bucket, auto_bucket,
+    query_clips, get_clip, read_pool, get_read_db, export_coverage,
     verify_user, get_all_users, create_user,
     get_user_by_id, update_user, delete_user
 )
@@ -17,18 +32,143 @@ from db import (
 from sqlite3 import OperationalError
 
 
-def create_app():
+def _env_days(name, default):
+    """Gün sayısı ortam değişkeni; "none" / boş değer süresiz demektir."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    if value.strip().lower() in ("", "none"):
+        return None
+    return float(value)
+
+
+def create_app(start_async=True):
     app = Flask(__name__, instance_relative_config=True)
     app.config["SECRET_KEY"] = "dev-secret-key"
-
-    # Başlangıçta kamera yok, dashboard'dan seçilecek
-    app.camera = None
+    # YOLO batch ayarları: throughput / gecikme dengesi
+    app.config["YOLO_BATCH_SIZE"] = int(os.environ.get("YOLO_BATCH_SIZE", 8))
+    app.config["YOLO_BATCH_WAIT_MS"] = float(os.environ.get("YOLO_BATCH_WAIT_MS", 20))
+    # İstemci başına üst kare hızı sınırı (/video_feed?fps=...)
+    app.config["STREAM_MAX_FPS"] = float(os.environ.get("STREAM_MAX_FPS", 25))
+    # SSE: değişiklik yokken heartbeat aralığı, ardışık olaylar arası en kısa süre
+    app.config["SSE_HEARTBEAT_SEC"] = 15.0
+    app.config["SSE_MIN_INTERVAL_SEC"] = 0.04
+    # YOLO normalde ilk araç tespitinde yüklenir; 1 ise açılışta arka planda
+    app.config["MODEL_PRELOAD_YOLO"] = os.environ.get("MODEL_PRELOAD_YOLO", "0") == "1"
+    # Döngüdeki video dosyaları için tespit sonucu önbelleği (1 ise diske de yazılır)
+    app.config["DETECTION_CACHE_SIZE"] = int(os.environ.get("DETECTION_CACHE_SIZE", 200000))
+    app.config["DETECTION_CACHE_PERSIST"] = os.environ.get("DETECTION_CACHE_PERSIST", "0") == "1"
+    # "thread": tespit web sürecindeki havuzda; "process": stream başına worker süreci
+    app.config["DETECTION_MODE"] = os.environ.get("DETECTION_MODE", "thread")
+    # Kalıcı SQLite bağlantı havuzu (0: her istekte yeni bağlantı) ve PRAGMA'lar
+    app.config["DB_POOL_SIZE"] = int(os.environ.get("DB_POOL_SIZE", 8))
+    app.config["DB_CACHE_KB"] = int(os.environ.get("DB_CACHE_KB", 8192))
+    app.config["DB_MMAP_MB"] = int(os.environ.get("DB_MMAP_MB", 64))
+    app.config["DB_BUSY_TIMEOUT_MS"] = 5000
+    # Alarm eşikleri: dashboard alarmı ve klip kaydı tetikleri
+    app.config["ALARM_THRESHOLDS"] = {"person": 5, "vehicle": 10}
+    # Alarm klipleri: pre-roll tamponu (kodlanmamış kareler, CLIP_BUFFER_MB tüm
+    # stream'lerin toplamı; JPEG kodlama sadece tetikte) + post-roll,
+    # disk yazımı saniyede CLIP_WRITE_MBPS MB ile sınırlı
+    app.config["CLIP_RECORDING"] = os.environ.get("CLIP_RECORDING", "1") == "1"
+    app.config["CLIP_PRE_ROLL_SEC"] = float(os.environ.get("CLIP_PRE_ROLL_SEC", 5))
+    app.config["CLIP_POST_ROLL_SEC"] = float(os.environ.get("CLIP_POST_ROLL_SEC", 5))
+    app.config["CLIP_FPS"] = float(os.environ.get("CLIP_FPS", 10))
+    app.config["CLIP_TIER"] = os.environ.get("CLIP_TIER", "480p")
+    app.config["CLIP_BUFFER_MB"] = float(os.environ.get("CLIP_BUFFER_MB", 128))
+    app.config["CLIP_COOLDOWN_SEC"] = float(os.environ.get("CLIP_COOLDOWN_SEC", 30))
+    app.config["CLIP_WRITE_MBPS"] = float(os.environ.get("CLIP_WRITE_MBPS", 8))
+    # Geçmiş saklama süresi (gün; "none" = süresiz). Ham satırları silinen
+    # dönem dışa aktarımda dakika / saat / gün özetlerinden gelir
+    app.config["DETECTION_RETENTION_DAYS"] = {
+        layer: _env_days(f"RETENTION_{layer.upper()}_DAYS", days)
+        for layer, days in DetectionWriter.DEFAULT_RETENTION.items()
+    }
+    # /api/export: SQLite'tan chunk başına okunan satır
+    app.config["EXPORT_CHUNK_ROWS"] = int(os.environ.get("EXPORT_CHUNK_ROWS", 5000))
+    # 0 değilse /video_feed, /api/stats, /api/events ve /api/detections bu portta
+    # asyncio ile de sunulur
+    app.config["ASYNC_STREAM_PORT"] = int(os.environ.get("ASYNC_STREAM_PORT", 0))
+
+    # İstek / context sonunda bağlantılar havuza döner
+    app.teardown_appcontext(close_db)
 
     # DB init
     with app.app_context():
         init_db()
 
-    app.teardown_appcontext(close_db)
+    # Modeller süreç genelinde bir kez yüklenir; ısınma istekleri bekletmez
+    threading.Thread(
+        target=MODELS.warmup,
+        kwargs={"yolo": app.config["MODEL_PRELOAD_YOLO"]},
+        name="model-warmup",
+        daemon=True,
+    ).start()
+
+    # Tespit geçmişi istek akışından bağımsız, arka planda toplu yazılır
+    app.detection_writer = DetectionWriter(
+        get_db_path(app), retention=app.config["DETECTION_RETENTION_DAYS"]
+    )
+    app.detection_writer.start()
+
+    app.detection_cache = DetectionCache(
+        capacity=app.config["DETECTION_CACHE_SIZE"],
+        path=(
+            os.path.join(app.instance_path, "detection_cache.db")
+            if app.config["DETECTION_CACHE_PERSIST"] else None
+        ),
+    )
+
+    app.clip_recorder = None
+    if app.config["CLIP_RECORDING"]:
+        app.clip_recorder = ClipRecorder(
+            clip_dir=os.path.join(app.instance_path, "clips"),
+            db_path=get_db_path(app),
+            triggers=app.config["ALARM_THRESHOLDS"],
+            pre_roll=app.config["CLIP_PRE_ROLL_SEC"],
+            post_roll=app.config["CLIP_POST_ROLL_SEC"],
+            fps=app.config["CLIP_FPS"],
+            tier=app.config["CLIP_TIER"],
+            buffer_bytes=int(app.config["CLIP_BUFFER_MB"] * 1024 * 1024),
+            cooldown=app.config["CLIP_COOLDOWN_SEC"],
+            write_rate=int(app.config["CLIP_WRITE_MBPS"] * 1024 * 1024),
+        )
+        app.clip_recorder.start()
+
+    # Başlangıçta stream yok, dashboard / API'den eklenecek
+    app.streams = StreamManager(
+        batcher=BatchInferenceService(
+            max_batch=app.config["YOLO_BATCH_SIZE"],
+            max_wait_ms=app.config["YOLO_BATCH_WAIT_MS"],
+        ),
+        writer=app.detection_writer,
+        cache=app.detection_cache,
+        process_workers=app.config["DETECTION_MODE"] == "process",
+        recorder=app.clip_recorder,
+    )
+
+    # ASYNC_STREAM_PORT verilirse (python app.py ya da WSGI sunucusu) başlatılır;
+    # start_async=False sadece debug reloader'ın üst süreci için (bkz. aşağı)
+    app.async_server = None
+    if app.config["ASYNC_STREAM_PORT"] and start_async:
+        server = AsyncStreamServer(app, port=app.config["ASYNC_STREAM_PORT"])
+        try:
+            server.start()
+            app.async_server = server
+        except OSError as e:
+            print("AsyncStreamServer error:", e)
+
+    def _shutdown():
+        # Önce üreticiler (stream'ler), sonra bekleyen kayıtların yazımı
+        if app.async_server is not None:
+            app.async_server.stop()
+        app.streams.stop_all()
+        if app.clip_recorder is not None:
+            app.clip_recorder.stop()
+        app.detection_writer.stop()
+        app.detection_cache.close()
+
+    atexit.register(_shutdown)
 
     # ---------- Decorator'lar ----------
 
@@ -83,124 +223,376 @@ def create_app():
     def dashboard():
         stream_error = session.pop("stream_error", None)
         camera_config = session.get("camera_config", {
+            "stream_id": DEFAULT_STREAM_ID,
             "source_type": "video",
             "video_path": "people.mp4",
             "camera_index": 0,
             "detect_people": True,
             "detect_vehicles": False,
+            "detect_interval": 1,
+            "motion_gate": False,
+            "motion_regions": False,
+            "hog_tiles": 1,
+            "target_fps": 0,
         })
         return render_template(
             "dashboard.html",
             stream_error=stream_error,
             camera_config=camera_config,
+            stream_ids=app.streams.ids(),
+            jpeg_tiers=list(JPEG_TIERS),
+            stream_port=app.config["ASYNC_STREAM_PORT"] if app.async_server else 0,
         )
 
     @app.route("/configure_stream", methods=["POST"])
     @login_required
     def configure_stream():
-        source_type = request.form.get("source_type", "video")
-        video_path = request.form.get("video_path", "").strip() or "people.mp4"
-        camera_index_raw = request.form.get("camera_index", "0")
-        detect_people = request.form.get("detect_people") == "on"
-        detect_vehicles = request.form.get("detect_vehicles") == "on"
+        stream_id = request.form.get("stream_id", "").strip() or DEFAULT_STREAM_ID
+        form_config = {
+            "source_type": request.form.get("source_type", "video"),
+            "video_path": request.form.get("video_path", "").strip() or "people.mp4",
+            "camera_index": request.form.get("camera_index", "0"),
+            "detect_people": request.form.get("detect_people") == "on",
+            "detect_vehicles": request.form.get("detect_vehicles") == "on",
+            "detect_interval": request.form.get("detect_interval", "1"),
+            "motion_gate": request.form.get("motion_gate") == "on",
+            "motion_regions": request.form.get("motion_regions") == "on",
+            "hog_tiles": request.form.get("hog_tiles", "1"),
+            "target_fps": request.form.get("target_fps", "0"),
+        }
+        # Bölgeler ve öncelik formda yok; API ile tanımlananlar korunur
+        existing = app.streams.get_config(stream_id)
+        if existing is not None:
+            form_config["zones"] = existing["zones"]
+            form_config["priority"] = existing["priority"]
 
         try:
-            if source_type == "camera":
-                camera_index = int(camera_index_raw)
-                camera = VideoCamera(source=camera_index)
-            else:
-                camera = VideoCamera(source=video_path)
-
-            camera.detect_people = detect_people
-            camera.detect_vehicles = detect_vehicles
-
-            if hasattr(app, "camera") and app.camera is not None:
-                del app.camera
-
-            app.camera = camera
+            app.streams.add(stream_id, form_config)
             session["stream_error"] = None
         except Exception as e:
             session["stream_error"] = f"Video / kamera açılamadı: {e}"
-            app.camera = None
-
-        session["camera_config"] = {
-            "source_type": source_type,
-            "video_path": video_path,
-            "camera_index": camera_index_raw,
-            "detect_people": detect_people,
-            "detect_vehicles": detect_vehicles,
-        }
+            try:
+                app.streams.remove(stream_id)
+            except KeyError:
+                pass
+
+        session["camera_config"] = dict(form_config, stream_id=stream_id)
 
         return redirect(url_for("dashboard"))
 
-    @app.route("/video_feed")
+    @app.route("/video_feed", defaults={"stream_id": DEFAULT_STREAM_ID})
+    @app.route("/video_feed/<stream_id>")
     @login_required
-    def video_feed():
-        if app.camera is None:
+    def video_feed(stream_id):
+        camera = app.streams.get(stream_id)
+        if camera is None:
             return Response(
                 "Stream yok. Lütfen önce bir kaynak seçin.",
                 mimetype="text/plain",
                 status=503,
             )
+
+        tier = request.args.get("tier", "full")
+        if tier not in JPEG_TIERS:
+            return Response(
+                f"Geçersiz katman. Seçenekler: {', '.join(JPEG_TIERS)}",
+                mimetype="text/plain",
+                status=400,
+            )
+        max_fps = app.config["STREAM_MAX_FPS"]
+        try:
+            requested_fps = float(request.args.get("fps", max_fps))
+        except ValueError:
+            requested_fps = max_fps
+        if requested_fps > 0:
+            max_fps = min(requested_fps, max_fps)
+        # annotate=0: kutusuz kare; kutular /api/detections ile istemcide çizilir
+        annotate = request.args.get("annotate", "1") != "0"
+
         return Response(
-            mjpeg_generator(app.camera),
+            mjpeg_generator(camera, tier=tier, max_fps=max_fps, annotate=annotate),
             mimetype="multipart/x-mixed-replace; boundary=frame",
         )
 
-    _last_log_ts = {"value": 0.0}
+    def _stats_payload(stream_id, camera):
+        if camera is None:
+            return {
+                "stream_id": stream_id,
+                "person_count": 0,
+                "vehicle_count": 0,
+                "alarm": "Video / kamera kaynağı aktif değil.",
+            }
+
+        stats = camera.stats()
+        person_count = stats["person"]
+        vehicle_count = stats["vehicle"]
+
+        thresholds = app.config["ALARM_THRESHOLDS"]
+        alarm_msgs = []
+        if person_count >= thresholds["person"]:
+            alarm_msgs.append(f"Kişi sayısı {thresholds['person']} ve üzerinde!")
+        if vehicle_count >= thresholds["vehicle"]:
+            alarm_msgs.append(f"Araç sayısı {thresholds['vehicle']} ve üzerinde!")
+        alarm = " | ".join(alarm_msgs) if alarm_msgs else None
+
+        return {
+            "stream_id": stream_id,
+            "person_count": person_count,
+            "vehicle_count": vehicle_count,
+            "alarm": alarm,
+            "shed_frames": stats["shed_frames"],
+            "zones": stats["zones"],
+            "quality": stats.get("quality"),
+        }
+
+    # asyncio sunucusu da aynı yanıtı üretir
+    app.stats_payload = _stats_payload
 
-    @app.route("/api/stats")
+    @app.route("/api/stats", defaults={"stream_id": DEFAULT_STREAM_ID})
+    @app.route("/api/stats/<stream_id>")
     @login_required
-    def api_stats():
-        if app.camera is None:
-            return jsonify(
-                {
-                    "person_count": 0,
-                    "vehicle_count": 0,
-                    "alarm": "Video / kamera kaynağı aktif değil.",
-                }
-            )
+    def api_stats(stream_id):
+        camera = app.streams.get(stream_id)
+        return jsonify(_stats_payload(stream_id, camera))
 
-        from camera import latest_counts
+    @app.route("/api/events", defaults={"stream_id": DEFAULT_STREAM_ID})
+    @app.route("/api/events/<stream_id>")
+    @login_required
+    def api_events(stream_id):
+        """
+        Server-Sent Events: sayaç / alarm değiştiğinde anında gönderilir.
+        Ara değişiklikler birleştirilir (her zaman en güncel durum gider),
+        değişiklik yoksa sadece heartbeat yorumu yollanır.
+        """
+        heartbeat = app.config["SSE_HEARTBEAT_SEC"]
+        min_interval = app.config["SSE_MIN_INTERVAL_SEC"]
+
+        def generate():
+            yield "retry: 3000\n\n"
+            last_payload = None
+            last_version = None
+            last_camera = None
+            last_sent = time()
+            while True:
+                camera = app.streams.get(stream_id)
+                if camera is not last_camera:
+                    # Stream eklendi / değişti: sürüm takibini sıfırla
+                    last_camera = camera
+                    last_version = None
+                elif camera is None:
+                    sleep(1.0)
+                else:
+                    last_version = camera.wait_stats(last_version, timeout=heartbeat)
+
+                if camera is not None and last_version is None:
+                    last_version = camera.stats_version
+
+                payload = _stats_payload(stream_id, camera)
+
+                now = time()
+                if payload != last_payload:
+                    last_payload = payload
+                    last_sent = now
+                    yield f"data: {json.dumps(payload)}\n\n"
+                    if min_interval:
+                        sleep(min_interval)
+                elif now - last_sent >= heartbeat:
+                    last_sent = now
+                    yield ": heartbeat\n\n"
 
-        person_count = latest_counts.get("person", 0)
-        vehicle_count = latest_counts.get("vehicle", 0)
+        return Response(
+            generate(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
-        alarm_msgs = []
-        if person_count >= 5:
-            alarm_msgs.append("Kişi sayısı 5 ve üzerinde!")
-        if vehicle_count >= 10:
-            alarm_msgs.append("Araç sayısı 10 ve üzerinde!")
-        alarm = " | ".join(alarm_msgs) if alarm_msgs else None
+    @app.route("/api/detections", defaults={"stream_id": DEFAULT_STREAM_ID})
+    @app.route("/api/detections/<stream_id>")
+    @login_required
+    def api_detections(stream_id):
+        """
+        Server-Sent Events: her yeni kare için tespit metadatası (kutular,
+        bölge poligonları, sayaçlar; koordinatlar kaynak kare boyutunda).
+        /video_feed?annotate=0 ile birlikte istemci kutuları kendisi çizer.
+        fps: istemci başına üst sınır; aradaki kareler atlanır.
+        """
+        heartbeat = app.config["SSE_HEARTBEAT_SEC"]
+        max_fps = app.config["STREAM_MAX_FPS"]
+        try:
+            requested_fps = float(request.args.get("fps", max_fps))
+        except ValueError:
+            requested_fps = max_fps
+        if requested_fps > 0:
+            max_fps = min(requested_fps, max_fps)
+        min_interval = 1.0 / max_fps if max_fps else 0.0
+
+        def generate():
+            yield "retry: 3000\n\n"
+            last_seq = 0
+            last_hub = None
+            last_sent = time()
+            while True:
+                camera = app.streams.get(stream_id)
+                hub = camera.hub if camera is not None else None
+                if hub is not last_hub:
+                    # Stream eklendi / değişti: kare sırası baştan
+                    last_hub = hub
+                    last_seq = 0
+                if hub is None or hub.closed:
+                    sleep(1.0)
+                    seq = last_seq
+                else:
+                    seq = hub.wait_next(last_seq, timeout=heartbeat)
+
+                meta = hub.meta if hub is not None else None
+                now = time()
+                if seq and seq != last_seq and meta is not None:
+                    last_seq = seq
+                    last_sent = now
+                    yield f"data: {json.dumps(meta)}\n\n"
+                    if min_interval:
+                        sleep(min_interval)
+                elif now - last_sent >= heartbeat:
+                    last_sent = now
+                    yield ": heartbeat\n\n"
 
-        now = time()
-        if now - _last_log_ts["value"] > 5.0:
-            try:
-                log_detection(person_count, vehicle_count)
-                _last_log_ts["value"] = now
-            except OperationalError as e:
-                # migration sırasında hata olursa UI'yı kilitlemesin
-                print("log_detection error:", e)
+        return Response(
+            generate(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
+    # ---------- Stream yönetimi API ----------
+
+    @app.route("/api/streams", methods=["GET"])
+    @login_required
+    def api_streams_list():
         return jsonify(
             {
-                "person_count": person_count,
-                "vehicle_count": vehicle_count,
-                "alarm": alarm,
+                "streams": app.streams.list(),
+                "pool": app.streams.pool.stats(),
+                "batching": app.streams.batcher.stats(),
+                "writer": app.detection_writer.stats(),
+                "db": pool_stats(),
+                "models": MODELS.stats(),
+                "cache": app.detection_cache.stats(),
+                "clips": app.clip_recorder.stats() if app.clip_recorder else None,
+                "async_server": app.async_server.stats() if app.async_server else None,
             }
         )
 
+    @app.route("/api/streams", methods=["POST"])
+    @login_required
+    def api_streams_add():
+        data = request.get_json(silent=True) or {}
+        stream_id = str(data.pop("id", "")).strip()
+        try:
+            app.streams.add(stream_id, data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except RuntimeError as e:
+            return jsonify({"error": f"Video / kamera açılamadı: {e}"}), 400
+        return jsonify({"id": stream_id, "config": app.streams.get_config(stream_id)}), 201
+
+    @app.route("/api/streams/<stream_id>", methods=["PUT", "PATCH"])
+    @login_required
+    def api_streams_update(stream_id):
+        data = request.get_json(silent=True) or {}
+        data.pop("id", None)
+        try:
+            app.streams.reconfigure(stream_id, data)
+        except KeyError:
+            return jsonify({"error": "Stream bulunamadı."}), 404
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except RuntimeError as e:
+            return jsonify({"error": f"Video / kamera açılamadı: {e}"}), 400
+        return jsonify({"id": stream_id, "config": app.streams.get_config(stream_id)})
+
+    @app.route("/api/streams/<stream_id>", methods=["DELETE"])
+    @login_required
+    def api_streams_delete(stream_id):
+        try:
+            app.streams.remove(stream_id)
+        except KeyError:
+            return jsonify({"error": "Stream bulunamadı."}), 404
+        return jsonify({"id": stream_id, "removed": True})
+
+    # ---------- Prometheus metrikleri ----------
+
+    def _collect_app_metrics():
+        writer = app.detection_writer.stats()
+        families = app.streams.collect_metrics()
+        families.append(("detection_writer_queue_depth", "gauge",
+                         "Yazılmayı bekleyen tespit kayıtları.", [({}, writer["queued"])]))
+        families.append(("detection_writer_rows_total", "counter",
+                         "Yazılan / düşürülen tespit kayıtları.",
+                         [({"result": "written"}, writer["written"]),
+                          ({"result": "dropped"}, writer["dropped"])]))
+        cache = app.detection_cache.stats()
+        families.append(("detection_cache_lookups_total", "counter",
+                         "Tespit önbelleği sorguları.",
+                         [({"result": "hit"}, cache["hits"]),
+                          ({"result": "miss"}, cache["misses"])]))
+        return families
+
+    @app.route("/metrics")
+    def metrics():
+        # Prometheus kazıyıcıları oturum açmaz; bu uç nokta sadece sayaç içerir
+        return Response(
+            REGISTRY.render(collectors=[_collect_app_metrics]),
+            mimetype="text/plain; version=0.0.4",
+        )
 
     @app.route("/api/history")
     @login_required
     def api_history():
+        """
+        Parametresiz: son 50 kayıt.
+        from / to (epoch saniye ya da ISO tarih) ve/veya bucket verilirse:
+        aralık sorgusu; bucket yoksa aralığa ve retention'a göre özet katmanı
+        seçilir (bkz. auto_bucket). Satırlar stream başınadır.
+        """
+        stream_id = request.args.get("stream_id") or None
+        if any(k in request.args for k in ("from", "to", "bucket")):
+            try:
+                to_ts = _parse_ts(request.args.get("to"), default=int(time()))
+                from_ts = _parse_ts(request.args.get("from"), default=to_ts - 86400)
+                if from_ts >= to_ts:
+                    raise ValueError("'from' değeri 'to' değerinden küçük olmalı.")
+                bucket = request.args.get("bucket")
+                bucket_seconds = parse_bucket(bucket) if bucket else None
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+            try:
+                if bucket_seconds is None:
+                    # Nokta sınırına uyan ve from'u hâlâ kapsayan katman
+                    bucket_seconds = auto_bucket(
+                        from_ts, to_ts, starts=export_coverage(get_read_db())
+                    )
+                rows = query_history(from_ts, to_ts, bucket_seconds, stream_id=stream_id)
+            except OperationalError as e:
+                print("query_history error:", e)
+                rows = []
+            return jsonify(
+                {
+                    "from": from_ts,
+                    "to": to_ts,
+                    "bucket": bucket_seconds,
+                    "stream_id": stream_id,
+                    "rows": rows,
+                }
+            )
+
         try:
-            rows = get_recent_detections(limit=50)
+            rows = get_recent_detections(limit=50, stream_id=stream_id)
             history = [
                 {
                     "ts": r["ts"],
                     "person_count": r["person_count"],
                     "vehicle_count": r["vehicle_count"],
+                    "stream_id": r["stream_id"],
                 }
                 for r in rows
             ]
@@ -209,6 +601,129 @@ def create_app():
             history = []
         return jsonify(history)
 
+    @app.route("/api/export")
+    @login_required
+    def api_export():
+        """
+        Tespit geçmişinin akışla dışa aktarımı.
+        from / to (varsayılan: son 24 saat), stream_id (tekrarlanabilir ya da
+        virgüllü), format=csv|ndjson, gzip=1, after=ts_epoch:id (devam).
+        Satırlar chunk chunk okunup gönderilir; sonuç bellekte toplanmaz.
+        Ham retention'dan eski dönem özet satırlarıdır (bucket sütunu);
+        X-Export-Warning: rollup / no-data-before bunu bildirir.
+        """
+        try:
+            to_ts = _parse_ts(request.args.get("to"), default=int(time()))
+            from_ts = _parse_ts(request.args.get("from"), default=to_ts - 86400)
+            if from_ts >= to_ts:
+                raise ValueError("'from' değeri 'to' değerinden küçük olmalı.")
+            after = parse_cursor(request.args.get("after"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        fmt = request.args.get("format", "csv")
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({"error": f"Geçersiz biçim. Seçenekler: {', '.join(EXPORT_FORMATS)}"}), 400
+        stream_ids = [
+            s for value in request.args.getlist("stream_id") for s in value.split(",") if s
+        ]
+        compress = request.args.get("gzip") == "1"
+        chunk_size = app.config["EXPORT_CHUNK_ROWS"]
+        # Üretici istek bağlamı kapandıktan sonra çalışır; bağlantıyı kendisi alır
+        pool = read_pool()
+        conn = pool.acquire()
+        try:
+            # no-data-before sadece from açıkça verildiyse (varsayılan son 24 saat)
+            segments, info = plan_export(
+                conn, from_ts, to_ts, warn_before="from" in request.args
+            )
+        except OperationalError as e:
+            print("export error:", e)
+            return jsonify({"error": "Veritabanı okunamadı."}), 503
+        finally:
+            pool.release(conn)
+
+        def generate():
+            conn = pool.acquire()
+            try:
+                for text, _, _ in iter_export(
+                    conn, from_ts, to_ts, stream_ids, fmt, after, chunk_size,
+                    with_header=after is None, segments=segments,
+                ):
+                    yield text.encode("utf-8")
+            except OperationalError as e:
+                print("export error:", e)
+            finally:
+                pool.release(conn)
+
+        filename = f"detections_{from_ts}_{to_ts}.{fmt}"
+        body = generate()
+        mimetype = EXPORT_FORMATS[fmt]
+        if compress:
+            body, mimetype, filename = gzip_stream(body), "application/gzip", filename + ".gz"
+        headers = {
+            "Content-Disposition": f"attachment; filename={filename}",
+            "X-Accel-Buffering": "no",
+        }
+        # Kapsam: en eski ham satır / en eski kayıt (epoch); from bunlardan
+        # önceyse dosya sessizce kısa kalmaz, uyarı başlığı eklenir
+        if info["raw_from"] is not None:
+            headers["X-Export-Raw-From"] = str(info["raw_from"])
+        if info["data_from"] is not None:
+            headers["X-Export-Data-From"] = str(info["data_from"])
+        if info["warnings"]:
+            headers["X-Export-Warning"] = ", ".join(info["warnings"])
+        return Response(body, mimetype=mimetype, headers=headers)
+
+    @app.route("/api/clips")
+    @login_required
+    def api_clips():
+        """Alarm klipleri; stream_id, trigger, from / to ile süzülebilir."""
+        try:
+            to_ts = _parse_ts(request.args.get("to"), default=None)
+            from_ts = _parse_ts(request.args.get("from"), default=None)
+            limit = max(1, min(int(request.args.get("limit", 100)), 1000))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        clips = query_clips(
+            from_ts=from_ts,
+            to_ts=to_ts,
+            stream_id=request.args.get("stream_id") or None,
+            trigger=request.args.get("trigger") or None,
+            limit=limit,
+        )
+        for clip in clips:
+            clip["url"] = url_for("api_clip_file", clip_id=clip["id"])
+            del clip["path"]
+        return jsonify(clips)
+
+    @app.route("/api/clips/<int:clip_id>/file")
+    @login_required
+    def api_clip_file(clip_id):
+        clip = get_clip(clip_id)
+        if clip is None or not os.path.isfile(clip["path"]):
+            return jsonify({"error": "Klip bulunamadı."}), 404
+        return send_file(
+            clip["path"],
+            mimetype="video/x-motion-jpeg",
+            as_attachment=True,
+            download_name=os.path.basename(clip["path"]),
+        )
+
+    def _parse_ts(value, default):
+        if value is None or value == "":
+            return default
+        try:
+            return int(float(value))
+        except ValueError:
+            pass
+        try:
+            dt = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"Geçersiz zaman: {value}")
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return int(dt.timestamp())
+
     # ---------- Admin: User Management  ----------
 
     @app.route("/admin/users")
@@ -274,7 +789,13 @@ def create_app():
     return app
 
 
-app = create_app()
+# Süreç modundaki worker'lar (spawn) bu dosyayı __mp_main__ olarak yeniden
+# yükler; orada ikinci bir uygulama kurulmamalı.
+if __name__ != "__mp_main__":
+    # python app.py (debug): reloader'ın üst süreci sadece dosyaları izler,
+    # asıl sunucu WERKZEUG_RUN_MAIN=true ile başlayan alt süreçtir; portu o açar
+    _reloader_parent = __name__ == "__main__" and os.environ.get("WERKZEUG_RUN_MAIN") != "true"
+    app = create_app(start_async=not _reloader_parent)
 
 if __name__ == "__main__":
     app.run(
@@ -0,0 +1,462 @@
+"""
+Asyncio tabanlı yayın sunucusu (ASYNC_STREAM_PORT verilirse).
+
+Flask'ın threaded modunda her /video_feed ve /api/events istemcisi
+bağlantı boyunca bir OS thread'i tutar. Bu sunucu aynı uç noktaları
+(/video_feed, /api/stats, /api/events, /api/detections) ayrı bir portta
+tek bir event
+loop ile sunar: istemciler FrameHub'a kayıtlı tek bir dinleyici
+üzerinden yeni kareyi bekler, bağlantı başına thread yoktur.
+
+- Geri basınç: her bağlantının yazma tamponu sınırlıdır; tampon dolunca
+  drain beklenir ve bu sırada gelen kareler atlanır (istemci her zaman
+  en yeni kareyi alır, birikme olmaz).
+- İstemci bağlantıyı kapatınca akış görevi iptal edilir; izleyici sayacı
+  ve hub dinleyicisi finally içinde bırakılır.
+- Oturum Flask'ın session cookie'siyle doğrulanır (cookie'ler porta bağlı
+  değildir; dashboard'a giriş yapan tarayıcı bu porta da erişebilir).
+"""
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from werkzeug.test import EnvironBuilder
+
+from camera import JPEG_TIERS
+from streams import DEFAULT_STREAM_ID
+
+_MAX_HEADER_BYTES = 16 * 1024
+_REASONS = {
+    200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+    405: "Method Not Allowed", 503: "Service Unavailable",
+}
+
+
+class _HubWatch:
+    """
+    Bir FrameHub için tek dinleyici: yayın thread'inden gelen bildirimi
+    loop'a taşır ve bekleyen tüm bağlantıları birlikte uyandırır.
+    """
+    def __init__(self, loop, hub):
+        self.loop = loop
+        self.hub = hub
+        self.refs = 0
+        self._event = asyncio.Event()
+        hub.add_listener(self._on_publish)
+
+    def _on_publish(self):
+        try:
+            self.loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:
+            pass   # loop kapandı
+
+    def _wake(self):
+        self._event.set()
+        self._event = asyncio.Event()
+
+    async def wait(self, timeout):
+        """Yeni kare / kapanış bildirimine ya da zaman aşımına kadar bekler."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def close(self):
+        self.hub.remove_listener(self._on_publish)
+
+
+class AsyncStreamServer:
+    def __init__(self, app, host="0.0.0.0", port=5001, write_buffer=256 * 1024,
+                 write_timeout=30.0, encode_workers=2):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.write_buffer = write_buffer
+        self.write_timeout = write_timeout
+        # Katman ilk kez istendiğinde JPEG kodlama loop'u bloklamasın
+        self._encoder = ThreadPoolExecutor(
+            max_workers=encode_workers, thread_name_prefix="async-encode"
+        )
+        self._watches = {}
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+
+        self.connections = 0
+        self.total_connections = 0
+
+    # ---------- Yaşam döngüsü ----------
+
+    def start(self):
+        """Sunucuyu arka plan thread'inde başlatır; port açılamazsa OSError."""
+        self._thread = threading.Thread(
+            target=self._run, name="async-stream-server", daemon=True
+        )
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(
+                    self._handle, self.host, self.port,
+                    limit=_MAX_HEADER_BYTES, backlog=1024,
+                )
+            )
+        except OSError as e:
+            self._error = e
+            self._ready.set()
+            self._loop.close()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    def stop(self):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+
+        async def shutdown():
+            self._server.close()
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            loop.stop()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), loop)
+        self._thread.join(timeout=5.0)
+        self._encoder.shutdown(wait=False)
+
+    def stats(self):
+        return {
+            "port": self.port,
+            "connections": self.connections,
+            "total_connections": self.total_connections,
+            "watched_hubs": len(self._watches),
+        }
+
+    # ---------- Hub dinleyicileri ----------
+
+    def _watch(self, hub):
+        watch = self._watches.get(hub)
+        if watch is None:
+            watch = self._watches[hub] = _HubWatch(self._loop, hub)
+        watch.refs += 1
+        return watch
+
+    def _unwatch(self, watch):
+        watch.refs -= 1
+        if watch.refs <= 0:
+            watch.close()
+            self._watches.pop(watch.hub, None)
+
+    # ---------- HTTP ----------
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self.total_connections += 1
+        writer.transport.set_write_buffer_limits(high=self.write_buffer)
+        try:
+            request = await self._read_request(reader)
+            if request is not None:
+                await self._dispatch(request, reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError,
+                asyncio.LimitOverrunError, asyncio.TimeoutError):
+            pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print("AsyncStreamServer error:", e)
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _read_request(self, reader):
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10.0)
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            return None
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+        url = urlsplit(target)
+        return {
+            "method": method,
+            "path": unquote(url.path),
+            "args": {k: v[-1] for k, v in parse_qs(url.query).items()},
+            "headers": headers,
+        }
+
+    def _logged_in(self, request):
+        """Flask session cookie'sini uygulamanın session arayüzüyle açar."""
+        cookie = request["headers"].get("cookie")
+        if not cookie:
+            return False
+        environ_request = EnvironBuilder(
+            path=request["path"], headers={"Cookie": cookie}
+        ).get_request()
+        session = self.app.session_interface.open_session(self.app, environ_request)
+        return session is not None and "user" in session
+
+    def _cors_headers(self, request):
+        # SSE farklı porttan açılır; sadece aynı makinedeki sayfalara izin ver
+        origin = request["headers"].get("origin")
+        host = request["headers"].get("host", "").rsplit(":", 1)[0]
+        if origin and urlsplit(origin).hostname == host:
+            return {
+                "Access-Control-Allow-Origin": origin,
+                "Access-Control-Allow-Credentials": "true",
+                "Vary": "Origin",
+            }
+        return {}
+
+    @staticmethod
+    def _head(status, content_type, extra=None):
+        lines = [
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+            f"Content-Type: {content_type}",
+            "Cache-Control: no-cache",
+            "Connection: close",
+        ]
+        lines += [f"{k}: {v}" for k, v in (extra or {}).items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _respond(self, writer, status, body, content_type="text/plain; charset=utf-8",
+                       extra=None):
+        data = body.encode("utf-8")
+        extra = dict(extra or {}, **{"Content-Length": str(len(data))})
+        writer.write(self._head(status, content_type, extra) + data)
+        await writer.drain()
+
+    async def _dispatch(self, request, reader, writer):
+        if request["method"] != "GET":
+            return await self._respond(writer, 405, "Sadece GET desteklenir.")
+
+        parts = [p for p in request["path"].split("/") if p]
+        if not parts or parts[0] not in ("video_feed", "api") or len(parts) > 3:
+            return await self._respond(writer, 404, "Bulunamadı.")
+        if parts[0] == "video_feed":
+            route, rest = "video_feed", parts[1:]
+        else:
+            route, rest = (parts[1] if len(parts) > 1 else ""), parts[2:]
+        if route not in ("video_feed", "stats", "events", "detections") or len(rest) > 1:
+            return await self._respond(writer, 404, "Bulunamadı.")
+        stream_id = rest[0] if rest else DEFAULT_STREAM_ID
+
+        if not self._logged_in(request):
+            return await self._respond(writer, 401, "Giriş gerekli.", extra=self._cors_headers(request))
+
+        if route == "video_feed":
+            await self._video_feed(request, reader, writer, stream_id)
+        elif route == "stats":
+            payload = self.app.stats_payload(stream_id, self.app.streams.get(stream_id))
+            await self._respond(writer, 200, json.dumps(payload), "application/json",
+                                extra=self._cors_headers(request))
+        elif route == "detections":
+            await self._until_disconnect(
+                reader, self._detections(request, writer, stream_id)
+            )
+        else:
+            await self._until_disconnect(
+                reader, self._events(request, writer, stream_id)
+            )
+
+    async def _until_disconnect(self, reader, coro):
+        """Akışı istemci bağlantıyı kapatana kadar çalıştırır, sonra iptal eder."""
+        async def client_gone():
+            while await reader.read(4096):
+                pass
+
+        stream = asyncio.ensure_future(coro)
+        gone = asyncio.ensure_future(client_gone())
+        try:
+            await asyncio.wait({stream, gone}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (stream, gone):
+                task.cancel()
+            await asyncio.gather(stream, gone, return_exceptions=True)
+
+    # ---------- MJPEG ----------
+
+    async def _video_feed(self, request, reader, writer, stream_id):
+        camera = self.app.streams.get(stream_id)
+        if camera is None:
+            return await self._respond(writer, 503, "Stream yok. Lütfen önce bir kaynak seçin.")
+
+        tier = request["args"].get("tier", "full")
+        if tier not in JPEG_TIERS:
+            return await self._respond(
+                writer, 400, f"Geçersiz katman. Seçenekler: {', '.join(JPEG_TIERS)}"
+            )
+        max_fps = self.app.config["STREAM_MAX_FPS"]
+        try:
+            requested_fps = float(request["args"].get("fps", max_fps))
+        except ValueError:
+            requested_fps = max_fps
+        if requested_fps > 0:
+            max_fps = min(requested_fps, max_fps)
+        annotate = request["args"].get("annotate", "1") != "0"
+
+        camera.start()
+        writer.write(self._head(200, "multipart/x-mixed-replace; boundary=frame"))
+        await self._until_disconnect(
+            reader, self._mjpeg(camera.hub, writer, tier, max_fps, annotate)
+        )
+
+    async def _mjpeg(self, hub, writer, tier, max_fps, annotate=True):
+        loop = asyncio.get_running_loop()
+        min_interval = 1.0 / max_fps if max_fps else 0.0
+        last_seq = 0
+        next_ts = 0.0
+        watch = self._watch(hub)
+        hub.add_viewer()
+        try:
+            while not hub.closed:
+                if min_interval:
+                    delay = next_ts - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+                if hub.seq == last_seq:
+                    await watch.wait(5.0)
+                    continue
+
+                seq, data = hub.cached_jpeg(tier, annotate)
+                if data is None:
+                    seq, data = await loop.run_in_executor(
+                        self._encoder, hub.jpeg, tier, annotate
+                    )
+                if data is None:
+                    await watch.wait(5.0)
+                    continue
+                last_seq = seq
+                next_ts = time.monotonic() + min_interval
+                writer.write(
+                    b"--frame\r\n"
+                    b"Content-Type: image/jpeg\r\n\r\n" + data + b"\r\n"
+                )
+                # Tampon doluysa istemci yetişene kadar bekle; aradaki kareler atlanır
+                await asyncio.wait_for(writer.drain(), self.write_timeout)
+        finally:
+            hub.add_viewer(-1)
+            self._unwatch(watch)
+
+    # ---------- SSE ----------
+
+    async def _events(self, request, writer, stream_id):
+        heartbeat = self.app.config["SSE_HEARTBEAT_SEC"]
+        min_interval = self.app.config["SSE_MIN_INTERVAL_SEC"]
+        extra = dict(self._cors_headers(request), **{"X-Accel-Buffering": "no"})
+        writer.write(self._head(200, "text/event-stream", extra) + b"retry: 3000\n\n")
+
+        last_payload = None
+        last_version = None
+        last_camera = None
+        last_sent = time.monotonic()
+        watch = None
+        try:
+            while True:
+                camera = self.app.streams.get(stream_id)
+                if camera is not last_camera:
+                    # Stream eklendi / değişti: dinleyiciyi ve sürüm takibini yenile
+                    if watch is not None:
+                        self._unwatch(watch)
+                    watch = self._watch(camera.hub) if camera is not None else None
+                    last_camera = camera
+                    last_version = None
+
+                version = camera.stats_version if camera is not None else None
+                now = time.monotonic()
+                if version != last_version or last_version is None:
+                    last_version = version
+                    payload = self.app.stats_payload(stream_id, camera)
+                    if payload != last_payload:
+                        last_payload = payload
+                        last_sent = now
+                        writer.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+                        await asyncio.wait_for(writer.drain(), self.write_timeout)
+                        if min_interval:
+                            await asyncio.sleep(min_interval)
+                        continue
+                if now - last_sent >= heartbeat:
+                    last_sent = now
+                    writer.write(b": heartbeat\n\n")
+                    await asyncio.wait_for(writer.drain(), self.write_timeout)
+
+                remaining = max(0.0, heartbeat - (time.monotonic() - last_sent))
+                if watch is None or watch.hub.closed:
+                    await asyncio.sleep(min(1.0, remaining))
+                else:
+                    await watch.wait(remaining)
+        finally:
+            if watch is not None:
+                self._unwatch(watch)
+
+    async def _detections(self, request, writer, stream_id):
+        """Her yeni karenin tespit metadatası (Flask'taki /api/detections)."""
+        heartbeat = self.app.config["SSE_HEARTBEAT_SEC"]
+        max_fps = self.app.config["STREAM_MAX_FPS"]
+        try:
+            requested_fps = float(request["args"].get("fps", max_fps))
+        except ValueError:
+            requested_fps = max_fps
+        if requested_fps > 0:
+            max_fps = min(requested_fps, max_fps)
+        min_interval = 1.0 / max_fps if max_fps else 0.0
+        extra = dict(self._cors_headers(request), **{"X-Accel-Buffering": "no"})
+        writer.write(self._head(200, "text/event-stream", extra) + b"retry: 3000\n\n")
+
+        last_seq = 0
+        last_sent = time.monotonic()
+        watch = None
+        try:
+            while True:
+                camera = self.app.streams.get(stream_id)
+                hub = camera.hub if camera is not None else None
+                if watch is None or watch.hub is not hub:
+                    # Stream eklendi / değişti: dinleyiciyi ve kare sırasını yenile
+                    if watch is not None:
+                        self._unwatch(watch)
+                    watch = self._watch(hub) if hub is not None else None
+                    last_seq = 0
+
+                now = time.monotonic()
+                meta = hub.meta if hub is not None else None
+                if meta is not None and meta["seq"] != last_seq:
+                    last_seq = meta["seq"]
+                    last_sent = now
+                    writer.write(f"data: {json.dumps(meta)}\n\n".encode("utf-8"))
+                    await asyncio.wait_for(writer.drain(), self.write_timeout)
+                    if min_interval:
+                        await asyncio.sleep(min_interval)
+                    continue
+                if now - last_sent >= heartbeat:
+                    last_sent = now
+                    writer.write(b": heartbeat\n\n")
+                    await asyncio.wait_for(writer.drain(), self.write_timeout)
+
+                remaining = max(0.0, heartbeat - (time.monotonic() - last_sent))
+                if watch is None or watch.hub.closed:
+                    await asyncio.sleep(min(1.0, remaining))
+                else:
+                    await watch.wait(remaining)
+        finally:
+            if watch is not None:
+                self._unwatch(watch)
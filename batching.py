@@ -0,0 +1,174 @@
+import queue
+import threading
+import time
+
+from detection import CarDetectorYOLO
+
+
+class _Request:
+    __slots__ = ("frame", "input_size", "done", "result", "error", "t_submit")
+
+    def __init__(self, frame, input_size):
+        self.frame = frame
+        self.input_size = input_size
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.t_submit = time.monotonic()
+
+
+class BatchInferenceService:
+    """
+    Farklı stream'lerden gelen YOLO isteklerini toplayıp tek
+    blobFromImages + forward çağrısıyla işler.
+
+    Batch, max_batch kareye ulaşınca ya da ilk istek max_wait_ms kadar
+    beklediğinde gönderilir; her sonuç kendi isteğine geri döner.
+    Ağ sadece servis thread'inde kullanılır (cv2.dnn.Net thread-safe değil).
+    """
+    def __init__(self, detector=None, max_batch=8, max_wait_ms=20.0):
+        self.detector = detector or CarDetectorYOLO()
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._frames = 0
+        self._size_hist = [0] * (self.max_batch + 1)
+        self._wait_total = 0.0
+        self._infer_total = 0.0
+
+    @property
+    def available(self):
+        return self.detector.available
+
+    def start(self):
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="yolo-batcher", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        with self._thread_lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            thread.join(timeout=5.0)
+        # Bekleyen istekleri boş sonuçla serbest bırak
+        while True:
+            try:
+                req = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            req.result = ([], 0)
+            req.done.set()
+
+    def infer(self, frame_bgr, timeout=5.0, input_size=416):
+        """Tek kare için (boxes, count); batch tamamlanana kadar bekler."""
+        if not self.available:
+            return [], 0
+        self.start()
+
+        req = _Request(frame_bgr, input_size)
+        self._queue.put(req)
+        if not req.done.wait(timeout):
+            raise TimeoutError("YOLO batch çıkarımı zaman aşımına uğradı.")
+        if req.error is not None:
+            raise req.error
+        return req.result
+
+    def infer_many(self, frames_bgr):
+        """
+        Offline mod: ardışık kareleri max_batch'lik gruplar halinde doğrudan
+        işler (servis thread'i kullanılmaz, çağıran thread'de çalışır).
+        """
+        results = []
+        for i in range(0, len(frames_bgr), self.max_batch):
+            chunk = frames_bgr[i:i + self.max_batch]
+            t0 = time.perf_counter()
+            results.extend(self.detector.detect_batch(chunk))
+            self._record(len(chunk), 0.0, time.perf_counter() - t0)
+        return results
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            deadline = first.t_submit + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        # Süre doldu; sadece hazırda bekleyenleri al
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._process(batch)
+
+    def _process(self, batch):
+        # Farklı giriş boyutları (governor) ayrı forward ile işlenir
+        groups = {}
+        for req in batch:
+            groups.setdefault(req.input_size, []).append(req)
+
+        for input_size, group in groups.items():
+            t0 = time.monotonic()
+            wait = sum(t0 - req.t_submit for req in group)
+            try:
+                results = self.detector.detect_batch(
+                    [req.frame for req in group], input_size
+                )
+            except Exception as e:
+                for req in group:
+                    req.error = e
+                    req.done.set()
+                continue
+
+            self._record(len(group), wait, time.monotonic() - t0)
+            for req, result in zip(group, results):
+                req.result = result
+                req.frame = None
+                req.done.set()
+
+    def _record(self, size, wait, infer):
+        with self._stats_lock:
+            self._batches += 1
+            self._frames += size
+            self._size_hist[min(size, self.max_batch)] += 1
+            self._wait_total += wait
+            self._infer_total += infer
+
+    def stats(self):
+        with self._stats_lock:
+            batches, frames = self._batches, self._frames
+            hist = list(self._size_hist)
+            wait_total, infer_total = self._wait_total, self._infer_total
+        return {
+            "available": self.available,
+            "max_batch": self.max_batch,
+            "max_wait_ms": round(self.max_wait * 1000.0, 1),
+            "batches": batches,
+            "frames": frames,
+            "avg_batch_size": round(frames / batches, 2) if batches else 0.0,
+            "batch_size_histogram": {str(i): n for i, n in enumerate(hist) if n},
+            "avg_queue_wait_ms": round(wait_total / frames * 1000.0, 2) if frames else 0.0,
+            "avg_infer_ms_per_frame": round(infer_total / frames * 1000.0, 2) if frames else 0.0,
+            "queue_depth": self._queue.qsize(),
+        }
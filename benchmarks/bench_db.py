@@ -0,0 +1,194 @@
+"""
+SQLite bağlantı katmanı benchmark'ı: eş zamanlı istek gecikmesi.
+
+Geçici bir DB'ye sentetik geçmiş yazılır; küçük bir Flask uygulaması
+db.py fonksiyonlarını (son kayıtlar, saatlik aralık sorgusu, kullanıcı
+arama) sunar. N thread aynı anda istek atarken arka planda
+DetectionWriter yazmaya devam eder. Her havuz boyu için uç nokta bazında
+p50/p95/p99 gecikme ve toplam istek/sn raporlanır; DB_POOL_SIZE=0 eski
+davranıştır (her istekte yeni bağlantı).
+
+Kullanım:
+  python benchmarks/bench_db.py --threads 16 --duration 10
+  python benchmarks/bench_db.py --pool-sizes 0,4,16 --rows 500000
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+from flask import Flask, jsonify
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import db  # noqa: E402
+
+DEFAULT_OUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "db.json")
+STREAMS = ["cam1", "cam2", "cam3", "cam4"]
+ENDPOINTS = ["recent", "range", "user"]
+
+
+def seed(directory, rows):
+    app = Flask("bench_db", instance_path=directory)
+    app.teardown_appcontext(db.close_db)
+    with app.app_context():
+        db.init_db()
+    conn = sqlite3.connect(os.path.join(directory, "app.db"))
+    now = int(time.time())
+    rng = random.Random(0)
+    batch = []
+    for i in range(rows):
+        ts = now - 7 * 86400 + i * (7 * 86400) // rows
+        batch.append(db._detection_row(rng.choice(STREAMS), rng.randint(0, 12), rng.randint(0, 30), ts))
+        if len(batch) >= 10000:
+            with conn:
+                db._write_detections(conn, batch)
+            batch = []
+    if batch:
+        with conn:
+            db._write_detections(conn, batch)
+    conn.close()
+
+
+def make_app(directory, pool_size):
+    app = Flask("bench_db", instance_path=directory)
+    app.config["DB_POOL_SIZE"] = pool_size
+    app.teardown_appcontext(db.close_db)
+
+    @app.route("/recent")
+    def recent():
+        rows = db.get_recent_detections(limit=50, stream_id=random.choice(STREAMS))
+        return jsonify([dict(r) for r in rows])
+
+    @app.route("/range")
+    def range_():
+        to_ts = int(time.time())
+        return jsonify(db.query_history(to_ts - 86400, to_ts, 3600, stream_id=random.choice(STREAMS)))
+
+    @app.route("/user")
+    def user():
+        row = db.get_user_by_username("demo")
+        return jsonify({"id": row["id"]})
+
+    return app
+
+
+def run(app, directory, threads, duration, write_rate):
+    writer = db.DetectionWriter(os.path.join(directory, "app.db"), flush_interval=0.2)
+    writer.start()
+    stop = threading.Event()
+
+    def produce():
+        # Canlı stream'lerin sayaç yazımını taklit eder
+        while not stop.is_set():
+            for sid in STREAMS:
+                writer.submit(sid, random.randint(0, 12), random.randint(0, 30))
+            stop.wait(len(STREAMS) / write_rate)
+
+    latencies = {name: [] for name in ENDPOINTS}
+    errors = []
+
+    def client_loop(seed_value):
+        rng = random.Random(seed_value)
+        client = app.test_client()
+        local = {name: [] for name in ENDPOINTS}
+        while not stop.is_set():
+            name = rng.choice(ENDPOINTS)
+            t0 = time.perf_counter()
+            resp = client.get("/" + name)
+            local[name].append(time.perf_counter() - t0)
+            if resp.status_code != 200:
+                errors.append(resp.status_code)
+        for name in ENDPOINTS:
+            latencies[name].extend(local[name])
+
+    workers = [threading.Thread(target=produce, daemon=True)]
+    workers += [threading.Thread(target=client_loop, args=(i,), daemon=True) for i in range(threads)]
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    time.sleep(duration)
+    stop.set()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - t0
+    writer.stop()
+
+    result = {"endpoints": {}, "errors": len(errors)}
+    total = 0
+    for name, samples in latencies.items():
+        total += len(samples)
+        arr = np.asarray(samples) * 1000.0
+        result["endpoints"][name] = {
+            "count": len(samples),
+            "p50_ms": round(float(np.percentile(arr, 50)), 3),
+            "p95_ms": round(float(np.percentile(arr, 95)), 3),
+            "p99_ms": round(float(np.percentile(arr, 99)), 3),
+        } if samples else None
+    result["requests_per_sec"] = round(total / elapsed, 1)
+    result["rows_written"] = writer.written
+    with app.app_context():
+        result["pool"] = db.pool_stats()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--pool-sizes", default="0,8")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--rows", type=int, default=200000, help="Başlangıçtaki geçmiş satırı")
+    parser.add_argument("--write-rate", type=float, default=200.0, help="Arka plan yazımı (satır/sn)")
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bench_db_")
+    seed_dir = os.path.join(work, "seed")
+    os.makedirs(seed_dir)
+    print(f"{args.rows} satır hazırlanıyor...")
+    seed(seed_dir, args.rows)
+
+    result = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "cpu_count": os.cpu_count(),
+        "threads": args.threads,
+        "rows": args.rows,
+        "pools": {},
+    }
+    try:
+        for size in [int(s) for s in args.pool_sizes.split(",") if s.strip()]:
+            # Her havuz boyu kendi DB kopyasında (havuzlar dosya yoluna bağlı)
+            directory = os.path.join(work, f"pool{size}")
+            os.makedirs(directory)
+            shutil.copy(os.path.join(seed_dir, "app.db"), directory)
+            res = run(make_app(directory, size), directory, args.threads, args.duration, args.write_rate)
+            result["pools"][str(size)] = res
+            print(f"pool={size:<3} {res['requests_per_sec']:>8.1f} istek/sn  hata {res['errors']}")
+            for name, st in res["endpoints"].items():
+                if st:
+                    print(f"  {name:<7} p50 {st['p50_ms']:7.2f}  p95 {st['p95_ms']:7.2f}  p99 {st['p99_ms']:7.2f} ms")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"Sonuç: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
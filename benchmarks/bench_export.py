@@ -0,0 +1,161 @@
+"""
+Toplu dışa aktarım benchmark'ı: satır/sn ve tepe bellek.
+
+Geçici bir DB'ye sentetik geçmiş yazılır; kısa (1 saat) ve tüm aralık
+için dışa aktarım iki yolla ölçülür:
+  - stream: export.iter_export (chunk'lı okuma, akışla yazım; /api/export
+    ve export.py CLI'ının kullandığı yol)
+  - fetchall: tüm satırları tek listeye alıp tek metin üreten eski yaklaşım
+Tepe bellek tracemalloc ile ayrı bir turda ölçülür (Python tahsisleri);
+akış yolunda aralık büyüdükçe sabit kalması beklenir.
+
+Kullanım:
+  python benchmarks/bench_export.py --rows 1000000
+  python benchmarks/bench_export.py --formats csv --gzip
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import db  # noqa: E402
+from export import format_rows, gzip_stream, header, iter_export  # noqa: E402
+
+DEFAULT_OUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "export.json")
+STREAMS = ["cam1", "cam2", "cam3", "cam4"]
+
+
+def seed(path, rows, span):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    db._migrate(conn)
+    now = int(time.time())
+    rng = random.Random(0)
+    batch = []
+    for i in range(rows):
+        ts = now - span + i * span // rows
+        batch.append(db._detection_row(rng.choice(STREAMS), rng.randint(0, 12), rng.randint(0, 30), ts))
+        if len(batch) >= 10000:
+            with conn:
+                db._write_detections(conn, batch)
+            batch = []
+    if batch:
+        with conn:
+            db._write_detections(conn, batch)
+    conn.close()
+    return now
+
+
+def export_stream(conn, from_ts, to_ts, fmt, compress):
+    chunks = (text.encode("utf-8") for text, _, _ in iter_export(conn, from_ts, to_ts, fmt=fmt))
+    if compress:
+        chunks = gzip_stream(chunks)
+    total = 0
+    for data in chunks:
+        total += len(data)   # istemciye yazılmış kabul edilir
+    return total
+
+
+def export_fetchall(conn, from_ts, to_ts, fmt, compress):
+    rows = conn.execute(
+        "SELECT id, ts_epoch, ts, stream_id, person_count, vehicle_count, 'raw', 1 FROM detections "
+        "WHERE ts_epoch >= ? AND ts_epoch < ? ORDER BY ts_epoch, id",
+        (from_ts, to_ts),
+    ).fetchall()
+    data = (header(fmt) + format_rows(rows, fmt)).encode("utf-8")
+    if compress:
+        data = zlib.compress(data, 6)
+    return len(data)
+
+
+def count_rows(conn, from_ts, to_ts):
+    return conn.execute(
+        "SELECT COUNT(*) FROM detections WHERE ts_epoch >= ? AND ts_epoch < ?", (from_ts, to_ts)
+    ).fetchone()[0]
+
+
+def measure(fn, path, from_ts, to_ts, fmt, compress, rows):
+    conn = db.configure_connection(sqlite3.connect(path))
+    try:
+        t0 = time.perf_counter()
+        nbytes = fn(conn, from_ts, to_ts, fmt, compress)
+        elapsed = time.perf_counter() - t0
+
+        tracemalloc.start()
+        fn(conn, from_ts, to_ts, fmt, compress)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        conn.close()
+    return {
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else None,
+        "mb": round(nbytes / 1e6, 2),
+        "peak_alloc_mb": round(peak / (1024.0 * 1024.0), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--days", type=float, default=30.0, help="Sentetik geçmişin kapsadığı süre")
+    parser.add_argument("--formats", default="csv,ndjson")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bench_export_")
+    path = os.path.join(work, "app.db")
+    print(f"{args.rows} satır hazırlanıyor...")
+    span = int(args.days * 86400)
+    now = seed(path, args.rows, span)
+    ranges = {"1h": (now - 3600, now + 1), "all": (now - span, now + 1)}
+
+    result = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "rows": args.rows,
+        "gzip": args.gzip,
+        "runs": {},
+    }
+    try:
+        conn = sqlite3.connect(path)
+        counts = {name: count_rows(conn, *r) for name, r in ranges.items()}
+        conn.close()
+        for fmt in [f.strip() for f in args.formats.split(",") if f.strip()]:
+            for name, (from_ts, to_ts) in ranges.items():
+                for mode, fn in (("stream", export_stream), ("fetchall", export_fetchall)):
+                    res = measure(fn, path, from_ts, to_ts, fmt, args.gzip, counts[name])
+                    result["runs"][f"{fmt}/{name}/{mode}"] = res
+                    print(
+                        f"{fmt:<6} {name:<4} {mode:<8} {res['rows']:>9} satır  "
+                        f"{res['rows_per_sec']:>11} satır/sn  {res['mb']:>8} MB  "
+                        f"tepe bellek {res['peak_alloc_mb']} MB"
+                    )
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"Sonuç: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
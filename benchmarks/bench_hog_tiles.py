@@ -0,0 +1,175 @@
+"""
+Şeritli (tiled) paralel HOG için doğruluk / hız karşılaştırması.
+
+Her yapılandırma aynı sentetik karelerde çalıştırılır. Referans, tek
+parça HOG'dur (tiles=1, winStride=8, scale=1.05); diğer yapılandırmaların
+kutuları referansla IoU >= 0.5 üzerinden eşlenir ve recall / precision
+raporlanır. Hız: kare başına p50 süre ve referansa göre hızlanma.
+
+Şeritli (tiles > 1) her yapılandırmanın recall'u aynı winStride / scale
+ile tek parça çalışmanın recall'undan düşükse (--tolerance kadar pay)
+yapılandırma FAIL olarak işaretlenir ve betik 1 ile çıkar; şeritleme
+doğruluk kaybetmemelidir.
+
+Kullanım:
+  python benchmarks/bench_hog_tiles.py
+  python benchmarks/bench_hog_tiles.py --clips people_720p --frames 60 --configs "1,8,1.05;4,8,1.05;4,16,1.1"
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cv2  # noqa: E402
+
+from detection import PeopleDetector  # noqa: E402
+from tracking import iou_matrix  # noqa: E402
+from synthetic import CLIPS, clip_path  # noqa: E402
+
+CLIP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clips")
+DEFAULT_CONFIGS = "1,8,1.05;2,8,1.05;4,8,1.05;8,8,1.05;4,16,1.05;4,8,1.1"
+
+
+def parse_configs(text):
+    """'tiles,win_stride,scale;...' -> [(tiles, win_stride, scale), ...]"""
+    configs = []
+    for part in text.split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        tiles, stride, scale = part.split(",")
+        configs.append((int(tiles), int(stride), float(scale)))
+    return configs
+
+
+def load_frames(name, count):
+    path = clip_path(name, CLIP_DIR, frames=count)
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def run_config(frames, tiles, win_stride, scale, overlap):
+    det = PeopleDetector(tiles=tiles, win_stride=win_stride, scale=scale, tile_overlap=overlap)
+    det.detect_people(frames[0])  # ısınma (thread havuzu vb.)
+    times, results = [], []
+    for frame in frames:
+        t0 = time.perf_counter()
+        boxes, _ = det.detect_people(frame)
+        times.append(time.perf_counter() - t0)
+        results.append(boxes)
+    return results, times
+
+
+def match(reference, candidate, threshold=0.5):
+    """Açgözlü IoU eşleme: (eşleşen, referans, aday) sayıları."""
+    matched = 0
+    for ref, cand in zip(reference, candidate):
+        if not ref or not cand:
+            continue
+        ious = iou_matrix(np.asarray(ref, dtype=np.float32), np.asarray(cand, dtype=np.float32))
+        while ious.size and ious.max() >= threshold:
+            i, j = np.unravel_index(int(ious.argmax()), ious.shape)
+            matched += 1
+            ious[i, :] = -1
+            ious[:, j] = -1
+    return matched, sum(len(r) for r in reference), sum(len(c) for c in candidate)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--clips", default="people_720p,mixed_1080p",
+                        help="Virgülle ayrılmış klip isimleri (%s)" % ", ".join(CLIPS))
+    parser.add_argument("--frames", type=int, default=40)
+    parser.add_argument("--configs", default=DEFAULT_CONFIGS,
+                        help="'tiles,winStride,scale' grupları, ';' ile ayrılmış")
+    parser.add_argument("--overlap", type=float, default=0.25)
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="Şeritli recall'un tek parçadan en fazla bu kadar düşük olmasına izin ver")
+    parser.add_argument("--out", help="Sonuçları JSON olarak yaz")
+    args = parser.parse_args()
+
+    configs = parse_configs(args.configs)
+    report = {"cpu_count": os.cpu_count(), "overlap": args.overlap, "clips": {}}
+    failures = []
+    for name in [c.strip() for c in args.clips.split(",") if c.strip()]:
+        frames = load_frames(name, args.frames)
+        reference, ref_times = run_config(frames, 1, 8, 1.05, args.overlap)
+        ref_p50 = float(np.median(ref_times))
+
+        print(f"{name} ({len(frames)} kare, referans: {sum(len(r) for r in reference)} kutu)")
+        print(f"  {'tiles':>5} {'stride':>6} {'scale':>5} {'p50 ms':>8} {'hız':>6} {'recall':>7} {'prec.':>7}")
+        rows = []
+        untiled = {(8, 1.05): 1.0}   # (stride, scale) -> tek parça recall
+
+        def untiled_recall(stride, scale):
+            if (stride, scale) not in untiled:
+                results, _ = run_config(frames, 1, stride, scale, args.overlap)
+                matched, n_ref, _ = match(reference, results)
+                untiled[(stride, scale)] = matched / n_ref if n_ref else None
+            return untiled[(stride, scale)]
+
+        # Tek parça yapılandırmalar önce: şeritliler bunlarla karşılaştırılır
+        for tiles, stride, scale in sorted(configs, key=lambda c: c[0] != 1):
+            results, times = run_config(frames, tiles, stride, scale, args.overlap)
+            matched, n_ref, n_cand = match(reference, results)
+            p50 = float(np.median(times))
+            recall = matched / n_ref if n_ref else None
+            if tiles == 1:
+                untiled[(stride, scale)] = recall
+            baseline = untiled_recall(stride, scale) if tiles > 1 else None
+            failed = (
+                baseline is not None and recall is not None
+                and recall < baseline - args.tolerance
+            )
+            row = {
+                "tiles": tiles,
+                "win_stride": stride,
+                "scale": scale,
+                "p50_ms": round(p50 * 1000.0, 2),
+                "speedup": round(ref_p50 / p50, 2) if p50 else None,
+                "recall": round(matched / n_ref, 3) if n_ref else None,
+                "precision": round(matched / n_cand, 3) if n_cand else None,
+                "boxes": n_cand,
+                "untiled_recall": round(baseline, 3) if baseline is not None else None,
+                "failed": failed,
+            }
+            rows.append(row)
+            if failed:
+                failures.append(f"{name}: tiles={tiles} stride={stride} scale={scale} "
+                                f"recall {recall:.3f} < tek parça {baseline:.3f}")
+            fmt = lambda v: "-" if v is None else f"{v:.3f}"  # noqa: E731
+            print(f"  {tiles:>5} {stride:>6} {scale:>5} {row['p50_ms']:>8.1f} "
+                  f"{row['speedup']:>5.2f}x {fmt(row['recall']):>7} {fmt(row['precision']):>7}"
+                  f"{'  FAIL' if failed else ''}")
+        report["clips"][name] = rows
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Sonuç: {args.out}")
+
+    if failures:
+        print("Şeritleme recall kaybı:")
+        for line in failures:
+            print("  " + line)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
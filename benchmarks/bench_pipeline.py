@@ -0,0 +1,229 @@
+"""
+Pipeline benchmark'ı: sentetik video dosyası kaynağıyla gerçek bir
+VideoCamera çalıştırılır (FrameReader decode thread'i, tespit / tracker /
+governor, hub.publish) ve izleyici thread'leri yayınlanan her kareyi
+mjpeg_generator gibi hub.jpeg() ile kodlar. Ölçülenler:
+  - end_to_end: ardışık hub.publish çağrıları arası süre (p50/p95/p99)
+    ve yayın hızı (FPS)
+  - aşamalar: video_stage_seconds histogramına ölçüm sırasında düşen
+    ham değerlerden p50/p95/p99 (decode, hog_detect, yolo_forward,
+    yolo_postprocess, draw, encode)
+  - yakalama -> yayın gecikmesi ve en yüksek RSS
+
+Kullanım:
+  python benchmarks/bench_pipeline.py --out benchmarks/results/new.json
+  python benchmarks/bench_pipeline.py --baseline benchmarks/results/old.json --threshold 0.10
+
+--baseline verilirse aşama başına p50 gecikmeler ve FPS karşılaştırılır; eşikten fazla kötüleşme varsa çıkış kodu 1 olur. YOLO
+model dosyaları yoksa araç aşamaları "skipped" olarak işaretlenir.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from camera import VideoCamera  # noqa: E402
+from metrics import STAGE_SECONDS  # noqa: E402
+from synthetic import CLIPS, clip_path  # noqa: E402
+
+CLIP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clips")
+DEFAULT_OUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "pipeline.json")
+
+STAGES = ["decode", "hog_detect", "yolo_forward", "yolo_postprocess", "draw", "encode", "end_to_end"]
+YOLO_STAGES = ("yolo_forward", "yolo_postprocess")
+
+
+def percentiles(samples):
+    if not samples:
+        return None
+    arr = np.asarray(samples) * 1000.0
+    return {
+        "count": len(samples),
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p95_ms": round(float(np.percentile(arr, 95)), 3),
+        "p99_ms": round(float(np.percentile(arr, 99)), 3),
+        "mean_ms": round(float(arr.mean()), 3),
+    }
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux'ta KB, macOS'ta byte
+    return round(rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0, 1)
+
+
+def _viewer(hub, tier, stop_event):
+    """mjpeg_generator gibi: her yeni karenin görünümünü kodlatır."""
+    seq = 0
+    while not stop_event.is_set():
+        seq = hub.wait_next(seq, timeout=1.0)
+        if seq is None:
+            return
+        hub.jpeg(tier)
+
+
+def run_clip(path, frames, detect_vehicles, warmup=5, viewers=1, tier="full"):
+    camera = VideoCamera(source=path, stream_id="bench")
+    yolo_ok = detect_vehicles and camera.detector.car_detector.net is not None
+    camera.detect_vehicles = yolo_ok
+    # Dosya FPS'ine sabitleme kapalı (en yüksek hız); sonda başa sarılmaz
+    camera.frame_interval = 0.0
+    camera.reader.loop = False
+    hub = camera.hub
+
+    publishes = []
+    warm = threading.Event()
+    done = threading.Event()
+
+    def on_publish():
+        if hub.closed:
+            warm.set()
+            done.set()
+            return
+        publishes.append(time.perf_counter())
+        if len(publishes) == warmup + 1:
+            warm.set()
+        if len(publishes) >= frames + warmup + 1:
+            done.set()
+
+    hub.add_listener(on_publish)
+    stop_event = threading.Event()
+    threads = [
+        threading.Thread(target=_viewer, args=(hub, tier, stop_event), daemon=True)
+        for _ in range(viewers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    camera.start()
+    warm.wait(timeout=120.0)
+    STAGE_SECONDS.capture()
+    done.wait(timeout=max(60.0, frames * 2.0))
+    samples = STAGE_SECONDS.capture(enabled=False)
+    capture_latency = camera.capture_latency
+    stop_event.set()
+    camera.stop()
+    for thread in threads:
+        thread.join(timeout=5.0)
+
+    stamps = publishes[warmup:frames + warmup + 1]
+    intervals = list(np.diff(stamps)) if len(stamps) > 1 else []
+    stages = {}
+    for name in STAGES[:-1]:
+        if name in YOLO_STAGES and not yolo_ok:
+            stages[name] = {"skipped": True, "reason": "YOLO kapalı ya da model dosyaları yok"}
+            continue
+        stages[name] = percentiles(samples.get((name,)))
+    stages["end_to_end"] = percentiles(intervals)
+
+    return {
+        "frames": len(intervals),
+        "fps": round(len(intervals) / (stamps[-1] - stamps[0]), 2) if intervals else 0.0,
+        "capture_latency_ms": round(capture_latency * 1000.0, 3),
+        "viewers": viewers,
+        "encodes": dict(hub.encode_counts),
+        "stages": stages,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Eşikten fazla kötüleşen metriklerin listesi."""
+    regressions = []
+    for clip, cur in current["clips"].items():
+        base = baseline.get("clips", {}).get(clip)
+        if base is None:
+            continue
+        if base["fps"] and cur["fps"] < base["fps"] * (1 - threshold):
+            regressions.append(f"{clip}: fps {base['fps']} -> {cur['fps']}")
+        for stage, stats in cur["stages"].items():
+            b = base["stages"].get(stage)
+            if not stats or not b or stats.get("skipped") or b.get("skipped"):
+                continue
+            if "p50_ms" not in stats or "p50_ms" not in b:
+                continue
+            if b["p50_ms"] and stats["p50_ms"] > b["p50_ms"] * (1 + threshold):
+                regressions.append(
+                    f"{clip}/{stage}: p50 {b['p50_ms']} ms -> {stats['p50_ms']} ms"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--clips", default=",".join(CLIPS),
+                        help="Virgülle ayrılmış klip isimleri")
+    parser.add_argument("--frames", type=int, default=150)
+    parser.add_argument("--no-vehicles", action="store_true", help="YOLO aşamasını atla")
+    parser.add_argument("--viewers", type=int, default=1,
+                        help="Yayını kodlatan izleyici thread sayısı (0: kodlama yok)")
+    parser.add_argument("--tier", default="full", help="İzleyicilerin istediği JPEG katmanı")
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    parser.add_argument("--baseline", help="Karşılaştırılacak önceki JSON sonucu")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="İzin verilen kötüleşme oranı (0.10 = %%10)")
+    args = parser.parse_args()
+
+    result = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "cpu_count": os.cpu_count(),
+        "frames": args.frames,
+        "clips": {},
+    }
+    for name in [c.strip() for c in args.clips.split(",") if c.strip()]:
+        path = clip_path(name, CLIP_DIR, frames=args.frames + 10)
+        res = run_clip(path, args.frames, detect_vehicles=not args.no_vehicles,
+                       viewers=args.viewers, tier=args.tier)
+        result["clips"][name] = res
+        e2e = res["stages"]["end_to_end"]
+        if e2e is None:
+            print(f"{name:<14} yayın yok")
+            continue
+        print(
+            f"{name:<14} {res['fps']:>7.2f} fps   publish aralığı p50 {e2e['p50_ms']:.1f} ms  "
+            f"p99 {e2e['p99_ms']:.1f} ms   yakalama gecikmesi {res['capture_latency_ms']:.1f} ms"
+        )
+        for stage in STAGES[:-1]:
+            st = res["stages"][stage]
+            if st is None:
+                continue
+            if st.get("skipped"):
+                print(f"  {stage:<16} atlandı")
+            else:
+                print(f"  {stage:<16} p50 {st['p50_ms']:8.2f}  p95 {st['p95_ms']:8.2f}  p99 {st['p99_ms']:8.2f} ms")
+    result["peak_rss_mb"] = peak_rss_mb()
+    print(f"Peak RSS: {result['peak_rss_mb']} MB")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"Sonuç: {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print(f"Gerileme (> %{args.threshold * 100:.0f}):")
+            for r in regressions:
+                print("  " + r)
+            sys.exit(1)
+        print("Gerileme yok.")
+
+
+if __name__ == "__main__":
+    main()
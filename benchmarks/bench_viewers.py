@@ -0,0 +1,263 @@
+"""
+İzleyici yük testi: aynı stream'i N sahte MJPEG istemcisiyle izler ve
+Flask threaded sunucusu ile asyncio yayın sunucusunu karşılaştırır.
+
+Sunucu bu süreçte çalışır (sentetik video, tespit kapalı: ölçülen maliyet
+yayın tarafıdır); istemciler ayrı bir süreçte tek bir asyncio loop ile
+bağlanır. Ölçülenler:
+  - sustained: son 5 sn içinde kare almaya devam eden izleyici sayısı
+  - izleyici başına kare hızı ve ilk kare gecikmesi
+  - sunucu thread sayısı, RSS artışı / bağlantı, CPU ms / gönderilen kare
+
+Kullanım:
+  python benchmarks/bench_viewers.py --viewers 200 --duration 20
+  python benchmarks/bench_viewers.py --modes async --viewers 500 --tier thumb
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic import clip_path  # noqa: E402
+
+CLIP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clips")
+DEFAULT_OUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "viewers.json")
+STREAM_ID = "bench"
+BOUNDARY = b"--frame\r\n"
+
+
+# ---------- İstemci süreci ----------
+
+async def _viewer(port, path, cookie, stats, stop):
+    stats["started"] = time.monotonic()
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    except OSError:
+        stats["error"] = "connect"
+        return
+    writer.write(
+        f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n"
+        f"Cookie: {cookie}\r\n\r\n".encode("latin-1")
+    )
+    tail = b""
+    try:
+        while not stop.is_set():
+            chunk = await asyncio.wait_for(reader.read(65536), 10.0)
+            if not chunk:
+                stats["error"] = "closed"
+                break
+            stats["bytes"] += len(chunk)
+            data = tail + chunk
+            frames = data.count(BOUNDARY)
+            if frames:
+                now = time.monotonic()
+                if stats["first_frame"] is None:
+                    stats["first_frame"] = now - stats["started"]
+                stats["frames"] += frames
+                stats["last_frame"] = now
+            tail = data[-(len(BOUNDARY) - 1):]
+    except (asyncio.TimeoutError, ConnectionError):
+        stats["error"] = "timeout"
+    finally:
+        writer.close()
+
+
+async def _run_clients(port, path, cookie, viewers, duration, ramp_per_sec):
+    stop = asyncio.Event()
+    all_stats = []
+    tasks = []
+    for i in range(viewers):
+        stats = {"frames": 0, "bytes": 0, "first_frame": None, "last_frame": None, "error": None}
+        all_stats.append(stats)
+        tasks.append(asyncio.ensure_future(_viewer(port, path, cookie, stats, stop)))
+        if ramp_per_sec and (i + 1) % max(1, int(ramp_per_sec / 10)) == 0:
+            await asyncio.sleep(0.1)
+
+    t0 = time.monotonic()
+    frames0 = sum(s["frames"] for s in all_stats)
+    await asyncio.sleep(duration)
+    elapsed = time.monotonic() - t0
+    end = time.monotonic()
+    frames = sum(s["frames"] for s in all_stats) - frames0
+
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    sustained = sum(1 for s in all_stats if s["last_frame"] and end - s["last_frame"] < 5.0)
+    first = sorted(s["first_frame"] for s in all_stats if s["first_frame"] is not None)
+    errors = {}
+    for s in all_stats:
+        if s["error"]:
+            errors[s["error"]] = errors.get(s["error"], 0) + 1
+    return {
+        "viewers": viewers,
+        "sustained": sustained,
+        "frames": frames,
+        "fps_per_viewer": round(frames / elapsed / viewers, 2),
+        "total_mbit_per_sec": round(sum(s["bytes"] for s in all_stats) * 8 / elapsed / 1e6, 1),
+        "first_frame_p50_ms": round(first[len(first) // 2] * 1000, 1) if first else None,
+        "first_frame_max_ms": round(first[-1] * 1000, 1) if first else None,
+        "errors": errors,
+    }
+
+
+def client_main(conn, port, path, cookie, viewers, duration, ramp_per_sec):
+    try:
+        # Her bağlantı bir soket; varsayılan 1024 limiti yetmeyebilir
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, viewers * 2 + 64)), hard))
+    except (ValueError, OSError):
+        pass
+    conn.send(asyncio.run(_run_clients(port, path, cookie, viewers, duration, ramp_per_sec)))
+
+
+# ---------- Sunucu tarafı ölçüm ----------
+
+def rss_mb():
+    # Anlık RSS (Linux); yoksa tepe değer
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024.0 * 1024.0)
+    except OSError:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def start_threaded(app, port):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", port, app, threaded=True, request_handler=QuietHandler)
+    server.socket.listen(1024)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server.shutdown
+
+
+def start_async(app, port):
+    from async_server import AsyncStreamServer
+    server = AsyncStreamServer(app, host="127.0.0.1", port=port)
+    server.start()
+    return server.stop
+
+
+def run_mode(mode, app, cookie, args, port):
+    stop_server = start_threaded(app, port) if mode == "threaded" else start_async(app, port)
+    time.sleep(0.5)
+    threads0, rss0 = threading.active_count(), rss_mb()
+    cpu0 = cpu_seconds()
+
+    ctx = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = ctx.Pipe()
+    path = f"/video_feed/{STREAM_ID}?tier={args.tier}&fps={args.fps}"
+    client = ctx.Process(
+        target=client_main,
+        args=(child_conn, port, path, cookie, args.viewers, args.duration, args.ramp),
+    )
+    client.start()
+
+    # Yük altındaki tepe değerler
+    peak_threads, peak_rss = threads0, rss0
+    while not parent_conn.poll(0.5):
+        peak_threads = max(peak_threads, threading.active_count())
+        peak_rss = max(peak_rss, rss_mb())
+        if not client.is_alive():
+            break
+    result = parent_conn.recv()
+    client.join()
+    cpu = cpu_seconds() - cpu0
+
+    stop_server()
+    # Threaded modda bağlantı thread'leri istemci kapanınca sonlanır
+    time.sleep(1.0)
+
+    connected = max(result["sustained"], 1)
+    result.update({
+        "mode": mode,
+        "server_threads_idle": threads0,
+        "server_threads_peak": peak_threads,
+        "rss_idle_mb": round(rss0, 1),
+        "rss_peak_mb": round(peak_rss, 1),
+        "rss_per_viewer_kb": round((peak_rss - rss0) * 1024.0 / connected, 1),
+        "server_cpu_ms_per_frame": round(cpu * 1000.0 / result["frames"], 3) if result["frames"] else None,
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--modes", default="threaded,async")
+    parser.add_argument("--viewers", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20.0, help="Ölçüm süresi (sn)")
+    parser.add_argument("--ramp", type=float, default=200.0, help="Saniyede açılan bağlantı")
+    parser.add_argument("--tier", default="thumb")
+    parser.add_argument("--fps", type=float, default=10.0, help="İzleyici başına kare hızı sınırı")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    args = parser.parse_args()
+
+    # Uygulama modülü içe aktarılınca create_app() bir kez çalışır
+    from app import app
+
+    clip = clip_path("people_720p", CLIP_DIR, frames=250)
+    app.streams.add(STREAM_ID, {"video_path": clip, "detect_people": False})
+    cookie = "{}={}".format(
+        app.config["SESSION_COOKIE_NAME"],
+        app.session_interface.get_signing_serializer(app).dumps(
+            {"user": {"id": 0, "username": "bench", "role": "user"}}
+        ),
+    )
+
+    result = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "viewers": args.viewers,
+        "duration": args.duration,
+        "tier": args.tier,
+        "fps_limit": args.fps,
+        "modes": {},
+    }
+    for i, mode in enumerate(m.strip() for m in args.modes.split(",") if m.strip()):
+        res = run_mode(mode, app, cookie, args, args.port + i)
+        result["modes"][mode] = res
+        print(
+            f"{mode:<9} sustained {res['sustained']}/{res['viewers']}  "
+            f"{res['fps_per_viewer']:.2f} fps/izleyici  "
+            f"threads {res['server_threads_idle']} -> {res['server_threads_peak']}  "
+            f"RSS {res['rss_idle_mb']} -> {res['rss_peak_mb']} MB "
+            f"({res['rss_per_viewer_kb']} KB/izleyici)  "
+            f"CPU {res['server_cpu_ms_per_frame']} ms/kare  "
+            f"ilk kare p50 {res['first_frame_p50_ms']} ms  hatalar {res['errors']}"
+        )
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"Sonuç: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+YOLO çıktı decode mikrobenchmark'ı: eski satır satır Python döngüsü ile
+CarDetectorYOLO.decode_outputs (NumPy) karşılaştırması.
+
+Kullanım:
+  # Gerçek ağ çıktılarını kaydet (models/ altında YOLO dosyaları gerekli)
+  python benchmarks/bench_yolo_decode.py --record videos/traffic.mp4 --frames 50
+
+  # Kayıtlı çıktılar üzerinde ölç
+  python benchmarks/bench_yolo_decode.py --outputs benchmarks/yolo_outputs.npz
+
+Kayıt yoksa yolov3-tiny çıktı boyutlarında (507 + 2028 satır) sentetik
+çıktı üretilir.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection import CarDetectorYOLO  # noqa: E402
+
+DEFAULT_OUTPUTS = os.path.join(os.path.dirname(__file__), "yolo_outputs.npz")
+
+# coco.names yoksa araç sınıflarını doğru indekste tutan yedek liste
+_VEHICLE_IDS = {2: "car", 3: "motorbike", 5: "bus", 7: "truck"}
+
+
+def fallback_classes(num_classes=80):
+    return [_VEHICLE_IDS.get(i, f"class{i}") for i in range(num_classes)]
+
+
+def decode_loop(outs, width, height, classes, vehicle_classes,
+                conf_threshold=0.5, nms_threshold=0.4):
+    """Vektörleştirme öncesi detect_vehicles decode kodu (referans)."""
+    boxes = []
+    confidences = []
+
+    for out in outs:
+        for detection in out:
+            scores = detection[5:]
+            class_id = int(np.argmax(scores))
+            confidence = float(scores[class_id])
+            if confidence > conf_threshold:
+                class_name = classes[class_id] if class_id < len(classes) else ""
+                if class_name in vehicle_classes:
+                    center_x = int(detection[0] * width)
+                    center_y = int(detection[1] * height)
+                    w = int(detection[2] * width)
+                    h = int(detection[3] * height)
+                    x = int(center_x - w / 2)
+                    y = int(center_y - h / 2)
+
+                    boxes.append([x, y, w, h])
+                    confidences.append(confidence)
+
+    idxs = cv2.dnn.NMSBoxes(boxes, confidences, conf_threshold, nms_threshold)
+    final_boxes = []
+    if len(idxs) > 0:
+        for i in idxs.flatten():
+            final_boxes.append(tuple(boxes[i]))
+    return final_boxes
+
+
+def synthetic_outputs(num_frames, seed=0, num_classes=80):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(num_frames):
+        outs = []
+        for rows in (507, 2028):
+            out = np.zeros((rows, 5 + num_classes), dtype=np.float32)
+            out[:, :4] = rng.random((rows, 4), dtype=np.float32) * [1, 1, 0.3, 0.3]
+            out[:, 4] = rng.random(rows, dtype=np.float32)
+            out[:, 5:] = rng.random((rows, num_classes), dtype=np.float32) * 0.2
+            # Satırların ~%2'sinde güçlü bir sınıf skoru
+            hot = rng.random(rows) < 0.02
+            out[hot, 5 + rng.integers(0, num_classes, hot.sum())] = 0.6 + 0.4 * rng.random(hot.sum())
+            outs.append(out)
+        frames.append((outs, 1280, 720))
+    return frames
+
+
+def record_outputs(video_path, num_frames, out_path):
+    det = CarDetectorYOLO()
+    if det.net is None:
+        sys.exit("YOLO model dosyaları bulunamadı (models/). Kayıt yapılamıyor.")
+
+    cap = cv2.VideoCapture(video_path)
+    arrays = {}
+    n = 0
+    while n < num_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        h, w = frame.shape[:2]
+        blob = cv2.dnn.blobFromImage(frame, 1 / 255.0, (416, 416), swapRB=True, crop=False)
+        det.net.setInput(blob)
+        for k, out in enumerate(det.net.forward(det.output_layers)):
+            arrays[f"f{n}_o{k}"] = out
+        arrays[f"f{n}_size"] = np.array([w, h])
+        n += 1
+    cap.release()
+    np.savez_compressed(out_path, **arrays)
+    print(f"{n} karenin çıktısı kaydedildi: {out_path}")
+
+
+def load_outputs(path):
+    data = np.load(path)
+    frames = []
+    n = 0
+    while f"f{n}_size" in data:
+        outs = []
+        k = 0
+        while f"f{n}_o{k}" in data:
+            outs.append(data[f"f{n}_o{k}"])
+            k += 1
+        w, h = data[f"f{n}_size"]
+        frames.append((outs, int(w), int(h)))
+        n += 1
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", metavar="VIDEO", help="Ağ çıktısını bu videodan kaydet")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--outputs", default=DEFAULT_OUTPUTS)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.record:
+        record_outputs(args.record, args.frames, args.outputs)
+        return
+
+    if os.path.exists(args.outputs):
+        frames = load_outputs(args.outputs)
+        print(f"Kayıtlı çıktılar: {args.outputs} ({len(frames)} kare)")
+    else:
+        frames = synthetic_outputs(args.frames)
+        print(f"Kayıt bulunamadı, sentetik çıktı kullanılıyor ({len(frames)} kare)")
+
+    det = CarDetectorYOLO()
+    if not det.classes:
+        det.set_classes(fallback_classes(frames[0][0][0].shape[1] - 5))
+
+    def run_old():
+        return [decode_loop(o, w, h, det.classes, det.vehicle_classes,
+                            det.conf_threshold, det.nms_threshold)
+                for o, w, h in frames]
+
+    def run_new():
+        return [det.decode_outputs(o, w, h) for o, w, h in frames]
+
+    # Isınma + sonuç karşılaştırması (eski NMS sınıf bağımsız olduğu için
+    # sadece kutu sayıları raporlanır)
+    old_res, new_res = run_old(), run_new()
+    old_n = sum(len(r) for r in old_res)
+    new_n = sum(len(r) for r in new_res)
+
+    results = {}
+    for name, fn in (("loop", run_old), ("numpy", run_new)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t0)
+        results[name] = best / len(frames) * 1000.0
+
+    print(f"{'decode':<8} {'ms/kare':>10}")
+    print(f"{'loop':<8} {results['loop']:>10.3f}")
+    print(f"{'numpy':<8} {results['numpy']:>10.3f}")
+    print(f"Hızlanma: {results['loop'] / results['numpy']:.1f}x")
+    print(f"Kutu sayısı: loop={old_n} numpy={new_n} (numpy sınıf bazlı NMS)")
+
+
+if __name__ == "__main__":
+    main()
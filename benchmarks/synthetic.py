@@ -0,0 +1,107 @@
+"""
+Benchmark'lar için deterministik sentetik video üretici (indirme gerekmez).
+Sahnede hareket eden dikdörtgenler (araç benzeri) ve basit insan
+figürleri (kafa + gövde + bacaklar) bulunur. Aynı seed aynı videoyu üretir.
+"""
+import os
+
+import cv2
+import numpy as np
+
+
+def _draw_person(frame, x, y, scale, color):
+    """(x, y): ayakların ortası. Yükseklik ~ 160 * scale piksel."""
+    h = int(160 * scale)
+    head_r = max(3, int(h * 0.09))
+    cx = int(x)
+    top = int(y) - h
+    cv2.circle(frame, (cx, top + head_r), head_r, color, -1)
+    body_top = top + 2 * head_r
+    body_bottom = top + int(h * 0.6)
+    cv2.ellipse(
+        frame, (cx, (body_top + body_bottom) // 2),
+        (max(3, int(h * 0.13)), (body_bottom - body_top) // 2),
+        0, 0, 360, color, -1,
+    )
+    leg = max(2, int(h * 0.05))
+    cv2.line(frame, (cx, body_bottom), (cx - int(h * 0.1), int(y)), color, leg)
+    cv2.line(frame, (cx, body_bottom), (cx + int(h * 0.1), int(y)), color, leg)
+
+
+def render_frame(i, width, height, objects, background):
+    frame = background.copy()
+    for obj in objects:
+        t = i * obj["speed"]
+        x = (obj["x0"] + t) % (width + 200) - 100
+        if obj["kind"] == "rect":
+            w, h = obj["w"], obj["h"]
+            cv2.rectangle(frame, (int(x), obj["y"]), (int(x) + w, obj["y"] + h), obj["color"], -1)
+            cv2.rectangle(frame, (int(x) + 5, obj["y"] + 5), (int(x) + w // 3, obj["y"] + h // 2), (40, 40, 40), -1)
+        else:
+            _draw_person(frame, x, obj["y"], obj["scale"], obj["color"])
+    return frame
+
+
+def make_scene(width, height, num_rects=3, num_people=4, seed=0):
+    rng = np.random.default_rng(seed)
+    # Dokulu arka plan (tamamen düz sahne HOG için gerçekçi değil)
+    background = rng.integers(90, 140, (height, width, 3), dtype=np.uint8)
+    background = cv2.GaussianBlur(background, (7, 7), 0)
+    cv2.line(background, (0, int(height * 0.75)), (width, int(height * 0.75)), (70, 70, 70), 4)
+
+    objects = []
+    for _ in range(num_rects):
+        objects.append({
+            "kind": "rect",
+            "x0": float(rng.integers(0, width)),
+            "y": int(rng.integers(height // 2, int(height * 0.8))),
+            "w": int(rng.integers(width // 10, width // 6)),
+            "h": int(rng.integers(height // 12, height // 8)),
+            "speed": float(rng.uniform(2, 8)),
+            "color": tuple(int(c) for c in rng.integers(0, 255, 3)),
+        })
+    for _ in range(num_people):
+        objects.append({
+            "kind": "person",
+            "x0": float(rng.integers(0, width)),
+            "y": int(rng.integers(int(height * 0.6), height - 5)),
+            "scale": float(rng.uniform(0.9, 1.6)) * height / 720,
+            "speed": float(rng.uniform(0.5, 2.5)),
+            "color": tuple(int(c) for c in rng.integers(10, 60, 3)),
+        })
+    return objects, background
+
+
+def make_synthetic_video(path, frames=250, width=1280, height=720, fps=25,
+                         num_rects=3, num_people=4, seed=0, overwrite=False):
+    """Videoyu path'e yazar (MJPG/AVI) ve path'i döner. Varsa yeniden üretmez."""
+    if os.path.exists(path) and not overwrite:
+        return path
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    objects, background = make_scene(width, height, num_rects, num_people, seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"VideoWriter açılamadı: {path}")
+    try:
+        for i in range(frames):
+            writer.write(render_frame(i, width, height, objects, background))
+    finally:
+        writer.release()
+    return path
+
+
+# Benchmark'larda kullanılan standart klipler
+CLIPS = {
+    "people_720p": dict(width=1280, height=720, num_rects=0, num_people=6, seed=1),
+    "traffic_720p": dict(width=1280, height=720, num_rects=6, num_people=1, seed=2),
+    "mixed_1080p": dict(width=1920, height=1080, num_rects=3, num_people=4, seed=3),
+}
+
+
+def clip_path(name, directory, frames=250):
+    return make_synthetic_video(
+        os.path.join(directory, f"{name}_{frames}.avi"),
+        frames=frames,
+        **CLIPS[name],
+    )
@@ -1,83 +1,686 @@
-# camera.py
 import cv2
+import numpy as np
+import threading
 import time
-from detection import ObjectDetector
+from capture import FrameReader
+from detection import ObjectDetector, count_labels, draw_boxes
+from detection_cache import cache_scope, file_identity
+from governor import FrameGovernor, QUALITY_LEVELS
+from motion import MotionGate
+from metrics import stage_timer
+from tracking import BoxTracker
+from zones import ZoneSet
 
-# Stream çalışan tarafta güncellenen global sayaçlar
-latest_counts = {
-    "person": 0,
-    "vehicle": 0,
-    "last_update": 0.0,
+_ENCODE_TIME = stage_timer("encode")
+
+
+# Kodlama katmanları: isim -> (maksimum yükseklik, JPEG kalitesi).
+# Yükseklik None ise kare orijinal boyutunda kodlanır.
+JPEG_TIERS = {
+    "full": (None, 85),
+    "720p": (720, 75),
+    "480p": (480, 70),
+    "thumb": (240, 60),
 }
 
 
+def encode_jpeg(frame_bgr, max_height=None, quality=85):
+    h, w = frame_bgr.shape[:2]
+    if max_height is not None and h > max_height:
+        scale = max_height / h
+        frame_bgr = cv2.resize(
+            frame_bgr, (int(w * scale), max_height),
+            interpolation=cv2.INTER_AREA,
+        )
+    ret, jpeg = cv2.imencode(
+        ".jpg", frame_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)]
+    )
+    return jpeg.tobytes() if ret else None
+
+
+def draw_overlay(frame_bgr, meta, zone_color=(255, 200, 0)):
+    """
+    Metadatadaki bölge poligonlarını ve kutuları karenin üzerine (yerinde)
+    çizer. Kare metadatadaki boyuttan farklıysa koordinatlar ölçeklenir.
+    """
+    h, w = frame_bgr.shape[:2]
+    sx = w / meta["width"] if meta.get("width") else 1.0
+    sy = h / meta["height"] if meta.get("height") else 1.0
+    scaled = sx != 1.0 or sy != 1.0
+
+    polygons = [np.asarray(z["points"], dtype=np.float32) for z in meta.get("zones") or []]
+    if polygons:
+        if scaled:
+            polygons = [p * (sx, sy) for p in polygons]
+        cv2.polylines(
+            frame_bgr, [p.astype(np.int32) for p in polygons], True, zone_color, 2, cv2.LINE_AA
+        )
+
+    boxes = meta.get("boxes") or []
+    if scaled:
+        boxes = [
+            (int(x * sx), int(y * sy), int(bw * sx), int(bh * sy), label)
+            for (x, y, bw, bh, label) in boxes
+        ]
+    return draw_boxes(frame_bgr, boxes)
+
+
+class FrameHub:
+    """
+    Tek üretici (kamera worker'ı) -> çok tüketici (izleyiciler).
+    Sadece en son kare tutulur; yavaş istemci aradaki kareleri atlar,
+    böylece izleyici başına kuyruk / birikme oluşmaz.
+
+    Kare ham (BGR, çizimsiz) ve tespit metadatasıyla (kutular, bölgeler)
+    birlikte yayınlanır. Her (katman, çizimli/çizimsiz) görünüm ilk
+    isteyen izleyici tarafından bir kez kodlanır; aynı görünümü isteyen
+    diğer izleyiciler önbellekten alır. Kutular sadece çizimli görünümü
+    isteyen varsa, kare başına bir kez çizilir; çizilecek bir şey yoksa iki
+    görünüm aynı kodlamayı paylaşır. Kodlama maliyeti izleyici sayısıyla
+    değil kullanılan görünüm sayısıyla artar; izleyici yoksa hiç kodlanmaz.
+    """
+    def __init__(self, tiers=None):
+        self.tiers = dict(tiers or JPEG_TIERS)
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._frame = None
+        self._meta = None
+        self._annotated = None
+        self._encoded = {}
+        self._closed = False
+        self._annotate_lock = threading.Lock()
+        self._encode_locks = {
+            (name, annotated): threading.Lock()
+            for name in self.tiers for annotated in (True, False)
+        }
+        self.encode_counts = {}
+        self.viewers = 0
+        # Yeni kare / kapanışta çağrılan geri çağrılar (ör. asyncio sunucusu)
+        self._listeners = []
+
+    def publish(self, frame_bgr, meta=None):
+        """frame_bgr: çizimsiz kare; meta: kutular / bölgeler / sayaçlar (JSON'a uygun)."""
+        with self._cond:
+            self._frame = frame_bgr
+            self._annotated = None
+            self._encoded = {}
+            self._seq += 1
+            self._meta = dict(meta, seq=self._seq) if meta is not None else None
+            self._cond.notify_all()
+            listeners = list(self._listeners)
+        for callback in listeners:
+            callback()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            listeners = list(self._listeners)
+        for callback in listeners:
+            callback()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def latest(self):
+        """En son kare: (seq, çizimsiz BGR kare, meta); kare salt okunur kullanılmalı."""
+        with self._cond:
+            return self._seq, self._frame, self._meta
+
+    @property
+    def meta(self):
+        """En son karenin tespit metadatası (seq dahil) ya da None."""
+        return self._meta
+
+    def add_viewer(self, delta=1):
+        with self._cond:
+            self.viewers += delta
+
+    def add_listener(self, callback):
+        """callback() üretici thread'inden çağrılır; kısa ve bloklamayan olmalı."""
+        with self._cond:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._cond:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def wait_next(self, last_seq, timeout=5.0):
+        """
+        last_seq'ten daha yeni bir kare gelene kadar bekler.
+        Dönüş: en son seq; hub kapandıysa None. Zaman aşımında last_seq
+        aynen döner.
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._seq != last_seq or self._closed, timeout
+            )
+            if self._closed:
+                return None
+            return self._seq
+
+    @staticmethod
+    def _has_overlay(meta):
+        return bool(meta and (meta.get("boxes") or meta.get("zones")))
+
+    def _view(self, tier, annotated, meta):
+        # Çizilecek bir şey yoksa çizimli görünüm çizimsizle aynıdır
+        return (tier, bool(annotated) and self._has_overlay(meta))
+
+    def cached_jpeg(self, tier="full", annotated=True):
+        """Kodlanmışsa en son karenin JPEG'i, değilse (seq, None); kodlama yapmaz."""
+        with self._cond:
+            return self._seq, self._encoded.get(self._view(tier, annotated, self._meta))
+
+    def jpeg(self, tier="full", annotated=True):
+        """En son karenin istenen görünümdeki JPEG'i: (seq, bytes)."""
+        max_height, quality = self.tiers[tier]
+        with self._cond:
+            seq, frame, meta, cache = self._seq, self._frame, self._meta, self._encoded
+        if frame is None:
+            return seq, None
+
+        view = self._view(tier, annotated, meta)
+        with self._encode_locks[view]:
+            data = cache.get(view)
+            if data is None:
+                if view[1]:
+                    frame = self._annotated_frame(seq, frame, meta)
+                t0 = time.perf_counter()
+                data = encode_jpeg(frame, max_height, quality)
+                _ENCODE_TIME.observe(time.perf_counter() - t0)
+                cache[view] = data
+                name = tier if view[1] else f"{tier}:clean"
+                self.encode_counts[name] = self.encode_counts.get(name, 0) + 1
+        return seq, data
+
+    def _annotated_frame(self, seq, frame, meta):
+        """Kutuları çizilmiş kopya; kare başına bir kez çizilir."""
+        with self._annotate_lock:
+            cached = self._annotated
+            if cached is not None and cached[0] == seq:
+                return cached[1]
+            annotated = draw_overlay(frame.copy(), meta)
+            with self._cond:
+                if self._seq == seq:
+                    self._annotated = (seq, annotated)
+            return annotated
+
+
 class VideoCamera:
-    def __init__(self, source=0):
+    def __init__(self, source=0, stream_id="default", pool=None, batcher=None,
+                 writer=None, log_interval=5.0, cache=None):
         """
         source:
           - int -> webcam index (0)
           - str -> video dosya yolu
+        pool:
+          - DetectionPool verilirse tespit ortak havuzda çalışır; havuz
+            doluysa o karede son tespit sonucu tekrar kullanılır.
+        batcher:
+          - BatchInferenceService verilirse YOLO diğer stream'lerle
+            birlikte toplu çalışır.
+        writer:
+          - DetectionWriter verilirse sayaçlar log_interval saniyede bir
+            (izleyici olsun olmasın) geçmişe yazılır.
+        cache:
+          - DetectionCache verilirse dosya kaynaklarında tespit sonuçları
+            kare indeksine göre saklanır; döngünün sonraki turlarında
+            çıkarım yapılmaz.
         """
         self.source = source
+        self.stream_id = stream_id
+        self.pool = pool
+        self.writer = writer
+        self.log_interval = log_interval
+        self._last_log = 0.0
         self.cap = cv2.VideoCapture(source)
         if not self.cap.isOpened():
             raise RuntimeError(f"Video kaynağı açılamadı: {source}")
 
-        self.detector = ObjectDetector()
+        self.detector = ObjectDetector(vehicle_batcher=batcher)
 
         # Kullanıcı ayarları:
         self.detect_people = True
         self.detect_vehicles = False
+        # Tam tespit her N karede bir; aradaki kareler tracker ile taşınır.
+        # Tracker güveni eşik altına düşerse N beklenmeden tespit yapılır.
+        self.detect_interval = 1
+        self.min_track_confidence = 0.6
+
+        # Hareket kapısı (None = kapalı). motion_regions açıksa tespit
+        # sadece hareketli bölgelerde yapılır.
+        self.motion_gate = None
+        self.motion_regions = False
+
+        # Kare bütçesi yöneticisi (None = kapalı, her zaman tam kalite).
+        # Son seviyede priority dışındaki dedektör kapatılır.
+        self.governor = None
+        self.priority = "person"
+
+        # ROI / sayım bölgeleri (None = tüm kare)
+        self.zones = None
+        self.zone_counts = {}
+
+        self.tracker = BoxTracker()
+        self.track_confidence = 1.0
+        self.detected_frames = 0
+        self.tracked_frames = 0
+        self._frames_since_detect = 0
 
         # Anlık istatistikler:
         self.person_count = 0
         self.vehicle_count = 0
         self.last_update = 0.0
+        self.frames = 0
+        self.shed_frames = 0
+        self._last_boxes = []
+        self._last_counts = {"person": 0, "vehicle": 0}
+        self.last_meta = None
+
+        # Sayaçlar değiştikçe artan sürüm; SSE istemcileri bunu bekler
+        self.stats_version = 0
+        self._stats_cond = threading.Condition()
+
+        # Dosya kaynaklarında oynatma hızını videonun kendi FPS'ine sabitle
+        self.is_file = isinstance(source, str)
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if self.is_file else 0.0
+        self.frame_interval = 1.0 / fps if fps and fps > 0 else 0.0
+
+        # Sonuç önbelleği sadece dosyalarda anlamlı (kare indeksi tekrar eder)
+        self.cache = cache if self.is_file else None
+        self._source_id = file_identity(source) if self.cache is not None else None
+        self.cache_hits = 0
+
+        # Decode ayrı thread'de: canlı kaynakta en yeni kare kazanır,
+        # dosyada hiç kare düşürülmez
+        self.reader = FrameReader(self.cap, live=not self.is_file)
+        self.frame_index = 0
+        self.capture_latency = 0.0
+        self.fps = 0.0
+        self._last_frame_ts = None
+
+        # Arka plan worker'ı ve yayın hub'ı
+        self.hub = FrameHub()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stop_event = threading.Event()
 
     def __del__(self):
         if hasattr(self, "cap") and self.cap is not None and self.cap.isOpened():
             self.cap.release()
 
+    def start(self):
+        """Worker thread'i başlatır (idempotent)."""
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self.reader.start()
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f"camera-{self.stream_id}",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        with self._thread_lock:
+            thread = self._thread
+            self._thread = None
+        self.reader.stop()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5.0)
+        self.hub.close()
+        self._notify_stats()
+        if self.cap is not None and self.cap.isOpened():
+            self.cap.release()
+
+    def _run(self):
+        """
+        Her kare tek sefer okunur ve tespit edilir; sonuç hub üzerinden
+        tüm izleyicilere dağıtılır.
+        """
+        next_ts = time.monotonic()
+        while not self._stop_event.is_set():
+            frame_bgr = self.get_frame()
+            if frame_bgr is None:
+                break
+
+            # Kare çizimsiz yayınlanır; kutular metadatayla birlikte gider,
+            # çizim + kodlama izleyici tarafında görünüm başına bir kez yapılır
+            self.hub.publish(frame_bgr, self.last_meta)
+
+            if self.frame_interval > 0:
+                next_ts += self.frame_interval
+                delay = next_ts - time.monotonic()
+                if delay > 0:
+                    self._stop_event.wait(delay)
+                else:
+                    # Geride kaldıysak birikmiş beklemeyi sıfırla
+                    next_ts = time.monotonic()
+        self.hub.close()
+
     def get_frame(self):
-        ret, frame = self.cap.read()
-        if not ret:
-            # Video dosyası bitti ise başa sar
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            ret, frame = self.cap.read()
-            if not ret:
+        item = None
+        while item is None:
+            item = self.reader.read(timeout=1.0)
+            if item is None and (self.reader.ended or self._stop_event.is_set()):
                 return None
+        self.frame_index, frame, capture_ts = item
+        t_start = time.perf_counter()
 
-        boxes, counts = self.detector.detect(
-            frame,
-            detect_people=self.detect_people,
-            detect_vehicles=self.detect_vehicles,
-        )
+        boxes, counts = self._process(frame)
+        self.last_meta = self._frame_meta(frame, boxes, counts)
 
-        frame_out = self.detector.draw_boxes(frame, boxes)
+        governor = self.governor
+        if governor is not None and governor.observe(time.perf_counter() - t_start):
+            self._apply_quality()
 
-        self.person_count = counts.get("person", 0)
-        self.vehicle_count = counts.get("vehicle", 0)
+        self.frames += 1
+        person_count = counts.get("person", 0)
+        vehicle_count = counts.get("vehicle", 0)
+        changed = (person_count, vehicle_count) != (self.person_count, self.vehicle_count)
+        self.person_count = person_count
+        self.vehicle_count = vehicle_count
         self.last_update = time.time()
+        # Yakalama -> işlenmiş kare gecikmesi ve kare hızı (üstel ortalama)
+        now = time.monotonic()
+        latency = now - capture_ts
+        self.capture_latency += 0.1 * (latency - self.capture_latency)
+        if self._last_frame_ts is not None and now > self._last_frame_ts:
+            self.fps += 0.1 * (1.0 / (now - self._last_frame_ts) - self.fps)
+        self._last_frame_ts = now
+        if changed:
+            self._notify_stats()
+
+        if self.writer is not None and self.last_update - self._last_log >= self.log_interval:
+            self._last_log = self.last_update
+            self.writer.submit(self.stream_id, person_count, vehicle_count)
+
+        return frame
+
+    def _frame_meta(self, frame, boxes, counts):
+        """Karenin tespit metadatası; istemciler kutuları bundan çizer."""
+        zones = self.zones
+        return {
+            "stream_id": self.stream_id,
+            "frame_index": self.frame_index,
+            "ts": time.time(),
+            "width": frame.shape[1],
+            "height": frame.shape[0],
+            "boxes": [[int(x), int(y), int(w), int(h), label] for (x, y, w, h, label) in boxes],
+            "counts": {"person": counts.get("person", 0), "vehicle": counts.get("vehicle", 0)},
+            "zone_counts": self.zone_counts,
+            "zones": zones.polygons() if zones is not None else [],
+        }
+
+    def apply_config(self, config):
+        """normalize_config() çıktısındaki kaynak dışı ayarları uygular."""
+        self.detect_people = config["detect_people"]
+        self.detect_vehicles = config["detect_vehicles"]
+        self.detect_interval = config["detect_interval"]
+        self.set_motion_gate(config["motion_gate"], config["motion_regions"])
+        self.set_zones(config["zones"])
+        self.detector.people_detector.configure(
+            tiles=config["hog_tiles"],
+            tile_overlap=config["hog_overlap"],
+            win_stride=config["hog_win_stride"],
+            scale=config["hog_scale"],
+        )
+        self.priority = config["priority"]
+        self.set_target_fps(config["target_fps"])
+
+    def set_target_fps(self, target_fps):
+        """0 / None governor'ı kapatır; kalite tam seviyeye döner."""
+        if not target_fps:
+            self.governor = None
+        elif self.governor is None or self.governor.target_fps != float(target_fps):
+            self.governor = FrameGovernor(target_fps)
+        self._apply_quality()
+
+    def _apply_quality(self):
+        level = self.governor.settings if self.governor is not None else QUALITY_LEVELS[0]
+        self.detector.people_detector.max_width = level["hog_max_width"]
+        self.detector.vehicle_input_size = level["yolo_input"]
+
+    def _detect_interval(self):
+        """Governor'ın seyreltmesiyle birlikte geçerli tespit aralığı."""
+        if self.governor is None:
+            return self.detect_interval
+        return self.detect_interval * self.governor.settings["interval_factor"]
+
+    def _detectors(self):
+        """Geçerli (insan, araç) dedektör seçimi."""
+        people, vehicles = self.detect_people, self.detect_vehicles
+        if self.governor is not None and self.governor.settings["drop_secondary"] \
+                and people and vehicles:
+            if self.priority == "vehicle":
+                people = False
+            else:
+                vehicles = False
+        return people, vehicles
+
+    def set_motion_gate(self, enabled, regions=False):
+        if enabled and self.motion_gate is None:
+            self.motion_gate = MotionGate()
+        elif not enabled:
+            self.motion_gate = None
+        self.motion_regions = bool(regions)
+
+    def set_zones(self, zones):
+        """zones: normalize_zones() çıktısı; boş liste bölgeleri kaldırır."""
+        self.zones = ZoneSet(zones) if zones else None
+        self.zone_counts = {}
+
+    def _notify_stats(self):
+        with self._stats_cond:
+            self.stats_version += 1
+            self._stats_cond.notify_all()
+
+    def wait_stats(self, last_version, timeout=15.0):
+        """
+        Sayaçlar last_version'dan sonra değişene kadar bekler.
+        Dönüş: güncel sürüm (zaman aşımında last_version).
+        """
+        with self._stats_cond:
+            self._stats_cond.wait_for(
+                lambda: self.stats_version != last_version, timeout
+            )
+            return self.stats_version
+
+    def _should_detect(self):
+        interval = self._detect_interval()
+        if interval <= 1 or not self.tracker.active:
+            return True
+        if self._frames_since_detect >= interval - 1:
+            return True
+        return self.track_confidence < self.min_track_confidence
+
+    def _process(self, frame):
+        """
+        Kare için (boxes, counts): gerekiyorsa tam tespit, değilse
+        son tespitten bu yana tracker ile taşınan kutular.
+        Sayaçlar son tam tespitten gelir, böylece ara karelerde oynamaz.
+        """
+        use_tracker = self._detect_interval() > 1
 
-        # Global sayaçları da güncelle
-        latest_counts["person"] = self.person_count
-        latest_counts["vehicle"] = self.vehicle_count
-        latest_counts["last_update"] = self.last_update
+        regions = None
+        cacheable = True
+        gate = self.motion_gate
+        if gate is not None:
+            moving, motion_regions = gate.check(frame)
+            if not moving:
+                # Sahne durağan: son tespit ve sayaçlar aynen kullanılır
+                return self._last_boxes, self._last_counts
+            if self.motion_regions and motion_regions:
+                regions = motion_regions
+                # Hareket bölgeleri geçmişe bağlı; sonuç önbelleğe alınamaz
+                cacheable = False
 
-        return frame_out
+        zones = self.zones
+        if zones is not None:
+            # Tespit sadece ROI kutularında (varsa hareketle kesişiminde)
+            zones.prepare(frame.shape[1], frame.shape[0])
+            regions = zones.regions if regions is None else zones.clip_regions(regions)
+            if not regions:
+                return self._last_boxes, self._last_counts
 
+        if self._should_detect():
+            result = self._detect_cached(frame, regions, cacheable)
+            if result is not None:
+                boxes, counts = result
+                if regions is not None:
+                    boxes, counts = self._merge_static(boxes, regions)
+                if zones is not None:
+                    boxes, counts, self.zone_counts = zones.assign(boxes)
+                self.detected_frames += 1
+                self._frames_since_detect = 0
+                if use_tracker:
+                    self.tracker.reset(frame, boxes)
+                    self.track_confidence = 1.0
+                self._last_boxes = boxes
+                self._last_counts = counts
+                return boxes, counts
+            # Havuz dolu: bu karede tespit yok
+            self.shed_frames += 1
 
-def mjpeg_generator(camera: VideoCamera):
-    while True:
-        frame_bgr = camera.get_frame()
-        if frame_bgr is None:
-            break
+        self._frames_since_detect += 1
+        if use_tracker and self.tracker.active:
+            boxes, self.track_confidence = self.tracker.track(frame)
+            self.tracked_frames += 1
+            self._last_boxes = boxes
+        return self._last_boxes, self._last_counts
 
-        ret, jpeg = cv2.imencode(".jpg", frame_bgr)
-        if not ret:
-            continue
-        data = jpeg.tobytes()
-        yield (
-            b"--frame\r\n"
-            b"Content-Type: image/jpeg\r\n\r\n" + data + b"\r\n"
+    def _merge_static(self, boxes, regions):
+        """
+        Bölge tespitinde, hareket bölgelerinin dışında kalan eski kutular
+        (duran nesneler) korunur; yoksa sayaçlar düşerdi.
+        """
+        kept = []
+        for box in self._last_boxes:
+            x, y, w, h = box[:4]
+            inside = any(
+                x < rx + rw and rx < x + w and y < ry + rh and ry < y + h
+                for (rx, ry, rw, rh) in regions
+            )
+            if not inside:
+                kept.append(box)
+        merged = kept + list(boxes)
+        return merged, count_labels(merged)
+
+    def _cache_settings(self):
+        """Tespit sonucunu etkileyen ayarlar (önbellek kapsamı için)."""
+        pd = self.detector.people_detector
+        return (
+            self._detectors(), self.detector.vehicle_input_size,
+            pd.max_width, pd.win_stride, pd.scale, pd.tiles, pd.tile_overlap,
+            self.zones.zones if self.zones is not None else None,
         )
+
+    def _detect_cached(self, frame, regions, cacheable):
+        """_detect; dosya kaynağında sonuç önbellekteyse çıkarım yapılmaz."""
+        cache = self.cache if cacheable else None
+        if cache is None:
+            return self._detect(frame, regions)
+
+        scope = cache_scope(self._source_id, self._cache_settings())
+        boxes = cache.get(scope, self.frame_index)
+        if boxes is not None:
+            self.cache_hits += 1
+            return boxes, count_labels(boxes)
+
+        result = self._detect(frame, regions)
+        if result is not None:
+            cache.put(scope, self.frame_index, result[0])
+        return result
+
+    def _detect(self, frame, regions=None):
+        """Tam (ya da bölge) tespit; havuz doluysa None döner."""
+        people, vehicles = self._detectors()
+        kwargs = {
+            "detect_people": people,
+            "detect_vehicles": vehicles,
+        }
+        if regions is not None:
+            fn, args = self.detector.detect_regions, (frame, regions)
+        else:
+            fn, args = self.detector.detect, (frame,)
+
+        if self.pool is None:
+            return fn(*args, **kwargs)
+
+        future = self.pool.submit(fn, *args, **kwargs)
+        if future is None:
+            return None
+        return future.result()
+
+    def stats(self):
+        return {
+            "stream_id": self.stream_id,
+            "person": self.person_count,
+            "vehicle": self.vehicle_count,
+            "last_update": self.last_update,
+            "frames": self.frames,
+            "shed_frames": self.shed_frames,
+            "detected_frames": self.detected_frames,
+            "tracked_frames": self.tracked_frames,
+            "cache_hits": self.cache_hits,
+            "detect_interval": self.detect_interval,
+            "track_confidence": round(self.track_confidence, 3),
+            "encodes": dict(self.hub.encode_counts),
+            "capture_latency_ms": round(self.capture_latency * 1000.0, 1),
+            "fps": round(self.fps, 2),
+            "viewers": self.hub.viewers,
+            "reader": self.reader.stats(),
+            "motion_gate": self.motion_gate.stats() if self.motion_gate is not None else None,
+            "quality": self.governor.stats() if self.governor is not None else None,
+            "zones": self.zone_counts,
+            "running": self._thread is not None and self._thread.is_alive(),
+        }
+
+
+def mjpeg_generator(camera: VideoCamera, tier="full", max_fps=None, annotate=True):
+    """
+    tier: JPEG_TIERS anahtarı. max_fps: bu istemci için kare hızı sınırı;
+    aradaki kareler atlanır, istemci her zaman en yeni kareyi alır.
+    annotate=False: kutusuz kare (istemci /api/detections ile kendisi çizer).
+    """
+    # Worker zaten çalışıyorsa tekrar başlatmaz
+    camera.start()
+
+    min_interval = 1.0 / max_fps if max_fps else 0.0
+    last_seq = 0
+    next_ts = 0.0
+    camera.hub.add_viewer()
+    try:
+        while True:
+            if min_interval:
+                delay = next_ts - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+            seq = camera.hub.wait_next(last_seq)
+            if seq is None:
+                break
+            if seq == last_seq:
+                continue
+
+            seq, data = camera.hub.jpeg(tier, annotate)
+            if data is None:
+                continue
+            last_seq = seq
+            next_ts = time.monotonic() + min_interval
+            yield (
+                b"--frame\r\n"
+                b"Content-Type: image/jpeg\r\n\r\n" + data + b"\r\n"
+            )
+    finally:
+        camera.hub.add_viewer(-1)
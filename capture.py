@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from metrics import stage_timer
+
+_DECODE_TIME = stage_timer("decode")
+
+
+class FrameReader:
+    """
+    cap.read() çağrılarını ayrı bir thread'de yapar ve kareleri sınırlı
+    bir ring buffer'a koyar; böylece decode, tespit ile paralel çalışır.
+
+    Kaynağa göre düşürme politikası:
+      - live=True  (RTSP / USB): "en yeni kazanır". Buffer doluysa en eski
+        kare atılır; tüketici yavaşsa gecikme birikmez.
+      - live=False (dosya): "asla düşürme". Buffer doluysa okuyucu bekler;
+        dosya sonunda başa sarar (loop=True).
+
+    Thread başlatılmadan read() çağrılırsa kare senkron okunur; prime()
+    ile önceden okunan kare ilk read()'de döner.
+    Kuyruktaki her öğe: (frame_idx, frame, capture_ts).
+    """
+    def __init__(self, cap, live, capacity=None, loop=True):
+        self.cap = cap
+        self.live = live
+        self.loop = loop
+        self.capacity = capacity or (2 if live else 8)
+
+        self._buf = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._ended = False
+        self._next_idx = 0
+
+        self.decoded = 0
+        self.dropped = 0
+        self.rewinds = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def ended(self):
+        return self._ended
+
+    def start(self):
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="frame-reader", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        thread = self._thread
+        self._thread = None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5.0)
+
+    def _decode(self):
+        """Bir kare okur; dosya bittiyse başa sarar. Bitişte None döner."""
+        t0 = time.perf_counter()
+        ret, frame = self.cap.read()
+        if not ret and self.loop and not self.live:
+            # Video dosyası bitti ise başa sar
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self._next_idx = 0
+            self.rewinds += 1
+            ret, frame = self.cap.read()
+        if not ret:
+            return None
+        _DECODE_TIME.observe(time.perf_counter() - t0)
+
+        item = (self._next_idx, frame, time.monotonic())
+        self._next_idx += 1
+        self.decoded += 1
+        return item
+
+    def prime(self):
+        """
+        İlk kareyi okuyup tampona koyar ve döndürür (kaynak açılınca boyutu
+        öğrenmek için; kare kaybolmaz). Kaynak kare vermezse None.
+        """
+        with self._cond:
+            if self._buf:
+                return self._buf[0][1]
+        item = self._decode()
+        if item is None:
+            return None
+        with self._cond:
+            self._buf.appendleft(item)
+            self._cond.notify_all()
+        return item[1]
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            item = self._decode()
+            if item is None:
+                break
+
+            with self._cond:
+                if self.live:
+                    if len(self._buf) >= self.capacity:
+                        self._buf.popleft()
+                        self.dropped += 1
+                else:
+                    self._cond.wait_for(
+                        lambda: len(self._buf) < self.capacity or self._stop_event.is_set()
+                    )
+                    if self._stop_event.is_set():
+                        break
+                self._buf.append(item)
+                self._cond.notify_all()
+
+        with self._cond:
+            self._ended = True
+            self._cond.notify_all()
+
+    def read(self, timeout=1.0):
+        """
+        Sıradaki kare: (frame_idx, frame, capture_ts).
+        Zaman aşımında ya da akış bittiğinde None (bitiş için ended'a bakılır).
+        """
+        if self._thread is None:
+            with self._cond:
+                if self._buf:
+                    return self._buf.popleft()
+            item = self._decode()
+            if item is None:
+                self._ended = True
+            return item
+
+        with self._cond:
+            self._cond.wait_for(lambda: self._buf or self._ended, timeout)
+            if not self._buf:
+                return None
+            if self.live:
+                # En yeni kare alınır, geride kalanlar atılır
+                item = self._buf.pop()
+                self.dropped += len(self._buf)
+                self._buf.clear()
+            else:
+                item = self._buf.popleft()
+            self._cond.notify_all()
+            return item
+
+    def stats(self):
+        return {
+            "policy": "latest" if self.live else "no-drop",
+            "capacity": self.capacity,
+            "buffered": len(self._buf),
+            "decoded": self.decoded,
+            "dropped": self.dropped,
+            "rewinds": self.rewinds,
+        }
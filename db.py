@@ -1,24 +1,173 @@
 # db.py
 import sqlite3
 import os
+import queue
+import threading
+import time
 from datetime import datetime
 from flask import g, current_app
 from werkzeug.security import generate_password_hash, check_password_hash
 
+from metrics import stage_timer
+
+_DB_WRITE_TIME = stage_timer("db_write")
+
+
+def get_db_path(app=None):
+    app = app or current_app
+    return os.path.join(app.instance_path, "app.db")
+
+
+def configure_connection(conn, cache_kb=8192, mmap_mb=64, busy_timeout_ms=5000):
+    """Bağlantı başına bir kez uygulanan PRAGMA'lar (journal_mode DB'de kalıcıdır)."""
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+    conn.execute(f"PRAGMA cache_size={-int(cache_kb)}")
+    conn.execute(f"PRAGMA mmap_size={int(mmap_mb) * 1024 * 1024}")
+    return conn
+
+
+class ConnectionPool:
+    """
+    Kalıcı SQLite bağlantıları. Threaded Flask sunucusu her istek için yeni
+    thread açtığından thread-local yerine havuz kullanılır: istek ilk
+    get_db()'de bir bağlantı alır, teardown'da geri bırakır. PRAGMA'lar
+    bağlantı açılırken bir kez uygulanır; sqlite3'ün bağlantı başına hazır
+    ifade önbelleği (cached_statements) ve sayfa önbelleği bağlantı
+    yaşadıkça istekler arasında korunur.
+
+    Boşta en fazla size bağlantı tutulur; hepsi kullanımdaysa yeni bağlantı
+    açılır (istek bekletilmez), geri bırakılınca fazlası kapatılır.
+    size=0 eski davranıştır: her istek kendi bağlantısını açıp kapatır.
+    readonly=True bağlantılar PRAGMA query_only ile sadece okur.
+    """
+    def __init__(self, path, size=8, readonly=False, cache_kb=8192, mmap_mb=64,
+                 busy_timeout_ms=5000):
+        self.path = path
+        self.size = size
+        self.readonly = readonly
+        self.cache_kb = cache_kb
+        self.mmap_mb = mmap_mb
+        self.busy_timeout_ms = busy_timeout_ms
+        self._idle = queue.LifoQueue()   # son kullanılan (sıcak) bağlantı önce
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self.opened = 0
+        self.reused = 0
+        self.closed = 0
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.path,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            cached_statements=256,
+        )
+        conn.row_factory = sqlite3.Row
+        configure_connection(conn, self.cache_kb, self.mmap_mb, self.busy_timeout_ms)
+        if self.readonly:
+            conn.execute("PRAGMA query_only=1")
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            return self._open()
+        with self._lock:
+            self.reused += 1
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            # Yarım kalan işlem bir sonraki isteğe taşınmasın
+            conn.rollback()
+        if self._idle.qsize() < self.size:
+            self._idle.put(conn)
+            return
+        conn.close()
+        with self._lock:
+            self.closed += 1
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "opened": self.opened,
+            "reused": self.reused,
+            "closed": self.closed,
+            "readonly": self.readonly,
+        }
+
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _pool(readonly=False):
+    """current_app'in DB dosyası için (yazma ya da okuma) havuzu."""
+    key = (get_db_path(), readonly)
+    pool = _POOLS.get(key)
+    if pool is None:
+        config = current_app.config
+        with _POOLS_LOCK:
+            pool = _POOLS.get(key)
+            if pool is None:
+                pool = _POOLS[key] = ConnectionPool(
+                    key[0],
+                    size=config.get("DB_POOL_SIZE", 8),
+                    readonly=readonly,
+                    cache_kb=config.get("DB_CACHE_KB", 8192),
+                    mmap_mb=config.get("DB_MMAP_MB", 64),
+                    busy_timeout_ms=config.get("DB_BUSY_TIMEOUT_MS", 5000),
+                )
+    return pool
+
 
 def get_db():
+    """İstek boyunca kullanılan (yazma) bağlantı."""
     if "db" not in g:
-        os.makedirs(current_app.instance_path, exist_ok=True)
-        db_path = os.path.join(current_app.instance_path, "app.db")
-        g.db = sqlite3.connect(db_path, detect_types=sqlite3.PARSE_DECLTYPES)
-        g.db.row_factory = sqlite3.Row
+        g.db = _pool().acquire()
     return g.db
 
 
+def get_read_db():
+    """
+    Geçmiş sorguları için salt okunur bağlantı; WAL sayesinde yazıcıyı
+    (DetectionWriter) beklemez, yazma bağlantılarıyla havuz paylaşmaz.
+    """
+    if "read_db" not in g:
+        g.read_db = _pool(readonly=True).acquire()
+    return g.read_db
+
+
 def close_db(e=None):
     db = g.pop("db", None)
     if db is not None:
-        db.close()
+        _pool().release(db)
+    read_db = g.pop("read_db", None)
+    if read_db is not None:
+        _pool(readonly=True).release(read_db)
+
+
+def pool_stats():
+    """current_app'in yazma / okuma havuzlarının sayaçları."""
+    path = get_db_path()
+    return {
+        name: (_POOLS[(path, readonly)].stats() if (path, readonly) in _POOLS else None)
+        for name, readonly in (("write", False), ("read", True))
+    }
 
 
 def _ensure_column(db, table_name: str, column_name: str, column_def_sql: str):
@@ -36,9 +185,12 @@ def _ensure_column(db, table_name: str, column_name: str, column_def_sql: str):
         db.commit()
 
 
-def init_db():
-    db = get_db()
-
+def _migration_base_schema(db):
+    """
+    1: detections / detection_rollups / users tabloları. Sürüm tablosundan
+    önceki kurulumlarda tablolar zaten olabilir; adımlar tekrar
+    çalıştırılabilir (IF NOT EXISTS, _ensure_column).
+    """
     # ---- detections tablosu ----
     db.execute(
         """
@@ -54,6 +206,49 @@ def init_db():
 
     # vehicle_count kolonu yoksa ekle
     _ensure_column(db, "detections", "vehicle_count", "INTEGER NOT NULL DEFAULT 0")
+    _ensure_column(db, "detections", "stream_id", "TEXT NOT NULL DEFAULT 'default'")
+
+    # Zaman aralığı sorguları için epoch saniye + index
+    _ensure_column(db, "detections", "ts_epoch", "INTEGER")
+    db.execute(
+        "UPDATE detections SET ts_epoch = CAST(strftime('%s', ts) AS INTEGER) "
+        "WHERE ts_epoch IS NULL"
+    )
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_detections_ts "
+        "ON detections (ts_epoch)"
+    )
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_detections_stream_ts "
+        "ON detections (stream_id, ts_epoch)"
+    )
+    db.commit()
+
+    # ---- detection_rollups tablosu (dakika / saat / gün özetleri) ----
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS detection_rollups (
+            bucket TEXT NOT NULL,
+            stream_id TEXT NOT NULL,
+            bucket_start INTEGER NOT NULL,
+            samples INTEGER NOT NULL,
+            person_sum INTEGER NOT NULL,
+            person_min INTEGER NOT NULL,
+            person_max INTEGER NOT NULL,
+            vehicle_sum INTEGER NOT NULL,
+            vehicle_min INTEGER NOT NULL,
+            vehicle_max INTEGER NOT NULL,
+            PRIMARY KEY (bucket, stream_id, bucket_start)
+        ) WITHOUT ROWID;
+        """
+    )
+    db.commit()
+
+    # Özet tablosu boş ama ham veri varsa (eski kurulum) bir kez doldur
+    has_rollups = db.execute("SELECT 1 FROM detection_rollups LIMIT 1").fetchone()
+    has_raw = db.execute("SELECT 1 FROM detections LIMIT 1").fetchone()
+    if has_raw and not has_rollups:
+        _rebuild_rollups(db)
 
     # ---- users tablosu ----
     db.execute(
@@ -68,6 +263,76 @@ def init_db():
     )
     db.commit()
 
+
+def _migration_clips(db):
+    """2: alarm klipleri dizini (stream / zaman / tetik ile aranır)."""
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS clips (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            stream_id TEXT NOT NULL,
+            trigger TEXT NOT NULL,
+            start_epoch REAL NOT NULL,
+            end_epoch REAL NOT NULL,
+            path TEXT NOT NULL,
+            frames INTEGER NOT NULL,
+            bytes INTEGER NOT NULL,
+            peak_person INTEGER NOT NULL,
+            peak_vehicle INTEGER NOT NULL
+        );
+        """
+    )
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_clips_stream_start ON clips (stream_id, start_epoch)"
+    )
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_clips_trigger_start ON clips (trigger, start_epoch)"
+    )
+    db.execute("CREATE INDEX IF NOT EXISTS idx_clips_start ON clips (start_epoch)")
+    db.commit()
+
+
+def _migration_rollup_time_index(db):
+    """3: özetlerin zaman sırasıyla (stream'ler arası) dışa aktarımı için."""
+    db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_rollups_bucket_start "
+        "ON detection_rollups (bucket, bucket_start, stream_id)"
+    )
+    db.commit()
+
+
+# Şema sürümleri: (sürüm, fonksiyon). Yeni değişiklik listenin sonuna eklenir;
+# her adım bir kez, sırayla çalışır ve schema_version'a işlenir.
+MIGRATIONS = [
+    (1, _migration_base_schema),
+    (2, _migration_clips),
+    (3, _migration_rollup_time_index),
+]
+
+
+def _migrate(db):
+    db.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    row = db.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    current = row[0] or 0
+    for version, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        migration(db)
+        db.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+        db.commit()
+        current = version
+    return current
+
+
+def init_db():
+    db = get_db()
+
+    # WAL: okuyucular (ör. /api/history) yazıcıyı beklemez. Ayar DB
+    # dosyasında kalıcıdır.
+    db.execute("PRAGMA journal_mode=WAL")
+
+    _migrate(db)
+
     # Eğer hiç user yoksa default admin & demo kullanıcılarını ekle
     cur = db.execute("SELECT COUNT(*) AS cnt FROM users")
     cnt = cur.fetchone()["cnt"]
@@ -87,24 +352,596 @@ def init_db():
 
 # ---------- Detection log fonksiyonları ----------
 
-def log_detection(person_count: int, vehicle_count: int):
-    db = get_db()
-    ts = datetime.utcnow().isoformat()
-    db.execute(
-        "INSERT INTO detections (ts, person_count, vehicle_count) VALUES (?, ?, ?)",
-        (ts, person_count, vehicle_count),
-    )
+_INSERT_DETECTION_SQL = (
+    "INSERT INTO detections (ts, person_count, vehicle_count, stream_id, ts_epoch) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+
+# Özet katmanları: isim -> saniye
+ROLLUP_BUCKETS = {"minute": 60, "hour": 3600, "day": 86400}
+
+_UPSERT_ROLLUP_SQL = """
+    INSERT INTO detection_rollups (
+        bucket, stream_id, bucket_start, samples,
+        person_sum, person_min, person_max,
+        vehicle_sum, vehicle_min, vehicle_max
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (bucket, stream_id, bucket_start) DO UPDATE SET
+        samples = samples + excluded.samples,
+        person_sum = person_sum + excluded.person_sum,
+        person_min = MIN(person_min, excluded.person_min),
+        person_max = MAX(person_max, excluded.person_max),
+        vehicle_sum = vehicle_sum + excluded.vehicle_sum,
+        vehicle_min = MIN(vehicle_min, excluded.vehicle_min),
+        vehicle_max = MAX(vehicle_max, excluded.vehicle_max)
+"""
+
+
+def _detection_row(stream_id, person_count, vehicle_count, ts_epoch=None):
+    ts_epoch = time.time() if ts_epoch is None else ts_epoch
+    ts = datetime.utcfromtimestamp(ts_epoch).isoformat()
+    return (ts, int(person_count), int(vehicle_count), stream_id, int(ts_epoch))
+
+
+def _rollup_rows(rows):
+    """
+    Ham satırları (ts, person, vehicle, stream_id, ts_epoch) her özet
+    katmanı için kova bazında toplar; UPSERT parametreleri döner.
+    """
+    acc = {}
+    for _, person, vehicle, stream_id, ts_epoch in rows:
+        for bucket, size in ROLLUP_BUCKETS.items():
+            key = (bucket, stream_id, ts_epoch - ts_epoch % size)
+            a = acc.get(key)
+            if a is None:
+                acc[key] = [1, person, person, person, vehicle, vehicle, vehicle]
+            else:
+                a[0] += 1
+                a[1] += person
+                a[2] = min(a[2], person)
+                a[3] = max(a[3], person)
+                a[4] += vehicle
+                a[5] = min(a[5], vehicle)
+                a[6] = max(a[6], vehicle)
+    return [key + tuple(a) for key, a in acc.items()]
+
+
+def _write_detections(db, rows):
+    """Ham satırları ve özet güncellemelerini aynı transaction'da yazar."""
+    t0 = time.perf_counter()
+    db.executemany(_INSERT_DETECTION_SQL, rows)
+    db.executemany(_UPSERT_ROLLUP_SQL, _rollup_rows(rows))
+    _DB_WRITE_TIME.observe(time.perf_counter() - t0)
+
+
+def _rebuild_rollups(db):
+    db.execute("DELETE FROM detection_rollups")
+    for bucket, size in ROLLUP_BUCKETS.items():
+        db.execute(
+            """
+            INSERT INTO detection_rollups
+            SELECT ?, stream_id, ts_epoch - ts_epoch % ?, COUNT(*),
+                   SUM(person_count), MIN(person_count), MAX(person_count),
+                   SUM(vehicle_count), MIN(vehicle_count), MAX(vehicle_count)
+            FROM detections
+            WHERE ts_epoch IS NOT NULL
+            GROUP BY stream_id, ts_epoch - ts_epoch % ?
+            """,
+            (bucket, size, size),
+        )
     db.commit()
 
 
-def get_recent_detections(limit: int = 50):
+def prune_detections(db, retention):
+    """
+    retention: {"raw": gün, "minute": gün, ...}; None olan katman silinmez.
+    Dönüş: silinen satır sayısı.
+    """
+    now = int(time.time())
+    deleted = 0
+    with db:
+        days = retention.get("raw")
+        if days is not None:
+            deleted += db.execute(
+                "DELETE FROM detections WHERE ts_epoch < ?",
+                (now - int(days * 86400),),
+            ).rowcount
+        for bucket in ROLLUP_BUCKETS:
+            days = retention.get(bucket)
+            if days is not None:
+                deleted += db.execute(
+                    "DELETE FROM detection_rollups WHERE bucket = ? AND bucket_start < ?",
+                    (bucket, now - int(days * 86400)),
+                ).rowcount
+    return deleted
+
+
+def log_detection(person_count: int, vehicle_count: int, stream_id: str = "default"):
     db = get_db()
+    with db:
+        _write_detections(db, [_detection_row(stream_id, person_count, vehicle_count)])
+
+
+def get_recent_detections(limit: int = 50, stream_id: str | None = None):
+    db = get_read_db()
+    if stream_id is None:
+        cur = db.execute(
+            "SELECT ts, person_count, vehicle_count, stream_id FROM detections "
+            "ORDER BY id DESC LIMIT ?",
+            (limit,),
+        )
+    else:
+        # (stream_id, ts_epoch) index'i sırayı da verir; id DESC geçici
+        # sıralama ağacı (tüm stream satırlarını tarama) gerektirir
+        cur = db.execute(
+            "SELECT ts, person_count, vehicle_count, stream_id FROM detections "
+            "WHERE stream_id = ? ORDER BY ts_epoch DESC, id DESC LIMIT ?",
+            (stream_id, limit),
+        )
+    return cur.fetchall()
+
+
+def parse_bucket(value):
+    """
+    "raw", "minute"/"hour"/"day" ya da "15m", "6h", "1d", "300" (saniye)
+    biçimindeki kova boyunu saniyeye çevirir. "raw" için 0 döner.
+    """
+    value = str(value).strip().lower()
+    if value == "raw":
+        return 0
+    if value in ROLLUP_BUCKETS:
+        return ROLLUP_BUCKETS[value]
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    try:
+        if value and value[-1] in units:
+            seconds = int(value[:-1]) * units[value[-1]]
+        else:
+            seconds = int(value)
+    except ValueError:
+        raise ValueError(f"Geçersiz kova: {value}")
+    if seconds < 60 or seconds % 60:
+        raise ValueError("Kova en az 1 dakika ve dakikanın katı olmalı.")
+    return seconds
+
+
+def auto_bucket(from_ts, to_ts, max_points=500, starts=None):
+    """
+    bucket verilmeyen aralık sorgusu için özet katmanı (kova boyu, sn).
+    En fazla max_points nokta veren katmanlardan, from_ts'i kapsayan
+    (retention ile o döneme kadar budanmamış) en incesi seçilir; hiçbiri
+    kapsamıyorsa verisi en eskiye uzanan katman. starts: katman -> ilk
+    kova (export_coverage); verilmezse sadece nokta sayısına bakılır.
+
+    "İsteği kapsayan en kaba katman" her zaman gün katmanı olurdu (kısa
+    aralıkta tek nokta); bu yüzden önce nokta sınırı, sonra kapsama.
+    """
+    span = max(to_ts - from_ts, 1)
+    layers = sorted(ROLLUP_BUCKETS, key=ROLLUP_BUCKETS.get)
+    fitting = [name for name in layers if span / ROLLUP_BUCKETS[name] <= max_points]
+    fitting = fitting or layers[-1:]
+    if starts is None:
+        return ROLLUP_BUCKETS[fitting[0]]
+    for name in fitting:
+        size = ROLLUP_BUCKETS[name]
+        if starts.get(name) is not None and starts[name] <= from_ts - from_ts % size:
+            return size
+    known = [name for name in fitting if starts.get(name) is not None]
+    if not known:
+        return ROLLUP_BUCKETS[fitting[0]]
+    return ROLLUP_BUCKETS[min(known, key=lambda name: starts[name])]
+
+
+def query_history(from_ts, to_ts, bucket_seconds, stream_id=None, raw_limit=10000):
+    """
+    [from_ts, to_ts) aralığında geçmiş. bucket_seconds 0 ise ham satırlar,
+    değilse kova boyunu tam bölen en kaba özet katmanı kullanılır ve
+    sonuç SQL içinde istenen kova boyuna toplanır. Ham yolda olduğu gibi
+    her satır tek stream'e aittir (kova + stream_id başına bir satır);
+    min / max / ortalama o stream'in kovadaki örnekleridir, stream'ler
+    birbirine katılmaz.
+    """
+    db = get_read_db()
+    stream_sql = " AND stream_id = ?" if stream_id else ""
+    stream_args = (stream_id,) if stream_id else ()
+
+    if bucket_seconds == 0:
+        cur = db.execute(
+            "SELECT ts_epoch, person_count, vehicle_count, stream_id FROM detections "
+            "WHERE ts_epoch >= ? AND ts_epoch < ?" + stream_sql +
+            " ORDER BY ts_epoch LIMIT ?",
+            (from_ts, to_ts) + stream_args + (raw_limit,),
+        )
+        return [
+            {
+                "ts": datetime.utcfromtimestamp(r["ts_epoch"]).isoformat(),
+                "bucket_start": r["ts_epoch"],
+                "person_count": r["person_count"],
+                "vehicle_count": r["vehicle_count"],
+                "stream_id": r["stream_id"],
+            }
+            for r in cur.fetchall()
+        ]
+
+    source = max(
+        (name for name, size in ROLLUP_BUCKETS.items() if bucket_seconds % size == 0),
+        key=ROLLUP_BUCKETS.get,
+    )
+    size = ROLLUP_BUCKETS[source]
+    # Başlangıç kaynak katmanın kova sınırına yuvarlanır
+    from_ts -= from_ts % size
     cur = db.execute(
-        "SELECT ts, person_count, vehicle_count FROM detections "
-        "ORDER BY id DESC LIMIT ?",
-        (limit,),
+        """
+        SELECT bucket_start - bucket_start % ? AS t,
+               stream_id,
+               SUM(samples) AS samples,
+               SUM(person_sum) AS person_sum,
+               MIN(person_min) AS person_min,
+               MAX(person_max) AS person_max,
+               SUM(vehicle_sum) AS vehicle_sum,
+               MIN(vehicle_min) AS vehicle_min,
+               MAX(vehicle_max) AS vehicle_max
+        FROM detection_rollups
+        WHERE bucket = ? AND bucket_start >= ? AND bucket_start < ?
+        """ + stream_sql + """
+        GROUP BY t, stream_id ORDER BY t, stream_id
+        """,
+        (bucket_seconds, source, from_ts, to_ts) + stream_args,
     )
-    return cur.fetchall()
+    return [
+        {
+            "ts": datetime.utcfromtimestamp(r["t"]).isoformat(),
+            "bucket_start": r["t"],
+            "samples": r["samples"],
+            "person_avg": round(r["person_sum"] / r["samples"], 2),
+            "person_min": r["person_min"],
+            "person_max": r["person_max"],
+            "vehicle_avg": round(r["vehicle_sum"] / r["samples"], 2),
+            "vehicle_min": r["vehicle_min"],
+            "vehicle_max": r["vehicle_max"],
+            "stream_id": r["stream_id"],
+        }
+        for r in cur.fetchall()
+    ]
+
+
+# ---------- Toplu dışa aktarım ----------
+
+# Ham satırlarda id tamsayı, bucket "raw", samples 1'dir. Özet satırlarında
+# id "<bucket>/<stream_id>", sayaçlar kova ortalamasıdır (samples örnekten).
+EXPORT_COLUMNS = (
+    "id", "ts_epoch", "ts", "stream_id", "person_count", "vehicle_count", "bucket", "samples",
+)
+# İnceden kabaya; her dönem verisi kalan en ince katmandan okunur
+EXPORT_LAYERS = ("raw",) + tuple(sorted(ROLLUP_BUCKETS, key=ROLLUP_BUCKETS.get))
+
+_RAW_EXPORT_SQL = (
+    "SELECT id, ts_epoch, ts, stream_id, person_count, vehicle_count, 'raw', 1 "
+    "FROM detections WHERE ts_epoch >= ? AND ts_epoch < ? AND (ts_epoch, id) > (?, ?)"
+    "{streams} ORDER BY ts_epoch, id LIMIT ?"
+)
+_ROLLUP_EXPORT_SQL = (
+    "SELECT bucket || '/' || stream_id, bucket_start, "
+    "strftime('%Y-%m-%dT%H:%M:%S', bucket_start, 'unixepoch'), stream_id, "
+    "ROUND(CAST(person_sum AS REAL) / samples, 2), "
+    "ROUND(CAST(vehicle_sum AS REAL) / samples, 2), bucket, samples "
+    "FROM detection_rollups WHERE bucket = ? AND bucket_start >= ? AND bucket_start < ? "
+    "AND (bucket_start, stream_id) > (?, ?){streams} ORDER BY bucket_start, stream_id LIMIT ?"
+)
+
+
+def read_pool():
+    """
+    current_app'in salt okunur havuzu; istek bağlamı dışında çalışan
+    üreticiler (akış yanıtları) bağlantıyı kendisi alıp bırakır.
+    """
+    return _pool(readonly=True)
+
+
+def export_coverage(conn):
+    """Katman -> en eski kaydın zamanı (katman boşsa None)."""
+    starts = {"raw": conn.execute("SELECT MIN(ts_epoch) FROM detections").fetchone()[0]}
+    for bucket in ROLLUP_BUCKETS:
+        starts[bucket] = conn.execute(
+            "SELECT MIN(bucket_start) FROM detection_rollups WHERE bucket = ?", (bucket,)
+        ).fetchone()[0]
+    return starts
+
+
+def export_segments(from_ts, to_ts, starts):
+    """
+    [from_ts, to_ts) aralığını eskiden yeniye (katman, başlangıç, bitiş)
+    bölümlerine ayırır. Veri en ince katmandan okunur; bir özet katmanı
+    sadece ince katmanın ilk kaydını içeren kovadan önce de kayıt
+    tutuyorsa (ince katman retention ile budanmışsa) ve sadece o dönem
+    için kullanılır. Budanmamış geçmişin başındaki yarım kova özet
+    sayılmaz. İnce katmanın ilk (yarım) kovası özetten tam okunur ve ince
+    bölüm kova sınırından başlar; özet kovaları ince satırlarla
+    çakışmaz, örnekler iki kez sayılmaz.
+    """
+    segments = []
+    covered = None   # ince katmanların verisinin başladığı an
+    for layer in EXPORT_LAYERS:
+        start = starts.get(layer)
+        if start is None:
+            continue
+        size = ROLLUP_BUCKETS.get(layer)
+        seg_from = max(from_ts - from_ts % size if size else from_ts, start)
+        if covered is None:
+            if seg_from < to_ts:
+                segments.append((layer, seg_from, to_ts))
+            covered = start
+            continue
+        if from_ts >= covered or start >= covered - covered % size:
+            continue
+        # Sınırdan önceki ince bölümler özet kovalarına bırakılır
+        boundary = -(-covered // size) * size
+        while segments and segments[-1][2] <= boundary:
+            segments.pop()
+        if segments:
+            finer, finer_from, finer_to = segments[-1]
+            segments[-1] = (finer, max(finer_from, boundary), finer_to)
+        seg_to = min(boundary, to_ts)
+        if seg_from < seg_to:
+            segments.append((layer, seg_from, seg_to))
+        covered = start
+    segments.reverse()
+    return segments
+
+
+def _stream_filter(stream_ids):
+    if stream_ids and len(stream_ids) == 1:
+        # (stream_id, zaman) index'i sırayı da verir
+        return " AND stream_id = ?", tuple(stream_ids)
+    if stream_ids:
+        # Birden fazla stream'de o index her chunk'ta geçici sıralama ister
+        # (kalan aralığın tamamı); "+" ile zaman index'i kullanılır
+        return f" AND +stream_id IN ({', '.join('?' * len(stream_ids))})", tuple(stream_ids)
+    return "", ()
+
+
+def _layer_after(layer, after):
+    """İmleci (ts_epoch, id) katmanın anahtarına çevirir: ham id ya da stream_id."""
+    ts_epoch, key = after
+    key = str(key)
+    if layer == "raw":
+        # Başka katmana ait imleç: o saniyedeki satırlar atlanır
+        return ts_epoch, int(key) if key.isdigit() else 2 ** 63 - 1
+    bucket, sep, stream_id = key.partition("/")
+    return ts_epoch, stream_id if sep and bucket == layer else "\U0010ffff"
+
+
+def iter_detection_chunks(conn, from_ts, to_ts, stream_ids=None, after=None, chunk_size=5000,
+                          segments=None):
+    """
+    [from_ts, to_ts) geçmişi (EXPORT_COLUMNS sırasıyla tuple), zaman
+    sırasında chunk_size'lık listeler halinde. segments verilmezse
+    export_segments() ile kurulur (ham veri + eski dönem için özetler).
+
+    Her chunk ayrı ve kısa bir sorgudur: son satırın (zaman, anahtar)
+    değeri bir sonrakinin başlangıcıdır (keyset; OFFSET yok). Uzun süre
+    açık kalan bir okuma işlemi olmadığından yazıcı ve WAL checkpoint'i
+    bekletilmez. after=(ts_epoch, id) verilirse o satırdan sonrası gelir.
+    """
+    if segments is None:
+        segments = export_segments(from_ts, to_ts, export_coverage(conn))
+    stream_sql, stream_args = _stream_filter(stream_ids)
+    for layer, seg_from, seg_to in segments:
+        if after is not None and after[0] >= seg_to:
+            continue
+        if layer == "raw":
+            sql, prefix, key_col = _RAW_EXPORT_SQL.format(streams=stream_sql), (), 0
+            last_ts, last_key = seg_from, 0
+        else:
+            sql, prefix, key_col = _ROLLUP_EXPORT_SQL.format(streams=stream_sql), (layer,), 3
+            last_ts, last_key = seg_from, ""
+        if after is not None and after[0] >= seg_from:
+            last_ts, last_key = _layer_after(layer, after)
+        while True:
+            cur = conn.cursor()
+            cur.row_factory = None   # sqlite3.Row yerine düz tuple: daha hızlı
+            # Index araması son satırın zamanından başlar; satır değeri
+            # karşılaştırması sadece aynı saniyedeki satırları eler
+            rows = cur.execute(
+                sql,
+                prefix + (max(seg_from, last_ts), seg_to, last_ts, last_key)
+                + stream_args + (chunk_size,),
+            ).fetchall()
+            cur.close()
+            if rows:
+                yield rows
+            if len(rows) < chunk_size:
+                break
+            last_ts, last_key = rows[-1][1], rows[-1][key_col]
+
+
+# ---------- Alarm klipleri ----------
+
+_CLIP_COLUMNS = (
+    "id, stream_id, trigger, start_epoch, end_epoch, path, frames, bytes, "
+    "peak_person, peak_vehicle"
+)
+
+
+def insert_clip(db, stream_id, trigger, start_epoch, end_epoch, path, frames,
+                nbytes, peak_person, peak_vehicle):
+    with db:
+        cur = db.execute(
+            "INSERT INTO clips (stream_id, trigger, start_epoch, end_epoch, path, "
+            "frames, bytes, peak_person, peak_vehicle) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (stream_id, trigger, start_epoch, end_epoch, path, frames, nbytes,
+             peak_person, peak_vehicle),
+        )
+    return cur.lastrowid
+
+
+def query_clips(from_ts=None, to_ts=None, stream_id=None, trigger=None, limit=100):
+    """Başlangıcı [from_ts, to_ts) aralığında olan klipler, yeniden eskiye."""
+    where, args = [], []
+    if stream_id:
+        where.append("stream_id = ?")
+        args.append(stream_id)
+    if trigger:
+        where.append("trigger = ?")
+        args.append(trigger)
+    if from_ts is not None:
+        where.append("start_epoch >= ?")
+        args.append(from_ts)
+    if to_ts is not None:
+        where.append("start_epoch < ?")
+        args.append(to_ts)
+    sql = f"SELECT {_CLIP_COLUMNS} FROM clips"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY start_epoch DESC LIMIT ?"
+    cur = get_read_db().execute(sql, args + [limit])
+    return [dict(r) for r in cur.fetchall()]
+
+
+def get_clip(clip_id):
+    cur = get_read_db().execute(f"SELECT {_CLIP_COLUMNS} FROM clips WHERE id = ?", (clip_id,))
+    row = cur.fetchone()
+    return dict(row) if row is not None else None
+
+
+class DetectionWriter:
+    """
+    Tespit örneklerini istek thread'lerinden bağımsız, arka planda yazar.
+    Örnekler sınırlı bir kuyruğa girer; writer thread'i bunları
+    batch_size'a ya da flush_interval süresine kadar toplayıp tek
+    transaction'da (executemany) yazar. Kuyruk doluysa örnek düşürülür,
+    tespit döngüsü asla bloklanmaz.
+
+    Aynı transaction'da dakika / saat / gün özetleri de güncellenir ve
+    retention ayarına göre eski kayıtlar saatte bir silinir.
+    """
+    # Varsayılan saklama süreleri (gün); None = süresiz
+    DEFAULT_RETENTION = {"raw": 7, "minute": 30, "hour": 365, "day": None}
+
+    def __init__(self, db_path, max_queue=10000, batch_size=500, flush_interval=1.0,
+                 retention=None, prune_interval=3600.0):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention = dict(self.DEFAULT_RETENTION, **(retention or {}))
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self.pruned = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._stop_event = threading.Event()
+
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="detection-writer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """Bekleyen örnekleri yazıp thread'i kapatır."""
+        self._stop_event.set()
+        thread = self._thread
+        self._thread = None
+        if thread is not None:
+            thread.join(timeout=timeout)
+
+    def submit(self, stream_id, person_count, vehicle_count, ts_epoch=None):
+        try:
+            self._queue.put_nowait(
+                _detection_row(stream_id, person_count, vehicle_count, ts_epoch)
+            )
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return configure_connection(conn)
+
+    def _collect(self):
+        """Bir batch toplar; durdurma isteğinde kuyrukta kalanları boşaltır."""
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=0.5))
+        except queue.Empty:
+            return batch
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop_event.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, conn, batch):
+        try:
+            with conn:
+                _write_detections(conn, batch)
+            self.written += len(batch)
+            self.batches += 1
+        except sqlite3.Error as e:
+            self.errors += 1
+            print("DetectionWriter error:", e)
+
+    def _maybe_prune(self, conn):
+        now = time.monotonic()
+        if now - self._last_prune < self.prune_interval:
+            return
+        self._last_prune = now
+        try:
+            self.pruned += prune_detections(conn, self.retention)
+        except sqlite3.Error as e:
+            self.errors += 1
+            print("DetectionWriter prune error:", e)
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            while not self._stop_event.is_set():
+                batch = self._collect()
+                if batch:
+                    self._write(conn, batch)
+                self._maybe_prune(conn)
+            # Kapanış: kalan her şeyi yaz
+            while True:
+                batch = self._drain()
+                if not batch:
+                    break
+                self._write(conn, batch)
+        finally:
+            conn.close()
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "errors": self.errors,
+            "pruned": self.pruned,
+        }
 
 
 # ---------- User yönetimi fonksiyonları ----------
@@ -1,30 +1,154 @@
 # detection.py
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
 import cv2
 import numpy as np
-import os
+
+from metrics import stage_timer
+from model_registry import MODELS
+
+_HOG_TIME = stage_timer("hog_detect")
+_YOLO_FORWARD_TIME = stage_timer("yolo_forward")
+_YOLO_POST_TIME = stage_timer("yolo_postprocess")
+_DRAW_TIME = stage_timer("draw")
 
 
 class PeopleDetector:
-    def __init__(self):
-        self.hog = cv2.HOGDescriptor()
-        self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+    """
+    HOG tabanlı insan tespiti.
+
+    tiles > 1 ise ince piramit seviyeleri (küçük / uzaktaki kişiler)
+    (küçültülmüş) karenin örtüşen dikey şeritlerinde, kaba seviyeler
+    (büyük kişiler) tam karenin küçültülmüş kopyasında aranır; tüm işler
+    ortak thread havuzunda ayrı detectMultiScale ile çalışır (OpenCV GIL'i
+    bırakır). Şeritlerin örtüşmesi kaba geçişin yakaladığı en küçük kişi
+    genişliğinden az değildir: daha dar her kişi en az bir şeridin tamamen
+    içindedir, daha genişi kaba geçişte bulunur. İki kez bulunanlar NMS ile
+    birleştirilir. tile_overlap şerit genişliğine oranla örtüşmedir.
+    """
+    # Kaba geçiş, en az bu kadar pencere genişliğindeki kişileri kapsar
+    # (örtüşmenin alt sınırı; 2 -> ince seviyeler piramidin ilk ~14
+    # seviyesi, scale=1.05)
+    COARSE_MIN_WINDOWS = 2
+    WINDOW = (64, 128)
+
+    def __init__(self, registry=None, max_width=800, win_stride=8, scale=1.05,
+                 tiles=1, tile_overlap=0.25, nms_threshold=0.4):
+        # HOG tanımlayıcısı süreç genelinde paylaşılır
+        self.registry = registry or MODELS
+        self.hog = self.registry.hog()
+        self.max_width = max_width
+        self.win_stride = win_stride
+        self.scale = scale
+        self.tiles = tiles
+        self.tile_overlap = tile_overlap
+        self.nms_threshold = nms_threshold
+
+    def configure(self, **options):
+        """Stream ayarlarından gelen HOG parametrelerini uygular."""
+        for name in ("max_width", "win_stride", "scale", "tiles", "tile_overlap"):
+            if options.get(name) is not None:
+                setattr(self, name, options[name])
 
-    def detect_people(self, frame_bgr):
+    def _tile_spans(self, width):
+        """
+        Örtüşen dikey şeritlerin [x0, x1) aralıkları ve örtüşme (px).
+        Şerit adımı en az bir pencere olacak şekilde şerit sayısı azaltılır.
+        """
+        min_overlap = self.WINDOW[0] * self.COARSE_MIN_WINDOWS
+        n = max(1, int(self.tiles))
+        while n > 1:
+            tile_w = width / (n - (n - 1) * self.tile_overlap)
+            overlap = max(min_overlap, int(tile_w * self.tile_overlap))
+            tile_w = int(np.ceil((width + (n - 1) * overlap) / n))
+            if tile_w - overlap >= self.WINDOW[0]:
+                break
+            n -= 1
+        if n == 1:
+            return [(0, width)], 0
+        step = tile_w - overlap
+        spans = []
+        for i in range(n):
+            x0 = min(i * step, width - tile_w)
+            spans.append((max(0, x0), min(width, x0 + tile_w)))
+        return spans, overlap
+
+    def _detect_coarse(self, image, overlap):
+        """
+        Kaba seviyeler: kare, örtüşme genişliğindeki kişi bir pencereye
+        denk gelecek şekilde küçültülüp tek parça taranır.
+        """
+        factor = self.WINDOW[0] / float(overlap)
+        h, w = image.shape[:2]
+        small = cv2.resize(image, (max(1, int(w * factor)), max(1, int(h * factor))))
+        if small.shape[0] < self.WINDOW[1] or small.shape[1] < self.WINDOW[0]:
+            return [], []
+        rects, weights = self._detect_tile(small, 0, small.shape[1])
+        rects = [[int(v / factor) for v in r] for r in rects]
+        return rects, weights
+
+    def _fine_hog(self, overlap):
+        """
+        Şeritlerde sadece ince seviyeler: pencere genişliği örtüşmeyi
+        (kaba geçişin ilk seviyesi) bir seviye aşana kadar.
+        """
+        levels = int(np.floor(np.log(overlap / self.WINDOW[0]) / np.log(float(self.scale)))) + 2
+        return self.registry.hog(nlevels=max(1, levels))
+
+    def _detect_tile(self, image, x0, x1, hog=None):
+        stride = (int(self.win_stride), int(self.win_stride))
+        rects, weights = (hog or self.hog).detectMultiScale(
+            image[:, x0:x1],
+            winStride=stride,
+            padding=(8, 8),
+            scale=float(self.scale),
+        )
+        if len(rects) == 0:
+            return [], []
+        rects = np.asarray(rects).reshape(-1, 4)
+        rects[:, 0] += x0
+        return rects.tolist(), np.asarray(weights).reshape(-1).tolist()
+
+    def detect_people(self, frame_bgr, scale=None):
+        """
+        scale verilirse kare max_width yerine bu oranla küçültülür (bölge
+        tespitinde kırpıntılar tam kareyle aynı ölçekte işlenir).
+        """
+        t0 = perf_counter()
         h, w = frame_bgr.shape[:2]
-        scale = 1.0
-        max_width = 800
-        if w > max_width:
-            scale = max_width / w
+        if scale is None:
+            scale = min(1.0, self.max_width / w)
+        else:
+            # Kırpıntı en az bir HOG penceresi kadar kalmalı
+            scale = min(1.0, max(scale, self.WINDOW[0] / w, self.WINDOW[1] / h))
+        if scale < 1.0:
             frame_resized = cv2.resize(frame_bgr, (int(w * scale), int(h * scale)))
         else:
             frame_resized = frame_bgr
 
-        rects, _ = self.hog.detectMultiScale(
-            frame_resized,
-            winStride=(8, 8),
-            padding=(8, 8),
-            scale=1.05,
-        )
+        spans, overlap = self._tile_spans(frame_resized.shape[1])
+        if len(spans) == 1:
+            rects, _ = self._detect_tile(frame_resized, *spans[0])
+        else:
+            pool = _hog_tile_pool()
+            futures = [pool.submit(self._detect_coarse, frame_resized, overlap)]
+            fine = self._fine_hog(overlap)
+            futures += [
+                pool.submit(self._detect_tile, frame_resized, x0, x1, fine)
+                for x0, x1 in spans
+            ]
+            rects, weights = [], []
+            for fut in futures:
+                r, wt = fut.result()
+                rects.extend(r)
+                weights.extend(wt)
+            if rects:
+                # Örtüşmede / iki geçişte bulunan kişiler tek kutuya iner
+                keep = cv2.dnn.NMSBoxes(rects, weights, 0.0, self.nms_threshold)
+                rects = [rects[i] for i in np.asarray(keep, dtype=np.int64).reshape(-1)]
 
         boxes = []
         for (x, y, w_box, h_box) in rects:
@@ -34,9 +158,27 @@ class PeopleDetector:
             h0 = int(h_box / scale)
             boxes.append((x0, y0, w0, h0))
 
+        _HOG_TIME.observe(perf_counter() - t0)
         return boxes, len(boxes)
 
 
+_hog_pool = None
+_hog_pool_lock = threading.Lock()
+
+
+def _hog_tile_pool():
+    """Şeritli HOG için süreç genelinde ortak thread havuzu (tembel)."""
+    global _hog_pool
+    if _hog_pool is None:
+        with _hog_pool_lock:
+            if _hog_pool is None:
+                _hog_pool = ThreadPoolExecutor(
+                    max_workers=os.cpu_count() or 4,
+                    thread_name_prefix="hog-tile",
+                )
+    return _hog_pool
+
+
 class CarDetectorYOLO:
     """
     YOLO tabanlı araç tespiti (car, bus, truck, motorbike).
@@ -44,89 +186,206 @@ class CarDetectorYOLO:
       - yolov3-tiny.cfg
       - yolov3-tiny.weights
       - coco.names
-    Eğer yüklenemezse, sessizce devre dışı kalır.
+    Ağ ModelRegistry'den ilk kullanımda (tembel) alınır; her thread kendi
+    ağını kullanır. Eğer yüklenemezse, sessizce devre dışı kalır.
     """
-    def __init__(self):
-        self.net = None
-        self.output_layers = []
+    def __init__(self, conf_threshold=0.5, nms_threshold=0.4, registry=None):
+        self.registry = registry or MODELS
         self.classes = []
         self.vehicle_classes = {"car", "bus", "truck", "motorbike"}
+        self.conf_threshold = conf_threshold
+        self.nms_threshold = nms_threshold
+        self._vehicle_mask = np.zeros(0, dtype=bool)
 
-        base = os.path.join(os.path.dirname(__file__), "models")
-        cfg_path = os.path.join(base, "yolov3-tiny.cfg")
-        weights_path = os.path.join(base, "yolov3-tiny.weights")
-        names_path = os.path.join(base, "coco.names")
+    @property
+    def available(self):
+        """Model dosyaları mevcut mu (ağı yüklemez)."""
+        return self.registry.yolo_available
 
-        if os.path.exists(cfg_path) and os.path.exists(weights_path) and os.path.exists(names_path):
-            try:
-                self.net = cv2.dnn.readNetFromDarknet(cfg_path, weights_path)
-                self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
-                self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+    def _handle(self):
+        handle = self.registry.yolo()
+        if handle is not None and not self.classes:
+            self.set_classes(self.registry.yolo_classes())
+        return handle
 
-                with open(names_path, "r", encoding="utf-8") as f:
-                    self.classes = [line.strip() for line in f.readlines()]
+    @property
+    def net(self):
+        """Çağıran thread'in ağı; ilk erişimde yüklenir. Yoksa None."""
+        handle = self._handle()
+        return handle.net if handle is not None else None
 
-                layer_names = self.net.getLayerNames()
-                self.output_layers = [layer_names[i - 1] for i in self.net.getUnconnectedOutLayers().flatten()]
-            except Exception:
-                self.net = None  # YOLO kullanılamaz
-        else:
-            self.net = None
+    @property
+    def output_layers(self):
+        handle = self._handle()
+        return handle.output_layers if handle is not None else []
 
-    def detect_vehicles(self, frame_bgr):
-        if self.net is None:
-            # YOLO yoksa tespit yapma
-            return [], 0
+    def set_classes(self, classes):
+        """Sınıf isimlerini ayarlar ve araç sınıfı maskesini bir kez kurar."""
+        self.classes = list(classes)
+        self._vehicle_mask = np.array(
+            [name in self.vehicle_classes for name in self.classes],
+            dtype=bool,
+        )
+
+    def _class_mask(self, num_classes):
+        mask = self._vehicle_mask
+        if len(mask) < num_classes:
+            # coco.names ağdan kısa ise eksik sınıflar araç sayılmaz
+            mask = np.concatenate([mask, np.zeros(num_classes - len(mask), dtype=bool)])
+            self._vehicle_mask = mask
+        return mask[:num_classes]
+
+    def decode_outputs(self, outs, width, height):
+        """
+        Ağ çıktılarını araç kutularına çevirir. Satır satır Python döngüsü
+        yerine tüm satırlar tek seferde NumPy ile işlenir, ardından sınıf
+        bazlı NMS uygulanır.
+        Dönüş: [(x, y, w, h), ...]
+        """
+        dets = np.concatenate([o.reshape(-1, o.shape[-1]) for o in outs])
+        if len(dets) == 0:
+            return []
 
-        height, width = frame_bgr.shape[:2]
+        scores = dets[:, 5:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
 
-        blob = cv2.dnn.blobFromImage(
-            frame_bgr, 1 / 255.0, (416, 416),
+        keep = (confidences > self.conf_threshold) & self._class_mask(scores.shape[1])[class_ids]
+        if not keep.any():
+            return []
+
+        dets = dets[keep]
+        confidences = confidences[keep]
+        class_ids = class_ids[keep]
+
+        # int() ile aynı şekilde (sıfıra doğru) kırpılır
+        center_x = (dets[:, 0] * width).astype(np.int32)
+        center_y = (dets[:, 1] * height).astype(np.int32)
+        w = (dets[:, 2] * width).astype(np.int32)
+        h = (dets[:, 3] * height).astype(np.int32)
+        x = (center_x - w / 2).astype(np.int32)
+        y = (center_y - h / 2).astype(np.int32)
+        boxes = np.stack([x, y, w, h], axis=1)
+
+        idxs = _nms_per_class(
+            boxes, confidences, class_ids,
+            self.conf_threshold, self.nms_threshold,
+        )
+        return [tuple(int(v) for v in boxes[i]) for i in idxs]
+
+    def detect_vehicles(self, frame_bgr, input_size=416):
+        return self.detect_batch([frame_bgr], input_size)[0]
+
+    def detect_batch(self, frames_bgr, input_size=416):
+        """
+        Birden fazla kareyi tek blobFromImages + forward ile işler.
+        input_size: ağ giriş boyutu (32'nin katı; 320 daha hızlı, daha kaba).
+        Dönüş: her kare için (boxes, count), girişle aynı sırada.
+        """
+        handle = self._handle()
+        if handle is None:
+            # YOLO yoksa tespit yapma
+            return [([], 0) for _ in frames_bgr]
+
+        t0 = perf_counter()
+        blob = cv2.dnn.blobFromImages(
+            frames_bgr, 1 / 255.0, (input_size, input_size),
             swapRB=True, crop=False
         )
-        self.net.setInput(blob)
-        outs = self.net.forward(self.output_layers)
+        handle.net.setInput(blob)
+        outs = handle.net.forward(handle.output_layers)
+        t1 = perf_counter()
+        _YOLO_FORWARD_TIME.observe(t1 - t0)
+
+        # Çıktılar (N*satır, C) ya da (N, satır, C) olabilir; kare bazında ayır
+        n = len(frames_bgr)
+        per_image = [o.reshape(n, -1, o.shape[-1]) for o in outs]
+
+        results = []
+        for i, frame_bgr in enumerate(frames_bgr):
+            height, width = frame_bgr.shape[:2]
+            final_boxes = self.decode_outputs([o[i] for o in per_image], width, height)
+            results.append((final_boxes, len(final_boxes)))
+        _YOLO_POST_TIME.observe(perf_counter() - t1)
+        return results
+
+
+def _nms_per_class(boxes, scores, class_ids, score_threshold, nms_threshold):
+    """
+    Sınıf bazlı NMS; farklı sınıflardaki örtüşen kutular birbirini bastırmaz.
+    Dönüş: tutulan satır indeksleri.
+    """
+    boxes_list = boxes.tolist()
+    scores_list = scores.astype(float).tolist()
+    if hasattr(cv2.dnn, "NMSBoxesBatched"):
+        idxs = cv2.dnn.NMSBoxesBatched(
+            boxes_list, scores_list, class_ids.tolist(),
+            score_threshold, nms_threshold,
+        )
+    else:
+        # Eski OpenCV: sınıfları koordinat ofsetiyle ayırıp tek NMS
+        offset = (boxes[:, :2].max() + boxes[:, 2:].max() + 1) * class_ids[:, None]
+        shifted = boxes.copy()
+        shifted[:, :2] += offset.astype(boxes.dtype)
+        idxs = cv2.dnn.NMSBoxes(
+            shifted.tolist(), scores_list, score_threshold, nms_threshold,
+        )
+    return np.asarray(idxs, dtype=np.int64).reshape(-1)
 
-        boxes = []
-        confidences = []
-        class_ids = []
-
-        for out in outs:
-            for detection in out:
-                scores = detection[5:]
-                class_id = int(np.argmax(scores))
-                confidence = float(scores[class_id])
-                if confidence > 0.5:
-                    class_name = self.classes[class_id] if class_id < len(self.classes) else ""
-                    if class_name in self.vehicle_classes:
-                        center_x = int(detection[0] * width)
-                        center_y = int(detection[1] * height)
-                        w = int(detection[2] * width)
-                        h = int(detection[3] * height)
-                        x = int(center_x - w / 2)
-                        y = int(center_y - h / 2)
-
-                        boxes.append([x, y, w, h])
-                        confidences.append(confidence)
-                        class_ids.append(class_id)
-
-        idxs = cv2.dnn.NMSBoxes(boxes, confidences, 0.5, 0.4)
-        final_boxes = []
-        if len(idxs) > 0:
-            for i in idxs.flatten():
-                x, y, w, h = boxes[i]
-                final_boxes.append((x, y, w, h))
-
-        return final_boxes, len(final_boxes)
+
+def draw_boxes(frame_bgr, boxes):
+    """Kutuları ve etiketleri karenin üzerine (yerinde) çizer."""
+    t0 = perf_counter()
+    for (x, y, w, h, label) in boxes:
+        if label == "person":
+            color = (0, 255, 0)
+        else:
+            color = (0, 0, 255)
+
+        cv2.rectangle(frame_bgr, (x, y), (x + w, y + h), color, 2)
+        cv2.putText(
+            frame_bgr,
+            label,
+            (x, y - 5),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.6,
+            color,
+            2,
+            cv2.LINE_AA,
+        )
+    _DRAW_TIME.observe(perf_counter() - t0)
+    return frame_bgr
+
+
+def count_labels(boxes):
+    counts = {"person": 0, "vehicle": 0}
+    for box in boxes:
+        counts[box[4]] = counts.get(box[4], 0) + 1
+    return counts
 
 
 class ObjectDetector:
-    def __init__(self):
+    def __init__(self, vehicle_conf_threshold=0.5, vehicle_nms_threshold=0.4,
+                 vehicle_batcher=None):
+        """
+        vehicle_batcher:
+          - BatchInferenceService verilirse araç tespiti diğer stream'lerin
+            kareleriyle birlikte toplu (batch) çalışır; ağ servisten alınır.
+        """
         self.people_detector = PeopleDetector()
-        self.car_detector = CarDetectorYOLO()
+        self.vehicle_batcher = vehicle_batcher
+        self.vehicle_input_size = 416
+        if vehicle_batcher is not None:
+            self.car_detector = vehicle_batcher.detector
+        else:
+            self.car_detector = CarDetectorYOLO(
+                conf_threshold=vehicle_conf_threshold,
+                nms_threshold=vehicle_nms_threshold,
+            )
 
-    def detect(self, frame_bgr, detect_people=True, detect_vehicles=False):
+    def detect(self, frame_bgr, detect_people=True, detect_vehicles=False, people_scale=None):
         """
+        people_scale: HOG küçültme oranı (None = max_width'e göre).
         Dönüş:
           - boxes: [(x,y,w,h,label), ...]
           - counts: {"person": int, "vehicle": int}
@@ -136,35 +395,48 @@ class ObjectDetector:
         vehicle_count = 0
 
         if detect_people:
-            p_boxes, p_cnt = self.people_detector.detect_people(frame_bgr)
+            p_boxes, p_cnt = self.people_detector.detect_people(frame_bgr, people_scale)
             for (x, y, w, h) in p_boxes:
                 boxes_all.append((x, y, w, h, "person"))
             person_count = p_cnt
 
         if detect_vehicles:
-            v_boxes, v_cnt = self.car_detector.detect_vehicles(frame_bgr)
+            if self.vehicle_batcher is not None:
+                v_boxes, v_cnt = self.vehicle_batcher.infer(
+                    frame_bgr, input_size=self.vehicle_input_size
+                )
+            else:
+                v_boxes, v_cnt = self.car_detector.detect_vehicles(
+                    frame_bgr, self.vehicle_input_size
+                )
             for (x, y, w, h) in v_boxes:
                 boxes_all.append((x, y, w, h, "vehicle"))
             vehicle_count = v_cnt
 
         return boxes_all, {"person": person_count, "vehicle": vehicle_count}
 
-    def draw_boxes(self, frame_bgr, boxes):
-        for (x, y, w, h, label) in boxes:
-            if label == "person":
-                color = (0, 255, 0)
-            else:
-                color = (0, 0, 255)
-
-            cv2.rectangle(frame_bgr, (x, y), (x + w, y + h), color, 2)
-            cv2.putText(
-                frame_bgr,
-                label,
-                (x, y - 5),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.6,
-                color,
-                2,
-                cv2.LINE_AA,
+    def detect_regions(self, frame_bgr, regions, detect_people=True, detect_vehicles=False):
+        """
+        Sadece verilen (x, y, w, h) bölgelerinde tespit yapar; kutular tam
+        kare koordinatlarına çevrilir. Bölgeler örtüşmemeli. HOG kırpıntıları
+        tam karedeki ölçekle işler; maliyet taranan alanla orantılıdır.
+        """
+        people_scale = min(1.0, self.people_detector.max_width / frame_bgr.shape[1])
+        boxes_all = []
+        for (rx, ry, rw, rh) in regions:
+            crop = frame_bgr[ry:ry + rh, rx:rx + rw]
+            if crop.size == 0:
+                continue
+            boxes, _ = self.detect(
+                crop,
+                detect_people=detect_people,
+                detect_vehicles=detect_vehicles,
+                people_scale=people_scale,
             )
-        return frame_bgr
+            for (x, y, w, h, label) in boxes:
+                boxes_all.append((x + rx, y + ry, w, h, label))
+
+        return boxes_all, count_labels(boxes_all)
+
+    def draw_boxes(self, frame_bgr, boxes):
+        return draw_boxes(frame_bgr, boxes)
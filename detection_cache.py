@@ -0,0 +1,151 @@
+"""
+Dosya kaynakları için tespit sonucu önbelleği.
+
+Döngüdeki video dosyaları her turda aynı kareleri tekrar analiz eder.
+Sonuçlar (kapsam, kare indeksi) anahtarıyla saklanır; kapsam dosya kimliği
+(yol, boyut, mtime) ile tespit ayarlarının özetidir, ayar ya da dosya
+değişince eski sonuçlar kendiliğinden geçersiz kalır.
+
+Bellekte LRU ile sınırlıdır. path verilirse sonuçlar SQLite'a da toplu
+yazılır ve yeniden başlatmada bir kapsamın ilk kullanımında topluca
+belleğe alınır.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+def file_identity(path):
+    """Dosya kimliği: (mutlak yol, boyut, mtime_ns) özeti."""
+    st = os.stat(path)
+    ident = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+    return hashlib.sha1(ident.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_scope(source_id, settings):
+    """Dosya kimliği + tespit ayarları -> kapsam anahtarı."""
+    digest = hashlib.sha1(repr(settings).encode("utf-8")).hexdigest()[:12]
+    return f"{source_id}:{digest}"
+
+
+class DetectionCache:
+    def __init__(self, capacity=200000, path=None, flush_every=256):
+        self.capacity = max(1, int(capacity))
+        self.path = path
+        self.flush_every = flush_every
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._loaded_scopes = set()
+        self._pending = []
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS detection_cache (
+                    scope TEXT NOT NULL,
+                    frame_idx INTEGER NOT NULL,
+                    boxes TEXT NOT NULL,
+                    PRIMARY KEY (scope, frame_idx)
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.commit()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.loaded = 0
+        self.persisted = 0
+
+    def _load_scope(self, scope):
+        # self._lock tutulurken çağrılmalı
+        self._loaded_scopes.add(scope)
+        if self._conn is None:
+            return
+        cur = self._conn.execute(
+            "SELECT frame_idx, boxes FROM detection_cache WHERE scope = ? "
+            "ORDER BY frame_idx LIMIT ?",
+            (scope, self.capacity),
+        )
+        for frame_idx, boxes in cur:
+            self._entries[(scope, frame_idx)] = [tuple(b) for b in json.loads(boxes)]
+            self.loaded += 1
+        self._trim()
+
+    def _trim(self):
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, scope, frame_idx):
+        """Önbellekteki kutular ya da None."""
+        key = (scope, frame_idx)
+        with self._lock:
+            if scope not in self._loaded_scopes:
+                self._load_scope(scope)
+            boxes = self._entries.get(key)
+            if boxes is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return boxes
+
+    def put(self, scope, frame_idx, boxes):
+        with self._lock:
+            self._entries[(scope, frame_idx)] = list(boxes)
+            self._trim()
+            if self._conn is not None:
+                self._pending.append((scope, frame_idx, json.dumps(boxes)))
+                if len(self._pending) >= self.flush_every:
+                    self._flush()
+
+    def _flush(self):
+        # self._lock tutulurken çağrılmalı
+        if not self._pending or self._conn is None:
+            return
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO detection_cache (scope, frame_idx, boxes) "
+                    "VALUES (?, ?, ?)",
+                    self._pending,
+                )
+            self.persisted += len(self._pending)
+        except sqlite3.Error as e:
+            print("DetectionCache error:", e)
+        self._pending = []
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "loaded_from_disk": self.loaded,
+                "persisted": self.persisted,
+                "persistent": self.path is not None,
+            }
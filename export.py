@@ -0,0 +1,323 @@
+"""
+Tespit geçmişinin toplu dışa aktarımı (CSV / NDJSON, isteğe bağlı gzip).
+
+Satırlar SQLite'tan (ts_epoch, id) sırasıyla chunk chunk okunur
+(db.iter_detection_chunks) ve her chunk biçimlenip hemen yazılır; sonuç
+kümesi bellekte tutulmaz, bellek kullanımı aralığın uzunluğundan
+bağımsızdır. Aynı üretici hem /api/export akış yanıtını hem bu CLI'ı besler.
+
+Ham satırlar retention süresi (varsayılan 7 gün) dolunca silinir; daha
+eski dönem dakika / saat / gün özetlerinden gelir (bucket sütunu, sayaçlar
+kova ortalaması). Aralığın bir kısmı özetten geliyorsa ya da hiç veri
+yoksa uyarı verilir (CLI: stderr, API: X-Export-Warning başlığı).
+
+Devam: her satır id ve ts_epoch içerir; yarıda kalan bir indirme son
+tam satırın "ts_epoch:id" değeriyle (after=) kaldığı yerden sürdürülür.
+CLI --checkpoint ile bunu kendisi yapar: her chunk'tan sonra imleç ve
+dosya boyu kaydedilir, aynı komut tekrar çalıştırılınca dosya son
+kayıtlı noktaya kırpılıp devam edilir (gzip çıktısı chunk başına bir
+gzip üyesidir; çok üyeli dosyayı gzip / zcat normal açar).
+
+Kullanım:
+  python export.py --from 2024-05-01 --to 2024-06-01 --out mayis.csv
+  python export.py --from 2024-01-01 --stream kapi1 --stream kapi2 \\
+      --format ndjson --gzip --out kapilar.ndjson.gz --checkpoint kapilar.ckpt
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sqlite3
+import sys
+import time
+import zlib
+from datetime import datetime, timezone
+
+from db import (
+    EXPORT_COLUMNS, configure_connection, export_coverage, export_segments, iter_detection_chunks,
+)
+from metrics import REGISTRY, Counter
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+DEFAULT_CHUNK_ROWS = 5000
+
+EXPORT_ROWS = REGISTRY.register(Counter(
+    "video_export_rows_total",
+    "Dışa aktarılan tespit satırı (rate() ile satır/sn).",
+    labelnames=("format",),
+))
+
+
+def parse_cursor(value):
+    """"ts_epoch:id" -> (ts_epoch, id); boşsa None. Özet satırlarında id metindir."""
+    if not value:
+        return None
+    ts_epoch, sep, row_id = value.partition(":")
+    try:
+        if not sep or not row_id:
+            raise ValueError
+        return int(ts_epoch), row_id
+    except ValueError:
+        raise ValueError(f"Geçersiz imleç: {value} (beklenen ts_epoch:id)")
+
+
+def format_cursor(cursor):
+    return f"{cursor[0]}:{cursor[1]}"
+
+
+def plan_export(conn, from_ts, to_ts, warn_before=True):
+    """
+    Aralığın okunacağı bölümler ve kapsam bilgisi:
+    (segments, {"from", "raw_from", "data_from", "warnings"}). from_ts
+    None ise verinin başından başlanır. Uyarılar:
+      rollup          -> from, en eski ham satırdan önce; o dönem özetlerden
+      no-data-before  -> istenen from, en eski kayıttan (data_from) önce;
+                         sadece from açıkça verildiyse (warn_before)
+    """
+    starts = export_coverage(conn)
+    segments = export_segments(0 if from_ts is None else from_ts, to_ts, starts)
+    if from_ts is None:
+        from_ts = segments[0][1] if segments else to_ts
+        warn_before = False
+    warnings = []
+    if any(layer != "raw" for layer, _, _ in segments):
+        warnings.append("rollup")
+    data_from = segments[0][1] if segments else None
+    if warn_before and (data_from is None or from_ts < data_from):
+        warnings.append("no-data-before")
+    return segments, {
+        "from": from_ts, "raw_from": starts["raw"], "data_from": data_from, "warnings": warnings,
+    }
+
+
+def warning_text(info):
+    """plan_export uyarılarının okunur hali (CLI)."""
+    lines = []
+    if "rollup" in info["warnings"]:
+        lines.append(
+            f"{_iso(info['raw_from'])} öncesi ham veri silinmiş; o dönem özet satırlarıdır "
+            "(bucket sütunu, sayaçlar ortalama)." if info["raw_from"] is not None else
+            "Ham veri yok; tüm satırlar özetlerden (bucket sütunu, sayaçlar ortalama)."
+        )
+    if "no-data-before" in info["warnings"]:
+        lines.append(
+            f"{_iso(info['data_from'])} öncesine ait kayıt yok." if info["data_from"] is not None
+            else "Aralıkta kayıt yok."
+        )
+    return lines
+
+
+def _iso(ts_epoch):
+    return datetime.fromtimestamp(ts_epoch, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def header(fmt):
+    if fmt == "csv":
+        return ",".join(EXPORT_COLUMNS) + "\r\n"
+    return ""
+
+
+def format_rows(rows, fmt):
+    """Bir chunk'ı metne çevirir (csv: RFC 4180 satır sonları)."""
+    if fmt == "csv":
+        buf = io.StringIO()
+        csv.writer(buf).writerows(rows)
+        return buf.getvalue()
+    return "".join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, row)), separators=(",", ":")) + "\n"
+        for row in rows
+    )
+
+
+def iter_export(conn, from_ts, to_ts, stream_ids=None, fmt="csv", after=None,
+                chunk_size=DEFAULT_CHUNK_ROWS, with_header=True, segments=None):
+    """
+    (metin, satır sayısı, imleç) üçlüleri; imleç chunk'ın son satırının
+    (ts_epoch, id) değeridir. Devam ederken with_header=False verilir;
+    segments plan_export()'tan gelir (yoksa burada kurulur).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Geçersiz biçim. Seçenekler: {', '.join(FORMATS)}")
+    if with_header and header(fmt):
+        yield header(fmt), 0, None
+    rows_metric = EXPORT_ROWS.labels(fmt)
+    for rows in iter_detection_chunks(conn, from_ts, to_ts, stream_ids, after, chunk_size,
+                                      segments):
+        rows_metric.inc(len(rows))
+        yield format_rows(rows, fmt), len(rows), (rows[-1][1], rows[-1][0])
+
+
+def gzip_stream(chunks):
+    """
+    Bayt parçalarını tek bir gzip akışı olarak sıkıştırır; her parçadan
+    sonra SYNC_FLUSH ile istemciye gider (HTTP yanıtı için).
+    """
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for data in chunks:
+        out = z.compress(data) + z.flush(zlib.Z_SYNC_FLUSH)
+        if out:
+            yield out
+    yield z.flush()
+
+
+def gzip_member(data):
+    """Tek başına açılabilen bir gzip üyesi (dosyaya chunk chunk yazım için)."""
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return z.compress(data) + z.flush()
+
+
+# ---------- CLI ----------
+
+def parse_time(value, default=None):
+    """Epoch saniye ya da ISO tarih (saat dilimi yoksa UTC)."""
+    if value is None or value == "":
+        return default
+    try:
+        return int(float(value))
+    except ValueError:
+        pass
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Geçersiz zaman: {value}")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def _load_checkpoint(path, query):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("query") != query:
+        raise ValueError(
+            f"{path} farklı bir dışa aktarıma ait; silin ya da aynı parametreleri kullanın."
+        )
+    return state
+
+
+def _save_checkpoint(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def run_export(db_path, out, from_ts, to_ts, stream_ids=None, fmt="csv", compress=False,
+               checkpoint=None, chunk_size=DEFAULT_CHUNK_ROWS, progress_interval=5.0):
+    """
+    Dışa aktarımı out dosyasına yazar; checkpoint varsa kaldığı yerden
+    devam eder. from_ts None ise verinin başından. Dönüş: özet (satır,
+    süre, satır/sn, bayt).
+    """
+    query = {
+        "db": os.path.abspath(db_path), "out": os.path.abspath(out),
+        "from": from_ts, "to": to_ts, "streams": sorted(stream_ids or []),
+        "format": fmt, "gzip": compress,
+    }
+    state = _load_checkpoint(checkpoint, query)
+    if state is not None:
+        # Son checkpoint'ten sonra yazılmış (yarım) veri atılır
+        with open(out, "r+b") as f:
+            f.truncate(state["bytes"])
+        mode, total = "ab", state["rows"]
+        after = tuple(state["cursor"]) if state["cursor"] else None
+    else:
+        mode, total, after = "wb", 0, None
+
+    conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+    configure_connection(conn)
+    try:
+        segments, info = plan_export(conn, from_ts, to_ts)
+    except sqlite3.Error:
+        conn.close()
+        raise
+    for line in warning_text(info):
+        print("Uyarı:", line, file=sys.stderr)
+    rows_done = 0
+    t0 = time.perf_counter()
+    last_report = t0
+    try:
+        with open(out, mode) as f:
+            for text, nrows, cursor in iter_export(conn, info["from"], to_ts, stream_ids, fmt,
+                                                   after, chunk_size, state is None, segments):
+                data = text.encode("utf-8")
+                f.write(gzip_member(data) if compress else data)
+                f.flush()
+                rows_done += nrows
+                if cursor is not None:
+                    after = cursor
+                if checkpoint:
+                    _save_checkpoint(checkpoint, {
+                        "query": query,
+                        "cursor": list(after) if after else None,
+                        "rows": total + rows_done,
+                        "bytes": f.tell(),
+                    })
+                now = time.perf_counter()
+                if progress_interval and now - last_report >= progress_interval:
+                    last_report = now
+                    print(f"{total + rows_done} satır, {rows_done / (now - t0):.0f} satır/sn",
+                          file=sys.stderr)
+            size = f.tell()
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - t0
+    if checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return {
+        "rows": total + rows_done,
+        "rows_this_run": rows_done,
+        "resumed": state is not None,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows_done / elapsed, 1) if elapsed > 0 else None,
+        "bytes": size,
+        "warnings": info["warnings"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--db", default=os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "instance", "app.db"
+    ))
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--from", dest="from_ts", default=None,
+                        help="Epoch saniye ya da ISO tarih (varsayılan: en baştan)")
+    parser.add_argument("--to", dest="to_ts", default=None, help="Varsayılan: şimdi")
+    parser.add_argument("--stream", action="append", default=[],
+                        help="Stream id (tekrarlanabilir; yoksa hepsi)")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--checkpoint", default=None,
+                        help="Devam dosyası; yarıda kalırsa aynı komut kaldığı yerden sürer")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    try:
+        to_ts = parse_time(args.to_ts, default=int(time.time()) + 1)
+        from_ts = parse_time(args.from_ts)
+        if from_ts is not None and from_ts >= to_ts:
+            raise ValueError("--from değeri --to değerinden küçük olmalı.")
+        result = run_export(
+            args.db, args.out, from_ts, to_ts, args.stream, args.format, args.gzip,
+            args.checkpoint, args.chunk_rows,
+        )
+    except (ValueError, OSError, sqlite3.Error) as e:
+        print("Dışa aktarım hatası:", e, file=sys.stderr)
+        sys.exit(1)
+
+    note = " (devam)" if result["resumed"] else ""
+    print(
+        f"{result['rows']} satır{note} -> {args.out}  {result['bytes'] / 1e6:.1f} MB  "
+        f"{result['seconds']} sn  {result['rows_per_sec']} satır/sn"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Stream başına kare bütçesi yöneticisi (governor).
+
+Hedef FPS'ten kare bütçesi (1 / fps) hesaplanır; kare işleme süresinin
+üstel ortalaması bütçeyi aşarsa kalite bir seviye düşürülür, bol pay
+kalırsa bir seviye geri alınır. Seviyeler sırayla HOG giriş genişliğini,
+YOLO giriş boyutunu ve tespit sıklığını düşürür; en altta öncelikli
+olmayan dedektör kapatılır.
+
+Salınımı önlemek için: her değişiklikten sonra cooldown kadar beklenir,
+ve bütçe aşımıyla terk edilen bir seviyeye ancak retry_after sonra
+yeniden çıkılır.
+"""
+import time
+
+QUALITY_LEVELS = [
+    {"name": "full", "hog_max_width": 800, "yolo_input": 416, "interval_factor": 1, "drop_secondary": False},
+    {"name": "hog640", "hog_max_width": 640, "yolo_input": 416, "interval_factor": 1, "drop_secondary": False},
+    {"name": "yolo320", "hog_max_width": 640, "yolo_input": 320, "interval_factor": 1, "drop_secondary": False},
+    {"name": "hog480", "hog_max_width": 480, "yolo_input": 320, "interval_factor": 2, "drop_secondary": False},
+    {"name": "sparse", "hog_max_width": 480, "yolo_input": 320, "interval_factor": 4, "drop_secondary": False},
+    {"name": "minimal", "hog_max_width": 400, "yolo_input": 320, "interval_factor": 4, "drop_secondary": True},
+]
+
+
+class FrameGovernor:
+    def __init__(self, target_fps, levels=None, alpha=0.2, headroom=0.6,
+                 cooldown=2.0, retry_after=30.0):
+        self.target_fps = float(target_fps)
+        self.budget = 1.0 / self.target_fps
+        self.levels = levels or QUALITY_LEVELS
+        self.alpha = alpha
+        self.headroom = headroom
+        self.cooldown = cooldown
+        self.retry_after = retry_after
+
+        self.level = 0
+        self.frame_cost = 0.0
+        self.changes = 0
+        self._samples = 0
+        self._last_change = None
+        # Bütçe aşımıyla terk edilen seviyeler: level -> zaman
+        self._overrun = {}
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def observe(self, frame_cost, now=None):
+        """
+        Bir karenin işleme süresini (saniye) kaydeder.
+        Seviye değiştiyse True döner.
+        """
+        now = time.monotonic() if now is None else now
+        self._samples += 1
+        if self._samples == 1:
+            self.frame_cost = frame_cost
+        else:
+            self.frame_cost += self.alpha * (frame_cost - self.frame_cost)
+
+        if self._last_change is None:
+            self._last_change = now
+        if now - self._last_change < self.cooldown or self._samples < 5:
+            return False
+
+        if self.frame_cost > self.budget and self.level < len(self.levels) - 1:
+            self._overrun[self.level] = now
+            return self._set_level(self.level + 1, now)
+
+        if self.frame_cost < self.budget * self.headroom and self.level > 0:
+            above = self._overrun.get(self.level - 1)
+            if above is None or now - above >= self.retry_after:
+                return self._set_level(self.level - 1, now)
+        return False
+
+    def _set_level(self, level, now):
+        self.level = level
+        self.changes += 1
+        self._last_change = now
+        self._samples = 0
+        return True
+
+    def stats(self):
+        return {
+            "level": self.level,
+            "max_level": len(self.levels) - 1,
+            "name": self.settings["name"],
+            "degraded": self.level > 0,
+            "target_fps": self.target_fps,
+            "frame_ms": round(self.frame_cost * 1000.0, 2),
+            "budget_ms": round(self.budget * 1000.0, 2),
+            "changes": self.changes,
+        }
@@ -0,0 +1,274 @@
+"""
+Prometheus text formatında hafif metrikler.
+
+Sıcak yolda (kare başına) kullanılan metrikler kilitsizdir: etiketli alt
+metrikler (child) bir kez çözülüp saklanır, observe()/inc() sadece önceden
+ayrılmış listede bir sayacı artırır; sözlük / liste / nesne oluşturmaz.
+Tek tük artış kaybı (GIL altında eşzamanlı +=) izleme için kabul edilebilir.
+
+Stream sayısı, kuyruk derinliği gibi değerler ise kazıma (scrape) anında
+collector fonksiyonlarıyla okunur; sıcak yola hiç maliyet eklemez.
+"""
+import threading
+from bisect import bisect_left
+
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "samples")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # son eleman +Inf
+        self.sum = 0.0
+        self.samples = None   # capture() açıkken ham değerler (benchmark)
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        if self.samples is not None:
+            self.samples.append(value)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Etiketli alt metrik; sıcak yolda kullanmadan önce bir kez çözülmeli."""
+        key = tuple(str(v) for v in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name}: {len(self.labelnames)} etiket bekleniyor")
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def remove(self, *values):
+        with self._lock:
+            self._children.pop(tuple(str(v) for v in values), None)
+
+    def _items(self):
+        with self._lock:
+            return list(self._children.items())
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for key, child in self._items():
+            lines.extend(self._render_child(list(zip(self.labelnames, key)), child))
+        return lines
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._children[()].inc(amount)
+
+    def _render_child(self, labels, child):
+        return [f"{self.name}{_format_labels(labels)} {_format_value(child.value)}"]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._children[()].set(value)
+
+    def inc(self, amount=1):
+        self._children[()].inc(amount)
+
+    def dec(self, amount=1):
+        self._children[()].dec(amount)
+
+    def _render_child(self, labels, child):
+        return [f"{self.name}{_format_labels(labels)} {_format_value(child.value)}"]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value):
+        self._children[()].observe(value)
+
+    def snapshot(self):
+        """{etiketler: (kova sayıları, toplam)}; süreçler arası aktarım için."""
+        return {key: (list(child.counts), child.sum) for key, child in self._items()}
+
+    def merge(self, snapshot):
+        """Başka bir süreçten gelen değerleri (histogram_delta) ekler."""
+        for key, (counts, total) in snapshot.items():
+            child = self.labels(*key)
+            for i, count in enumerate(counts):
+                child.counts[i] += count
+            child.sum += total
+
+    def capture(self, enabled=True):
+        """
+        Ham değer toplamayı açar / kapatır (benchmark'larda kesin yüzdelik
+        için; kovalar bunu vermez). Dönüş: {etiketler: o ana kadarki değerler}.
+        """
+        captured = {}
+        for key, child in self._items():
+            captured[key] = child.samples or []
+            child.samples = [] if enabled else None
+        return captured
+
+    def _render_child(self, labels, child):
+        counts = list(child.counts)
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float("inf"),), counts):
+            cumulative += count
+            le = labels + [("le", _format_value(float(bound)))]
+            lines.append(f"{self.name}_bucket{_format_labels(le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+def histogram_delta(current, previous):
+    """İki snapshot arasındaki artış; değişmeyen alt metrikler atlanır."""
+    delta = {}
+    for key, (counts, total) in current.items():
+        prev_counts, prev_total = previous.get(key, ((0,) * len(counts), 0.0))
+        diff = [c - p for c, p in zip(counts, prev_counts)]
+        if any(diff):
+            delta[key] = (diff, total - prev_total)
+    return delta
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, fn):
+        """
+        fn() -> [(name, type, help, [(labels_dict, value), ...]), ...]
+        Kazıma anında çağrılır.
+        """
+        with self._lock:
+            self._collectors.append(fn)
+        return fn
+
+    def render(self, collectors=()):
+        """Prometheus text formatı; collectors kayıtlılara ek olarak çağrılır."""
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = self._collectors + list(collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for fn in collectors:
+            try:
+                families = fn()
+            except Exception as e:
+                lines.append(f"# collector error: {_escape(e)}")
+                continue
+            for name, type_name, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {type_name}")
+                for labels, value in samples:
+                    lines.append(
+                        f"{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Hot-path aşama süreleri (saniye)
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "video_stage_seconds",
+    "Pipeline aşama süreleri (saniye).",
+    labelnames=("stage",),
+))
+
+
+def stage_timer(stage):
+    """Aşama histogramının alt metriği; modül yüklenirken bir kez çözülür."""
+    return STAGE_SECONDS.labels(stage)
@@ -0,0 +1,207 @@
+"""
+Süreç genelinde paylaşılan model kayıt defteri.
+
+Modeller ilk kullanıldıklarında bir kez yüklenir; yeni bir VideoCamera /
+ObjectDetector oluşturmak diskten model okumaz:
+  - HOG: tek HOGDescriptor tüm stream'lerce paylaşılır
+    (detectMultiScale salt okunur); şeritli HOG'un piramit seviyesi
+    sınırlı kopyaları seviye sayısı başına bir kez kurulur.
+  - YOLO: cfg / weights / coco.names sadece ilk araç tespiti açıldığında
+    belleğe okunur. cv2.dnn.Net thread-safe olmadığı için her thread kendi
+    ağını bellekteki tampondan kurar (diske tekrar gidilmez); ilk kurulan
+    ağ ile bir ısınma (warm-up) çıkarımı yapılır. Isınmış ağ kayıt
+    defterinde bekler ve YOLO isteyen ilk thread'e (ör. batcher) verilir;
+    önceden yükleme başka bir thread'de yapılsa da boşa gitmez.
+
+stats() model başına yükleme / ısınma süresi ve bellek bilgisini döner.
+"""
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+DEFAULT_MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+YOLO_FILES = ("yolov3-tiny.cfg", "yolov3-tiny.weights", "coco.names")
+
+
+def _rss_bytes():
+    """Sürecin anlık RSS'i (Linux); okunamazsa None."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _YoloHandle:
+    """Bir thread'e ait ağ ve çıkış katmanları."""
+    __slots__ = ("net", "output_layers")
+
+    def __init__(self, net, output_layers):
+        self.net = net
+        self.output_layers = output_layers
+
+
+class ModelRegistry:
+    def __init__(self, model_dir=None, yolo_input_size=416):
+        self.model_dir = model_dir or os.environ.get("MODEL_DIR", DEFAULT_MODEL_DIR)
+        self.yolo_input_size = yolo_input_size
+
+        self._lock = threading.Lock()
+        self._hogs = {}                # nlevels -> HOGDescriptor
+        self._yolo_buffers = None      # (cfg, weights) bellekte
+        self._yolo_classes = None
+        self._yolo_failed = False
+        self._spare_yolo = None        # ısınmış, henüz bir thread'e verilmemiş ağ
+        self._local = threading.local()
+        self._stats = {
+            "hog": {"loaded": False},
+            "yolo": {"loaded": False, "instances": 0},
+        }
+
+    # ---------- HOG ----------
+
+    def hog(self, nlevels=None):
+        """
+        Paylaşılan HOG insan dedektörü (ilk çağrıda kurulur). nlevels:
+        detectMultiScale piramidinin en fazla seviye sayısı (None: OpenCV
+        varsayılanı, 64). HOGDescriptor'da sonradan değiştirilemediği için
+        her değer ayrı bir tanımlayıcıdır.
+        """
+        hog = self._hogs.get(nlevels)
+        if hog is None:
+            with self._lock:
+                hog = self._hogs.get(nlevels)
+                if hog is None:
+                    t0 = time.perf_counter()
+                    if nlevels is None:
+                        hog = cv2.HOGDescriptor()
+                    else:
+                        hog = cv2.HOGDescriptor(
+                            (64, 128), (16, 16), (8, 8), (8, 8), 9, 1, -1.0,
+                            cv2.HOGDescriptor_L2Hys, 0.2, True, int(nlevels),
+                        )
+                    hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+                    if not self._hogs:
+                        self._stats["hog"] = {
+                            "loaded": True,
+                            "load_ms": round((time.perf_counter() - t0) * 1000.0, 2),
+                            "memory_bytes": int(hog.getDescriptorSize()) * 4,
+                        }
+                    self._hogs[nlevels] = hog
+                    self._stats["hog"]["instances"] = len(self._hogs)
+        return hog
+
+    # ---------- YOLO ----------
+
+    def yolo_paths(self):
+        return [os.path.join(self.model_dir, name) for name in YOLO_FILES]
+
+    @property
+    def yolo_available(self):
+        """Model dosyaları var ve yükleme daha önce başarısız olmadı (yüklemez)."""
+        if self._yolo_failed:
+            return False
+        return all(os.path.exists(p) for p in self.yolo_paths())
+
+    def yolo_classes(self):
+        """coco.names içeriği; YOLO yüklenemiyorsa boş liste."""
+        return self._yolo_classes if self._load_yolo_buffers() else []
+
+    def _load_yolo_buffers(self):
+        """Dosyaları bir kez belleğe okur. Başarılıysa True."""
+        if self._yolo_buffers is not None:
+            return True
+        if not self.yolo_available:
+            return False
+        with self._lock:
+            if self._yolo_buffers is not None:
+                return True
+            cfg_path, weights_path, names_path = self.yolo_paths()
+            try:
+                rss0 = _rss_bytes()
+                t0 = time.perf_counter()
+                cfg = np.fromfile(cfg_path, dtype=np.uint8)
+                weights = np.fromfile(weights_path, dtype=np.uint8)
+                with open(names_path, "r", encoding="utf-8") as f:
+                    classes = [line.strip() for line in f.readlines()]
+
+                # İlk ağ kurulup ısındırılır; ilk isteyen thread alır
+                handle = self._build_yolo(cfg, weights)
+                t1 = time.perf_counter()
+                self._warmup(handle)
+                t2 = time.perf_counter()
+                rss1 = _rss_bytes()
+            except Exception:
+                self._yolo_failed = True   # YOLO kullanılamaz
+                return False
+
+            self._spare_yolo = handle
+            self._yolo_classes = classes
+            self._yolo_buffers = (cfg, weights)
+            self._stats["yolo"] = {
+                "loaded": True,
+                "load_ms": round((t1 - t0) * 1000.0, 2),
+                "warmup_ms": round((t2 - t1) * 1000.0, 2),
+                "weights_bytes": int(weights.nbytes),
+                "rss_delta_bytes": (rss1 - rss0) if rss0 is not None and rss1 is not None else None,
+                "instances": 1,
+            }
+        return True
+
+    def _build_yolo(self, cfg, weights):
+        net = cv2.dnn.readNetFromDarknet(cfg, weights)
+        net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        layer_names = net.getLayerNames()
+        output_layers = [layer_names[i - 1] for i in net.getUnconnectedOutLayers().flatten()]
+        return _YoloHandle(net, output_layers)
+
+    def _warmup(self, handle):
+        size = self.yolo_input_size
+        blob = np.zeros((1, 3, size, size), dtype=np.float32)
+        handle.net.setInput(blob)
+        handle.net.forward(handle.output_layers)
+
+    def yolo(self):
+        """
+        Çağıran thread'in YOLO ağı (_YoloHandle); yüklenemiyorsa None.
+        İlk çağrı dosyaları okur ve ısınmış ağı alır, sonraki thread'ler
+        bellekteki tampondan kurar.
+        """
+        handle = getattr(self._local, "yolo", None)
+        if handle is not None:
+            return handle
+        if not self._load_yolo_buffers():
+            return None
+        with self._lock:
+            handle, self._spare_yolo = self._spare_yolo, None
+        if handle is None:
+            cfg, weights = self._yolo_buffers
+            handle = self._build_yolo(cfg, weights)
+            with self._lock:
+                self._stats["yolo"]["instances"] += 1
+        self._local.yolo = handle
+        return handle
+
+    # ---------- Genel ----------
+
+    def warmup(self, yolo=False):
+        """
+        HOG'u (ve istenirse YOLO'yu) önceden yükler; arka planda çağrılabilir.
+        YOLO ağı bu thread'e bağlanmaz, ilk kullanan thread'e kalır.
+        """
+        self.hog()
+        if yolo:
+            self._load_yolo_buffers()
+
+    def stats(self):
+        with self._lock:
+            stats = {name: dict(s) for name, s in self._stats.items()}
+        stats["yolo"]["available"] = self.yolo_available
+        return stats
+
+
+MODELS = ModelRegistry()
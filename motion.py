@@ -0,0 +1,131 @@
+import cv2
+import numpy as np
+
+
+def merge_regions(regions):
+    """Örtüşen (x, y, w, h) bölgeleri birleştirir; sonuç örtüşmez."""
+    rects = [list(r) for r in regions]
+    merged = True
+    while merged:
+        merged = False
+        out = []
+        while rects:
+            x, y, w, h = rects.pop()
+            i = 0
+            while i < len(rects):
+                ox, oy, ow, oh = rects[i]
+                if x < ox + ow and ox < x + w and y < oy + oh and oy < y + h:
+                    nx, ny = min(x, ox), min(y, oy)
+                    w = max(x + w, ox + ow) - nx
+                    h = max(y + h, oy + oh) - ny
+                    x, y = nx, ny
+                    rects.pop(i)
+                    merged = True
+                else:
+                    i += 1
+            out.append([x, y, w, h])
+        rects = out
+    return [tuple(r) for r in rects]
+
+
+class MotionGate:
+    """
+    Tespitten önce ucuz hareket kontrolü. Küçültülmüş gri kare üzerinde
+    MOG2 arka plan çıkarımı (ya da basit kare farkı) yapılır; değişen
+    piksel oranı eşik altındaysa sahne durağan kabul edilir ve tespit
+    atlanabilir.
+
+    check() ayrıca hareketli bölgelerin tam çözünürlükteki kutularını
+    döner; HOG penceresi sığsın diye bölgeler min_region boyutuna
+    genişletilir ve örtüşenler birleştirilir.
+    """
+    def __init__(self, method="mog2", width=320, threshold=0.002,
+                 padding=0.25, min_region=(128, 256), history=500):
+        if method not in ("mog2", "diff"):
+            raise ValueError(f"Geçersiz hareket yöntemi: {method}")
+        self.method = method
+        self.width = width
+        self.threshold = threshold
+        self.padding = padding
+        self.min_region = min_region
+
+        self._subtractor = None
+        if method == "mog2":
+            self._subtractor = cv2.createBackgroundSubtractorMOG2(
+                history=history, varThreshold=16, detectShadows=False
+            )
+        self._prev = None
+        self._kernel = np.ones((3, 3), np.uint8)
+
+        self.checked = 0
+        self.moving = 0
+        self.skipped = 0
+        self.last_ratio = 0.0
+
+    def _mask(self, frame_bgr):
+        h, w = frame_bgr.shape[:2]
+        scale = min(1.0, self.width / w)
+        small = cv2.resize(
+            frame_bgr, (max(1, int(w * scale)), max(1, int(h * scale))),
+            interpolation=cv2.INTER_AREA,
+        )
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+
+        if self._subtractor is not None:
+            mask = self._subtractor.apply(gray)
+        else:
+            if self._prev is None or self._prev.shape != gray.shape:
+                self._prev = gray
+                return None, scale
+            diff = cv2.absdiff(gray, self._prev)
+            self._prev = gray
+            _, mask = cv2.threshold(diff, 25, 255, cv2.THRESH_BINARY)
+        return mask, scale
+
+    def check(self, frame_bgr):
+        """
+        Dönüş: (moving, regions)
+          - moving: eşik üstünde değişim var mı
+          - regions: hareketli bölgeler [(x, y, w, h), ...] tam çözünürlükte
+        """
+        self.checked += 1
+        mask, scale = self._mask(frame_bgr)
+        if mask is None:
+            # İlk kare: referans yok, tespit yapılsın
+            self.moving += 1
+            return True, []
+
+        ratio = cv2.countNonZero(mask) / float(mask.size)
+        self.last_ratio = ratio
+        if ratio < self.threshold:
+            self.skipped += 1
+            return False, []
+        self.moving += 1
+
+        mask = cv2.dilate(mask, self._kernel, iterations=2)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        fh, fw = frame_bgr.shape[:2]
+        min_w, min_h = self.min_region
+        regions = []
+        for c in contours:
+            x, y, w, h = cv2.boundingRect(c)
+            x, y, w, h = x / scale, y / scale, w / scale, h / scale
+            cx, cy = x + w / 2, y + h / 2
+            w = max(w * (1 + 2 * self.padding), min_w)
+            h = max(h * (1 + 2 * self.padding), min_h)
+            x0 = int(max(0, min(cx - w / 2, fw - w)))
+            y0 = int(max(0, min(cy - h / 2, fh - h)))
+            regions.append((x0, y0, int(min(w, fw - x0)), int(min(h, fh - y0))))
+        return True, merge_regions(regions)
+
+    def stats(self):
+        return {
+            "method": self.method,
+            "checked": self.checked,
+            "motion_frames": self.moving,
+            "skipped_frames": self.skipped,
+            "skip_ratio": round(self.skipped / self.checked, 3) if self.checked else 0.0,
+            "last_motion_ratio": round(self.last_ratio, 5),
+        }
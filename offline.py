@@ -0,0 +1,373 @@
+"""
+Kayıtlı video dosyalarını gerçek zamandan hızlı analiz eden offline mod.
+
+Video kare aralıklarına (chunk) bölünür, her chunk bir süreç havuzunda
+ObjectDetector ile işlenir. Sonuçlar (kare bazında sayaçlar ve kutular)
+kare sırasıyla SQLite'a ya da CSV'ye yazılır: önce biten chunk, öncekiler
+bitene kadar bellekte bekler. Yarım kalan bir çalıştırma aynı komutla
+devam ettirilebilir: tamamlanan chunk'lar atlanır.
+
+Kullanım:
+  python offline.py videos/people.mp4 --out results.db --workers 8
+  python offline.py videos/traffic.mp4 --out traffic.csv --vehicles
+"""
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+# Worker süreç başına bir kez kurulur
+_worker_detector = None
+_worker_batcher = None
+
+
+def _init_worker(batch_size):
+    global _worker_detector, _worker_batcher
+    from batching import BatchInferenceService
+    from detection import ObjectDetector
+
+    # Her süreç tek çekirdek kullansın; paralellik süreç sayısından gelir
+    cv2.setNumThreads(1)
+    _worker_detector = ObjectDetector()
+    _worker_batcher = BatchInferenceService(
+        detector=_worker_detector.car_detector,
+        max_batch=batch_size,
+    )
+
+
+def _seek(cap, video_path, frame_idx):
+    """
+    Kaynağı frame_idx. kareye konumlar; dönüş: (cap, konum). Sonraki
+    read() frame_idx. kareyi verir.
+
+    CAP_PROP_POS_FRAMES araması yaklaşıktır (ör. önceki anahtar kareye
+    düşebilir); bu yüzden konum doğrulanır. Hedefin gerisindeysek oradan
+    grab() ile ileri decode edilir, konum bilinmiyor ya da ilerideyse
+    dosya baştan açılıp ilerlenir. Chunk sınırlarında kare atlanmaz ve
+    tekrarlanmaz.
+    """
+    if frame_idx <= 0:
+        return cap, 0
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+    pos = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    if pos == frame_idx:
+        return cap, pos
+    if not 0 <= pos < frame_idx:
+        cap.release()
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise RuntimeError(f"Video kaynağı açılamadı: {video_path}")
+        pos = 0
+    while pos < frame_idx and cap.grab():
+        pos += 1
+    return cap, pos
+
+
+def _process_chunk(video_path, start, end, detect_people, detect_vehicles, batch_size):
+    """
+    [start, end) karelerini işler.
+    Dönüş: (start, end, [(frame_idx, person, vehicle, boxes), ...])
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Video kaynağı açılamadı: {video_path}")
+
+    results = []
+    idx = start
+    try:
+        cap, pos = _seek(cap, video_path, start)
+        if pos != start:
+            # Dosya beklenenden kısa
+            return start, end, results
+        while idx < end:
+            frames = []
+            while idx + len(frames) < end and len(frames) < batch_size:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                frames.append(frame)
+            if not frames:
+                break
+
+            if detect_vehicles:
+                vehicle_results = _worker_batcher.infer_many(frames)
+            else:
+                vehicle_results = [([], 0)] * len(frames)
+
+            for frame, (v_boxes, v_cnt) in zip(frames, vehicle_results):
+                boxes = []
+                p_cnt = 0
+                if detect_people:
+                    p_boxes, _ = _worker_detector.detect(
+                        frame, detect_people=True, detect_vehicles=False
+                    )
+                    boxes.extend(p_boxes)
+                    p_cnt = len(p_boxes)
+                boxes.extend((x, y, w, h, "vehicle") for (x, y, w, h) in v_boxes)
+                results.append((idx, p_cnt, v_cnt, boxes))
+                idx += 1
+
+            if len(frames) < batch_size and idx < end:
+                # Dosya beklenenden erken bitti
+                break
+    finally:
+        cap.release()
+    return start, end, results
+
+
+def source_key(video_path, options):
+    """Dosya kimliği (yol, boyut, mtime) + ayarlar -> çalıştırma anahtarı."""
+    st = os.stat(video_path)
+    ident = json.dumps(
+        [os.path.abspath(video_path), st.st_size, int(st.st_mtime), options],
+        sort_keys=True,
+    )
+    return hashlib.sha1(ident.encode("utf-8")).hexdigest()[:16]
+
+
+class SqliteSink:
+    """Sonuçları SQLite'a yazar; tamamlanan chunk'lar aynı transaction'da işaretlenir."""
+
+    def __init__(self, path, run_key, meta):
+        self.run_key = run_key
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS offline_runs (
+                run_key TEXT PRIMARY KEY,
+                video_path TEXT NOT NULL,
+                meta TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS offline_chunks (
+                run_key TEXT NOT NULL,
+                chunk_start INTEGER NOT NULL,
+                chunk_end INTEGER NOT NULL,
+                PRIMARY KEY (run_key, chunk_start)
+            );
+            CREATE TABLE IF NOT EXISTS offline_frames (
+                run_key TEXT NOT NULL,
+                frame_idx INTEGER NOT NULL,
+                person_count INTEGER NOT NULL,
+                vehicle_count INTEGER NOT NULL,
+                boxes TEXT NOT NULL,
+                PRIMARY KEY (run_key, frame_idx)
+            ) WITHOUT ROWID;
+            """
+        )
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO offline_runs (run_key, video_path, meta) VALUES (?, ?, ?)",
+                (run_key, meta["video_path"], json.dumps(meta)),
+            )
+
+    def done_chunks(self):
+        cur = self.conn.execute(
+            "SELECT chunk_start FROM offline_chunks WHERE run_key = ?", (self.run_key,)
+        )
+        return {row[0] for row in cur.fetchall()}
+
+    def write_chunk(self, start, end, results):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO offline_frames "
+                "(run_key, frame_idx, person_count, vehicle_count, boxes) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (self.run_key, idx, p, v, json.dumps(boxes))
+                    for idx, p, v, boxes in results
+                ],
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO offline_chunks (run_key, chunk_start, chunk_end) VALUES (?, ?, ?)",
+                (self.run_key, start, end),
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+class CsvSink:
+    """
+    Sonuçları CSV'ye ekler. İlerleme yanındaki .progress.json dosyasında
+    tutulur; devam ederken CSV son tamamlanan chunk'ın sonuna kırpılır,
+    böylece yarım yazılmış satırlar tekrar etmez.
+    """
+    FIELDS = ["frame_idx", "person_count", "vehicle_count", "boxes"]
+
+    def __init__(self, path, run_key, meta):
+        self.path = path
+        self.progress_path = path + ".progress.json"
+        self.run_key = run_key
+        self.state = {"run_key": run_key, "meta": meta, "done": [], "offset": 0}
+
+        if os.path.exists(self.progress_path):
+            with open(self.progress_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("run_key") == run_key:
+                self.state = saved
+
+        resume = self.state["offset"] > 0 and os.path.exists(path)
+        self.f = open(path, "r+" if resume else "w", newline="", encoding="utf-8")
+        if resume:
+            self.f.truncate(self.state["offset"])
+            self.f.seek(self.state["offset"])
+        self.writer = csv.writer(self.f)
+        if not resume:
+            self.writer.writerow(self.FIELDS)
+            self._commit()
+
+    def _commit(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.state["offset"] = self.f.tell()
+        tmp = self.progress_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.progress_path)
+
+    def done_chunks(self):
+        return set(self.state["done"])
+
+    def write_chunk(self, start, end, results):
+        for idx, p, v, boxes in results:
+            self.writer.writerow([idx, p, v, json.dumps(boxes)])
+        self.state["done"].append(start)
+        self._commit()
+
+    def close(self):
+        self.f.close()
+
+
+def analyze_video(video_path, out_path, workers=None, chunk_size=500,
+                  detect_people=True, detect_vehicles=False, batch_size=8,
+                  progress=None):
+    """
+    Videoyu süreç havuzunda analiz eder, sonuçları out_path'e yazar
+    (.csv uzantısı CSV, diğerleri SQLite). Dönüş: özet dict.
+    progress(done_frames, total_frames, fps) her chunk sonrası çağrılır.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Video kaynağı açılamadı: {video_path}")
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if total <= 0:
+        raise RuntimeError(f"Kare sayısı okunamadı: {video_path}")
+
+    options = {
+        "chunk_size": chunk_size,
+        "detect_people": detect_people,
+        "detect_vehicles": detect_vehicles,
+    }
+    run_key = source_key(video_path, options)
+    meta = dict(options, video_path=os.path.abspath(video_path), total_frames=total)
+
+    sink_cls = CsvSink if out_path.lower().endswith(".csv") else SqliteSink
+    sink = sink_cls(out_path, run_key, meta)
+
+    chunks = [(s, min(s + chunk_size, total)) for s in range(0, total, chunk_size)]
+    done = sink.done_chunks()
+    pending = [c for c in chunks if c[0] not in done]
+    done_frames = sum(e - s for s, e in chunks if s in done)
+
+    workers = workers or os.cpu_count() or 1
+    processed = 0
+    t0 = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(batch_size,),
+        ) as pool:
+            futures = [
+                pool.submit(
+                    _process_chunk, video_path, s, e,
+                    detect_people, detect_vehicles, batch_size,
+                )
+                for s, e in pending
+            ]
+            # Biten chunk'lar sırası gelene kadar bekler; çıktı kare sırasında
+            ready = {}
+            next_chunk = 0
+            for fut in as_completed(futures):
+                start, end, results = fut.result()
+                ready[start] = (end, results)
+                while next_chunk < len(pending) and pending[next_chunk][0] in ready:
+                    start = pending[next_chunk][0]
+                    end, results = ready.pop(start)
+                    sink.write_chunk(start, end, results)
+                    next_chunk += 1
+                    processed += len(results)
+                    done_frames += end - start
+                if progress is not None:
+                    elapsed = time.perf_counter() - t0
+                    progress(done_frames, total, processed / elapsed if elapsed else 0.0)
+    finally:
+        sink.close()
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "run_key": run_key,
+        "total_frames": total,
+        "processed_frames": processed,
+        "skipped_chunks": len(chunks) - len(pending),
+        "elapsed_sec": round(elapsed, 2),
+        "fps": round(processed / elapsed, 2) if elapsed else 0.0,
+        "output": out_path,
+    }
+
+
+def _print_progress(done, total, fps):
+    pct = 100.0 * done / total if total else 100.0
+    remaining = (total - done) / fps if fps else 0.0
+    print(
+        f"\r{done}/{total} kare ({pct:5.1f}%)  {fps:7.1f} fps  kalan ~{remaining:6.0f} sn",
+        end="",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Video dosyasını offline (gerçek zamandan hızlı) analiz eder."
+    )
+    parser.add_argument("video", help="Video dosyası")
+    parser.add_argument("--out", default="offline_results.db",
+                        help="Çıktı dosyası (.csv ya da SQLite)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Süreç sayısı (varsayılan: çekirdek sayısı)")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=8,
+                        help="YOLO batch boyu (ardışık kareler)")
+    parser.add_argument("--no-people", action="store_true", help="İnsan tespiti yapma")
+    parser.add_argument("--vehicles", action="store_true", help="Araç tespiti yap")
+    args = parser.parse_args(argv)
+
+    summary = analyze_video(
+        args.video,
+        args.out,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        detect_people=not args.no_people,
+        detect_vehicles=args.vehicles,
+        batch_size=args.batch_size,
+        progress=_print_progress,
+    )
+    print(file=sys.stderr)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
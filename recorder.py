@@ -0,0 +1,383 @@
+"""
+Alarm tetikli klip kaydı.
+
+Her stream için son pre_roll saniyelik kareler bellekte bir halka
+tamponda tutulur: klip katmanı boyutuna küçültülmüş, ham (kodlanmamış)
+BGR kare + tespit metadatası. Bayt sınırı (buffer_bytes) tüm stream'lerin
+toplamıdır; aşılınca hangi stream'de olursa olsun en eski kare atılır. Bir tetik koşulu (ör. kişi
+>= 5) sağlanınca tampon + post_roll saniyelik devamı kutuları çizilip
+JPEG'e kodlanarak bir klip olur; klip diske arka plandaki yazıcı
+thread'i tarafından, saniyede en fazla write_rate bayt hızla yazılır ve
+SQLite'taki clips tablosuna işlenir.
+
+Tespit döngüsüne yükü: kare başına bir zaman karşılaştırması ve kuyruğa
+bloklamayan bir ekleme. Küçültme ayrı thread'dedir; çizim ve JPEG
+kodlama sadece klip kaydedilirken yapılır, alarm yokken kodlama maliyeti
+yoktur. Bedeli bellek: 480p'de kare ~1.2 MB (stream başına 5 sn x 10 fps
+~ 60 MB); sınır dolarsa pre-roll'lar kısalır.
+Klip biçimi ardışık JPEG'lerden oluşan ham MJPEG'tir (yeniden kodlama
+yok); ör. `ffplay -f mjpeg klip.mjpeg` ile oynatılır.
+"""
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import cv2
+
+from camera import JPEG_TIERS, draw_overlay, encode_jpeg
+from db import configure_connection, insert_clip
+from metrics import stage_timer
+
+_ENCODE_TIME = stage_timer("encode")
+
+DEFAULT_TRIGGERS = {"person": 5, "vehicle": 10}
+
+
+class _Clip:
+    def __init__(self, stream_id, trigger, start_ts, end_ts):
+        self.stream_id = stream_id
+        self.trigger = trigger
+        self.frames = []
+        self.bytes = 0
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.peak = {"person": 0, "vehicle": 0}
+
+    def add(self, ts, data, max_bytes):
+        if self.bytes + len(data) <= max_bytes:
+            self.frames.append((ts, data))
+            self.bytes += len(data)
+
+
+class _StreamBuffer:
+    """
+    Bir stream'in pre-roll tamponu ((zaman, küçültülmüş kare, meta)) ve
+    (varsa) kaydı süren klibi.
+    """
+    def __init__(self, stream_id, camera):
+        self.stream_id = stream_id
+        self.camera = camera
+        self.hub = camera.hub
+        self.frames = deque()
+        self.bytes = 0
+        self.clip = None
+        self.last_clip_end = 0.0
+        self.last_sample = 0.0
+        self.listener = None
+
+
+class ClipRecorder:
+    def __init__(self, clip_dir, db_path, triggers=None, pre_roll=5.0, post_roll=5.0,
+                 fps=10.0, tier="480p", buffer_bytes=128 * 1024 * 1024,
+                 clip_bytes=32 * 1024 * 1024, max_clip_seconds=60.0, cooldown=30.0,
+                 write_rate=8 * 1024 * 1024, max_pending=4):
+        self.clip_dir = clip_dir
+        self.db_path = db_path
+        self.triggers = dict(DEFAULT_TRIGGERS if triggers is None else triggers)
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.sample_interval = 1.0 / fps if fps else 0.0
+        self.tier = tier
+        self.max_height, self.quality = JPEG_TIERS[tier]
+        self.buffer_bytes = buffer_bytes
+        self.clip_bytes = clip_bytes
+        self.max_clip_seconds = max_clip_seconds
+        self.cooldown = cooldown
+        self.write_rate = write_rate
+
+        self._buffers = {}
+        self._lock = threading.Lock()
+        # Kareler (stream tamponu, zaman, sayaçlar); doluysa kare atlanır
+        self._frames = queue.Queue(maxsize=256)
+        # Tamamlanan klipler; doluysa klip düşürülür
+        self._clips = queue.Queue(maxsize=max_pending)
+        self._stop_event = threading.Event()
+        self._sample_done = threading.Event()
+        self._threads = []
+        self._tokens = float(write_rate or 0)
+        self._last_refill = time.monotonic()
+
+        self.skipped_frames = 0
+        self.encoded_frames = 0
+        self.evicted_frames = 0
+        self.clips_started = 0
+        self.clips_written = 0
+        self.clips_dropped = 0
+        self.bytes_written = 0
+        self.errors = 0
+
+    # ---------- Yaşam döngüsü ----------
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop_event.clear()
+        self._sample_done.clear()
+        for target, name in ((self._sample_loop, "clip-sample"), (self._write_loop, "clip-writer")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=10.0):
+        """Süren klipleri kapatır, bekleyenleri (hız sınırı olmadan) yazar."""
+        with self._lock:
+            stream_ids = list(self._buffers)
+        for stream_id in stream_ids:
+            self.detach(stream_id)
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def attach(self, stream_id, camera):
+        """Stream'in hub'ını dinlemeye başlar (aynı id varsa eskisinin yerine)."""
+        self.detach(stream_id)
+        buf = _StreamBuffer(stream_id, camera)
+        buf.listener = lambda: self._on_publish(buf)
+        with self._lock:
+            self._buffers[stream_id] = buf
+        buf.hub.add_listener(buf.listener)
+
+    def detach(self, stream_id):
+        with self._lock:
+            buf = self._buffers.pop(stream_id, None)
+        if buf is None:
+            return
+        buf.hub.remove_listener(buf.listener)
+        # Süren klip eldeki karelerle kapatılır
+        try:
+            self._frames.put((buf, None, None), timeout=1.0)
+        except queue.Full:
+            pass
+
+    # ---------- Kare toplama ----------
+
+    def _on_publish(self, buf):
+        """Yayın thread'inde çalışır: sadece örnekleme ve kuyruğa ekleme."""
+        now = time.time()
+        if now - buf.last_sample < self.sample_interval or buf.hub.closed:
+            return
+        buf.last_sample = now
+        counts = {"person": buf.camera.person_count, "vehicle": buf.camera.vehicle_count}
+        try:
+            self._frames.put_nowait((buf, now, counts))
+        except queue.Full:
+            self.skipped_frames += 1
+
+    def _sample_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                buf, ts, counts = self._frames.get(timeout=0.5)
+            except queue.Empty:
+                self._expire(time.time())
+                continue
+            if ts is None:
+                self._finish(buf, time.time())
+                self._release(buf)
+                continue
+            _, frame, meta = buf.hub.latest()
+            if frame is not None:
+                self._append(buf, ts, self._downscale(frame), meta, counts)
+
+        # Kapanış: kuyrukta kalan ayrılma işaretleri ve süren klipler
+        while True:
+            try:
+                buf, ts, _ = self._frames.get_nowait()
+            except queue.Empty:
+                break
+            if ts is None:
+                self._finish(buf, time.time())
+        with self._lock:
+            buffers = list(self._buffers.values())
+        for buf in buffers:
+            self._finish(buf, time.time())
+        self._sample_done.set()
+
+    def _downscale(self, frame):
+        """Kareyi klip katmanı yüksekliğine küçültür (hub'daki kare değişmez)."""
+        h, w = frame.shape[:2]
+        if self.max_height is None or h <= self.max_height:
+            return frame
+        scale = self.max_height / h
+        return cv2.resize(frame, (int(w * scale), self.max_height), interpolation=cv2.INTER_AREA)
+
+    def _encode(self, frame, meta):
+        """Klip karesi: kutular / bölgeler çizilmiş JPEG (sadece kayıt sırasında)."""
+        if meta is not None:
+            frame = draw_overlay(frame.copy(), meta)
+        t0 = time.perf_counter()
+        data = encode_jpeg(frame, None, self.quality)
+        _ENCODE_TIME.observe(time.perf_counter() - t0)
+        self.encoded_frames += 1
+        return data
+
+    def _release(self, buf):
+        # Ayrılan stream'in tamponu ortak bütçeden düşer
+        buf.frames.clear()
+        buf.bytes = 0
+
+    def _evict(self, buf):
+        """
+        Ortak bayt bütçesi: tüm tamponların toplamı buffer_bytes'ı aşarsa
+        en eski kare (hangi stream'de olursa) atılır. Yeni eklenen kare
+        tutulur. Tamponlar sadece bu thread'de değişir.
+        """
+        with self._lock:
+            buffers = list(self._buffers.values())
+        if buf not in buffers:
+            buffers.append(buf)
+        total = sum(b.bytes for b in buffers)
+        while total > self.buffer_bytes:
+            candidates = [b for b in buffers if len(b.frames) > (1 if b is buf else 0)]
+            if not candidates:
+                break
+            victim = min(candidates, key=lambda b: b.frames[0][0])
+            _, old, _ = victim.frames.popleft()
+            victim.bytes -= old.nbytes
+            total -= old.nbytes
+            self.evicted_frames += 1
+
+    def _append(self, buf, ts, frame, meta, counts):
+        buf.frames.append((ts, frame, meta))
+        buf.bytes += frame.nbytes
+        while buf.frames and ts - buf.frames[0][0] > self.pre_roll:
+            _, old, _ = buf.frames.popleft()
+            buf.bytes -= old.nbytes
+        self._evict(buf)
+
+        fired = [name for name, limit in self.triggers.items() if counts.get(name, 0) >= limit]
+        clip = buf.clip
+        if clip is None:
+            if not fired or ts - buf.last_clip_end < self.cooldown:
+                return
+            # Tetik: pre-roll (bu kare dahil) şimdi kodlanır
+            clip = buf.clip = _Clip(buf.stream_id, fired[0], buf.frames[0][0], ts + self.post_roll)
+            for frame_ts, pre_frame, pre_meta in buf.frames:
+                data = self._encode(pre_frame, pre_meta)
+                if data is not None:
+                    clip.add(frame_ts, data, self.clip_bytes)
+            self.clips_started += 1
+        else:
+            data = self._encode(frame, meta)
+            if data is not None:
+                clip.add(ts, data, self.clip_bytes)
+            if fired:
+                # Koşul sürdükçe kayıt uzar (en fazla max_clip_seconds)
+                clip.end_ts = max(clip.end_ts, ts + self.post_roll)
+            clip.end_ts = min(clip.end_ts, clip.start_ts + self.max_clip_seconds)
+
+        for label in clip.peak:
+            clip.peak[label] = max(clip.peak[label], counts.get(label, 0))
+        if ts >= clip.end_ts:
+            self._finish(buf, ts)
+
+    def _expire(self, now):
+        # Kare gelmeyen (durmuş) stream'lerde süresi dolan klipler
+        with self._lock:
+            buffers = list(self._buffers.values())
+        for buf in buffers:
+            if buf.clip is not None and now >= buf.clip.end_ts + 1.0:
+                self._finish(buf, now)
+
+    def _finish(self, buf, now):
+        clip = buf.clip
+        if clip is None:
+            return
+        buf.clip = None
+        buf.last_clip_end = now
+        if not clip.frames:
+            return
+        try:
+            self._clips.put_nowait(clip)
+        except queue.Full:
+            self.clips_dropped += 1
+
+    # ---------- Disk ----------
+
+    def _throttle(self, nbytes):
+        if not self.write_rate or self._stop_event.is_set():
+            return
+        now = time.monotonic()
+        self._tokens = min(
+            float(self.write_rate),
+            self._tokens + (now - self._last_refill) * self.write_rate,
+        )
+        self._last_refill = now
+        self._tokens -= nbytes
+        if self._tokens < 0:
+            self._stop_event.wait(-self._tokens / self.write_rate)
+
+    def _clip_path(self, clip):
+        stamp = datetime.utcfromtimestamp(clip.start_ts).strftime("%Y%m%d-%H%M%S-%f")[:-3]
+        trigger = re.sub(r"[^A-Za-z0-9_-]", "_", clip.trigger)
+        directory = os.path.join(self.clip_dir, clip.stream_id)
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"{stamp}_{trigger}.mjpeg")
+
+    def _write_clip(self, conn, clip):
+        path = self._clip_path(clip)
+        tmp = path + ".part"
+        try:
+            with open(tmp, "wb") as f:
+                for _, data in clip.frames:
+                    self._throttle(len(data))
+                    f.write(data)
+            os.replace(tmp, path)
+            insert_clip(
+                conn, clip.stream_id, clip.trigger, clip.start_ts, clip.frames[-1][0],
+                path, len(clip.frames), clip.bytes,
+                clip.peak["person"], clip.peak["vehicle"],
+            )
+            self.clips_written += 1
+            self.bytes_written += clip.bytes
+        except (OSError, sqlite3.Error) as e:
+            self.errors += 1
+            print("ClipRecorder error:", e)
+
+    def _write_loop(self):
+        conn = configure_connection(sqlite3.connect(self.db_path))
+        try:
+            while True:
+                try:
+                    clip = self._clips.get(timeout=0.5)
+                except queue.Empty:
+                    if self._sample_done.is_set():
+                        break
+                    continue
+                self._write_clip(conn, clip)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _buffer_stats(buf):
+        # Tampon başka thread'de değişir; anlık görüntü yeterli
+        try:
+            seconds = buf.frames[-1][0] - buf.frames[0][0]
+        except IndexError:
+            seconds = 0.0
+        return {"frames": len(buf.frames), "bytes": buf.bytes, "seconds": round(seconds, 2)}
+
+    def stats(self):
+        with self._lock:
+            buffers = list(self._buffers.values())
+        return {
+            "streams": len(buffers),
+            "buffered_bytes": sum(b.bytes for b in buffers),
+            "buffer_limit_bytes": self.buffer_bytes,
+            "buffers": {b.stream_id: self._buffer_stats(b) for b in buffers},
+            "evicted_frames": self.evicted_frames,
+            "recording": [b.stream_id for b in buffers if b.clip is not None],
+            "pending_clips": self._clips.qsize(),
+            "clips_started": self.clips_started,
+            "clips_written": self.clips_written,
+            "clips_dropped": self.clips_dropped,
+            "bytes_written": self.bytes_written,
+            "skipped_frames": self.skipped_frames,
+            "encoded_frames": self.encoded_frames,
+            "errors": self.errors,
+        }
@@ -0,0 +1,384 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from batching import BatchInferenceService
+from camera import VideoCamera
+from workers import ProcessCamera
+from zones import normalize_zones
+
+DEFAULT_STREAM_ID = "default"
+
+_STREAM_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def validate_stream_id(stream_id: str) -> str:
+    if not stream_id or not _STREAM_ID_RE.match(stream_id):
+        raise ValueError(
+            "Geçersiz stream id (harf, rakam, '_' ve '-' kullanılabilir, en fazla 64 karakter)."
+        )
+    return stream_id
+
+
+class DetectionPool:
+    """
+    Tüm stream'lerin tespit işleri için çekirdek sayısı kadar worker'lı havuz.
+    Havuz doluyken gelen iş en fazla max_wait kadar sırada (FIFO) bekler,
+    slot boşalmazsa reddedilir (load shedding): o kare için stream bir
+    önceki tespit sonucunu kullanır. Böylece talep CPU kapasitesini
+    aştığında bütün stream'ler birlikte yavaşlamaz, FIFO sıra da tek bir
+    stream'in havuzu sürekli kapmasını engeller.
+    """
+    def __init__(self, max_workers=None, max_wait=0.04, window_sec=1.0):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_wait = max_wait
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="detect",
+        )
+        self._slot_cond = threading.Condition()
+        self._free = self.max_workers
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+        # Toplam sayaçlar
+        self.submitted = 0
+        self.shed = 0
+
+        # Kayan pencere (son tamamlanan pencere raporlanır)
+        self._window_sec = window_sec
+        self._window_start = time.monotonic()
+        self._win = {"submitted": 0, "shed": 0, "busy": 0.0}
+        self._last = {"submitted": 0, "shed": 0, "busy": 0.0, "elapsed": window_sec}
+
+    def _roll(self, now):
+        # self._lock tutulurken çağrılmalı
+        elapsed = now - self._window_start
+        if elapsed >= self._window_sec:
+            self._last = dict(self._win, elapsed=elapsed)
+            self._win = {"submitted": 0, "shed": 0, "busy": 0.0}
+            self._window_start = now
+
+    def _acquire(self):
+        with self._slot_cond:
+            if self._free > 0 and not self._waiters:
+                self._free -= 1
+                return True
+
+            token = object()
+            self._waiters.append(token)
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while True:
+                    if self._free > 0 and self._waiters[0] is token:
+                        self._free -= 1
+                        return True
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._slot_cond.wait(remaining)
+            finally:
+                self._waiters.remove(token)
+                self._slot_cond.notify_all()
+
+    def _release(self):
+        with self._slot_cond:
+            self._free += 1
+            self._slot_cond.notify_all()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Slot bulunursa işi havuza verir ve Future döner.
+        Havuz doluysa None döner (kare için tespit atlanır).
+        """
+        if not self._acquire():
+            with self._lock:
+                self._roll(time.monotonic())
+                self.shed += 1
+                self._win["shed"] += 1
+            return None
+
+        with self._lock:
+            self._roll(time.monotonic())
+            self.submitted += 1
+            self._win["submitted"] += 1
+        try:
+            return self._executor.submit(self._run, fn, args, kwargs)
+        except RuntimeError:
+            # Havuz kapatıldıysa
+            self._release()
+            return None
+
+    def _run(self, fn, args, kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            busy = time.perf_counter() - t0
+            with self._lock:
+                self._win["busy"] += busy
+            self._release()
+
+    def stats(self):
+        with self._lock:
+            self._roll(time.monotonic())
+            last = dict(self._last)
+            submitted, shed = self.submitted, self.shed
+
+        elapsed = last["elapsed"] or self._window_sec
+        demand = last["submitted"] + last["shed"]
+        utilization = last["busy"] / (elapsed * self.max_workers)
+        shed_ratio = last["shed"] / demand if demand else 0.0
+        return {
+            "workers": self.max_workers,
+            "utilization": round(min(utilization, 1.0), 3),
+            "demand_per_sec": round(demand / elapsed, 2),
+            "shed_per_sec": round(last["shed"] / elapsed, 2),
+            "shed_ratio": round(shed_ratio, 3),
+            "overloaded": shed_ratio > 0.0,
+            "total_submitted": submitted,
+            "total_shed": shed,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def normalize_config(data: dict) -> dict:
+    """Form / JSON'dan gelen stream ayarlarını tek bir biçime getirir."""
+    def as_bool(v, default):
+        if v is None:
+            return default
+        if isinstance(v, bool):
+            return v
+        return str(v).lower() in ("1", "true", "on", "yes")
+
+    source_type = data.get("source_type", "video")
+    if source_type not in ("video", "camera"):
+        raise ValueError(f"Geçersiz kaynak tipi: {source_type}")
+
+    camera_index_raw = data.get("camera_index", 0)
+    try:
+        camera_index = int(camera_index_raw)
+    except (TypeError, ValueError):
+        raise ValueError(f"Geçersiz kamera index: {camera_index_raw}")
+
+    detect_interval_raw = data.get("detect_interval", 1)
+    try:
+        detect_interval = int(detect_interval_raw)
+    except (TypeError, ValueError):
+        raise ValueError(f"Geçersiz tespit aralığı: {detect_interval_raw}")
+    if detect_interval < 1:
+        raise ValueError("Tespit aralığı en az 1 olmalı.")
+
+    def as_number(key, cast, default, low, high, label):
+        raw = data.get(key)
+        if raw is None or raw == "":
+            return default
+        try:
+            value = cast(raw)
+        except (TypeError, ValueError):
+            raise ValueError(f"Geçersiz {label}: {raw}")
+        if not low <= value <= high:
+            raise ValueError(f"{label} {low} ile {high} arasında olmalı.")
+        return value
+
+    hog_tiles = as_number("hog_tiles", int, 1, 1, 16, "HOG şerit sayısı")
+    hog_overlap = as_number("hog_overlap", float, 0.25, 0.0, 0.9, "HOG şerit örtüşmesi")
+    hog_win_stride = as_number("hog_win_stride", int, 8, 8, 32, "HOG winStride")
+    if hog_win_stride % 8:
+        raise ValueError("HOG winStride 8'in katı olmalı.")
+    hog_scale = as_number("hog_scale", float, 1.05, 1.01, 1.5, "HOG ölçek adımı")
+    target_fps = as_number("target_fps", float, 0.0, 0.0, 120.0, "hedef FPS")
+
+    priority = data.get("priority") or "person"
+    if priority not in ("person", "vehicle"):
+        raise ValueError(f"Geçersiz öncelik: {priority}")
+
+    return {
+        "source_type": source_type,
+        "video_path": (str(data.get("video_path") or "").strip() or "people.mp4"),
+        "camera_index": camera_index,
+        "detect_people": as_bool(data.get("detect_people"), True),
+        "detect_vehicles": as_bool(data.get("detect_vehicles"), False),
+        "detect_interval": detect_interval,
+        "motion_gate": as_bool(data.get("motion_gate"), False),
+        "motion_regions": as_bool(data.get("motion_regions"), False),
+        "hog_tiles": hog_tiles,
+        "hog_overlap": hog_overlap,
+        "hog_win_stride": hog_win_stride,
+        "hog_scale": hog_scale,
+        "zones": normalize_zones(data.get("zones")),
+        "target_fps": target_fps,
+        "priority": priority,
+    }
+
+
+class StreamManager:
+    """
+    Stream id -> VideoCamera kaydı. Her stream'in kendi worker'ı vardır,
+    tespit işleri ortak DetectionPool üzerinden çalışır; YOLO istekleri
+    ortak BatchInferenceService'te toplu işlenir.
+    """
+    def __init__(self, pool=None, batcher=None, writer=None, cache=None,
+                 process_workers=False, recorder=None):
+        self.pool = pool or DetectionPool()
+        self.batcher = batcher or BatchInferenceService()
+        self.writer = writer
+        self.cache = cache
+        # ClipRecorder verilirse her stream'in hub'ı alarm klipleri için dinlenir
+        self.recorder = recorder
+        # True ise her stream ayrı bir worker sürecinde çalışır (workers.py)
+        self.process_workers = process_workers
+        self._streams = {}
+        self._configs = {}
+        self._lock = threading.Lock()
+
+    def _open(self, stream_id, config):
+        if config["source_type"] == "camera":
+            source = config["camera_index"]
+        else:
+            source = config["video_path"]
+        if self.process_workers:
+            camera = ProcessCamera(source=source, stream_id=stream_id, writer=self.writer)
+            camera.apply_config(config)
+            return camera
+        camera = VideoCamera(
+            source=source,
+            stream_id=stream_id,
+            pool=self.pool,
+            batcher=self.batcher,
+            writer=self.writer,
+            cache=self.cache,
+        )
+        camera.apply_config(config)
+        return camera
+
+    def add(self, stream_id, config):
+        """Stream ekler; aynı id varsa eskisini durdurup yenisiyle değiştirir."""
+        validate_stream_id(stream_id)
+        config = normalize_config(config)
+        camera = self._open(stream_id, config)
+        if self.recorder is not None:
+            self.recorder.attach(stream_id, camera)
+        camera.start()
+
+        with self._lock:
+            old = self._streams.get(stream_id)
+            self._streams[stream_id] = camera
+            self._configs[stream_id] = config
+        if old is not None:
+            old.stop()
+        return camera
+
+    def reconfigure(self, stream_id, changes):
+        """
+        Kaynak değişmediyse sadece tespit ayarlarını günceller (kamera
+        yeniden açılmaz); kaynak değiştiyse stream yeniden açılır.
+        """
+        with self._lock:
+            if stream_id not in self._streams:
+                raise KeyError(stream_id)
+            camera = self._streams[stream_id]
+            current = self._configs[stream_id]
+        config = normalize_config(dict(current, **changes))
+
+        same_source = (
+            config["source_type"] == current["source_type"]
+            and config["video_path"] == current["video_path"]
+            and config["camera_index"] == current["camera_index"]
+        )
+        if not same_source:
+            return self.add(stream_id, config)
+
+        camera.apply_config(config)
+        with self._lock:
+            self._configs[stream_id] = config
+        return camera
+
+    def remove(self, stream_id):
+        with self._lock:
+            camera = self._streams.pop(stream_id, None)
+            self._configs.pop(stream_id, None)
+        if camera is None:
+            raise KeyError(stream_id)
+        if self.recorder is not None:
+            self.recorder.detach(stream_id)
+        camera.stop()
+
+    def get(self, stream_id):
+        with self._lock:
+            return self._streams.get(stream_id)
+
+    def get_config(self, stream_id):
+        with self._lock:
+            config = self._configs.get(stream_id)
+            return dict(config) if config else None
+
+    def ids(self):
+        with self._lock:
+            return list(self._streams.keys())
+
+    def list(self):
+        with self._lock:
+            items = [
+                (sid, cam, dict(self._configs[sid]))
+                for sid, cam in self._streams.items()
+            ]
+        return [
+            {"id": sid, "config": cfg, "stats": cam.stats()}
+            for sid, cam, cfg in items
+        ]
+
+    def collect_metrics(self):
+        """Stream / havuz metrikleri (metrics.Registry collector formatında)."""
+        with self._lock:
+            cameras = list(self._streams.items())
+
+        frames, dropped, shed, fps, viewers, buffered, quality = [], [], [], [], [], [], []
+        for stream_id, camera in cameras:
+            labels = {"stream": stream_id}
+            stats = camera.stats()
+            reader = stats["reader"] or {"dropped": 0, "buffered": 0}
+            frames.append((labels, stats["frames"]))
+            dropped.append((dict(labels, reason="reader"), reader["dropped"]))
+            dropped.append((dict(labels, reason="shed"), stats["shed_frames"]))
+            fps.append((labels, stats["fps"]))
+            viewers.append((labels, stats["viewers"]))
+            buffered.append((dict(labels, queue="reader"), reader["buffered"]))
+            if stats.get("quality"):
+                quality.append((labels, stats["quality"]["level"]))
+
+        pool = self.pool.stats()
+        batching = self.batcher.stats() if self.batcher is not None else None
+        if batching is not None:
+            buffered.append(({"queue": "yolo_batch"}, batching["queue_depth"]))
+        shed.append(({}, pool["total_shed"]))
+
+        return [
+            ("video_frames_processed_total", "counter", "İşlenen kare sayısı.", frames),
+            ("video_frames_dropped_total", "counter",
+             "Düşürülen kareler (reader: en yeni kazanır, shed: tespit havuzu dolu).", dropped),
+            ("video_stream_fps", "gauge", "Stream başına işlenen kare hızı.", fps),
+            ("video_stream_viewers", "gauge", "Bağlı MJPEG izleyici sayısı.", viewers),
+            ("video_queue_depth", "gauge", "Kuyruk derinlikleri.", buffered),
+            ("video_quality_level", "gauge",
+             "Governor kalite seviyesi (0 = tam kalite).", quality),
+            ("detection_pool_utilization", "gauge", "Tespit havuzu doluluk oranı.",
+             [({}, pool["utilization"])]),
+            ("detection_pool_shed_total", "counter", "Havuz dolu olduğu için atlanan tespitler.", shed),
+            ("video_streams", "gauge", "Aktif stream sayısı.", [({}, len(cameras))]),
+        ]
+
+    def stop_all(self):
+        with self._lock:
+            cameras = list(self._streams.values())
+            self._streams.clear()
+            self._configs.clear()
+        for cam in cameras:
+            cam.stop()
+        self.batcher.stop()
+        self.pool.shutdown()
@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+DAY = 86400
+
+
+def _seed(path, base, span, step=5, streams=("a",)):
+    conn = sqlite3.connect(path)
+    db._migrate(conn)
+    rows = [
+        db._detection_row(stream_id, 1, 2, ts)
+        for ts in range(base, base + span, step)
+        for stream_id in streams
+    ]
+    with conn:
+        db._write_detections(conn, rows)
+    return conn, len(rows)
+
+
+def _export(conn, from_ts, to_ts):
+    segments = db.export_segments(from_ts, to_ts, db.export_coverage(conn))
+    rows = [
+        row
+        for chunk in db.iter_detection_chunks(conn, from_ts, to_ts, chunk_size=1000,
+                                              segments=segments)
+        for row in chunk
+    ]
+    return segments, rows
+
+
+def test_unpruned_history_is_exported_raw_without_double_counting(tmp_path):
+    # Kova sınırına denk gelmeyen başlangıç, budama yok, from=0
+    base = 1_700_000_000 - 1_700_000_000 % DAY + 3 * 3600 + 1234
+    conn, stored = _seed(str(tmp_path / "app.db"), base, 3 * DAY)
+    segments, rows = _export(conn, 0, base + 3 * DAY)
+    assert [layer for layer, _, _ in segments] == ["raw"]
+    assert sum(row[7] for row in rows) == stored
+    assert len(rows) == stored
+
+
+def test_pruned_history_falls_back_to_rollups_once(tmp_path):
+    base = 1_700_000_000 - 1_700_000_000 % DAY + 3 * 3600 + 1234
+    conn, stored = _seed(str(tmp_path / "app.db"), base, 3 * DAY, streams=("a", "b"))
+    with conn:
+        # Ham veri ve dakika özetleri farklı, kova sınırına denk gelmeyen anlarda budanır
+        conn.execute("DELETE FROM detections WHERE ts_epoch < ?", (base + 2 * DAY + 777,))
+        conn.execute(
+            "DELETE FROM detection_rollups WHERE bucket = 'minute' AND bucket_start < ?",
+            (base + DAY + 4321,),
+        )
+    segments, rows = _export(conn, 0, base + 3 * DAY)
+    assert [layer for layer, _, _ in segments] == ["hour", "minute", "raw"]
+    for (_, _, seg_to), (_, next_from, _) in zip(segments, segments[1:]):
+        assert seg_to == next_from
+    assert sum(row[7] for row in rows) == stored
+    assert [row[1] for row in rows] == sorted(row[1] for row in rows)
+
+
+def test_range_inside_raw_history_does_not_use_rollups(tmp_path):
+    base = 1_700_000_000 + 17
+    conn, stored = _seed(str(tmp_path / "app.db"), base, DAY)
+    segments, rows = _export(conn, base + 3600, base + 7200)
+    assert segments == [("raw", base + 3600, base + 7200)]
+    assert len(rows) == 3600 // 5
+
+
+def test_plan_export_defaults_to_data_start_without_warning(tmp_path):
+    import export
+
+    base = 1_700_000_000 + 17
+    conn, stored = _seed(str(tmp_path / "app.db"), base, DAY)
+    segments, info = export.plan_export(conn, None, base + DAY)
+    assert info["from"] == base and info["warnings"] == []
+    _, info = export.plan_export(conn, base - 3600, base + DAY)
+    assert info["warnings"] == ["no-data-before"]
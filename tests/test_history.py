@@ -0,0 +1,51 @@
+import os
+import sqlite3
+import sys
+
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+HOUR = 3600
+DAY = 86400
+
+
+def _app(tmp_path, rows):
+    conn = sqlite3.connect(str(tmp_path / "app.db"))
+    db._migrate(conn)
+    with conn:
+        db._write_detections(conn, rows)
+    conn.close()
+    app = Flask(__name__, instance_path=str(tmp_path))
+    app.teardown_appcontext(db.close_db)
+    return app
+
+
+def test_rollup_history_is_per_stream(tmp_path):
+    base = 1_700_000_000 - 1_700_000_000 % HOUR
+    rows = [db._detection_row("a", 1 + i % 3, 0, base + i * 10) for i in range(360)]
+    rows += [db._detection_row("b", 10, 5, base + i * 10) for i in range(360)]
+    with _app(tmp_path, rows).app_context():
+        result = db.query_history(base, base + HOUR, HOUR)
+    by_stream = {r["stream_id"]: r for r in result}
+    assert len(result) == 2
+    assert by_stream["a"]["samples"] == 360
+    assert (by_stream["a"]["person_min"], by_stream["a"]["person_max"]) == (1, 3)
+    assert by_stream["a"]["person_avg"] == 2.0
+    assert (by_stream["b"]["person_min"], by_stream["b"]["person_avg"]) == (10, 10.0)
+
+
+def test_auto_bucket_skips_layers_pruned_before_from():
+    now = 1_700_000_000 - 1_700_000_000 % DAY
+    week = (now - 7 * DAY, now)
+    starts = {"raw": now - DAY, "minute": now - 2 * DAY, "hour": now - 30 * DAY,
+              "day": now - 30 * DAY}
+    # 7 gün: dakika 500 noktayı aşar, saat katmanı aralığı kapsar
+    assert db.auto_bucket(*week, starts=starts) == HOUR
+    # 1 saat: dakika katmanı kapsıyor
+    assert db.auto_bucket(now - HOUR, now, starts=starts) == 60
+    # 3 gün önceki 1 saat: dakika budanmış, saat katmanına geçilir
+    assert db.auto_bucket(now - 3 * DAY, now - 3 * DAY + HOUR, starts=starts) == HOUR
+    assert db.auto_bucket(now - HOUR, now) == 60
@@ -0,0 +1,189 @@
+import cv2
+import numpy as np
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """
+    (x, y, w, h) kutu listeleri arasında IoU matrisi (N x M).
+    """
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+
+    ax1, ay1 = a[:, 0:1], a[:, 1:2]
+    ax2, ay2 = ax1 + a[:, 2:3], ay1 + a[:, 3:4]
+    bx1, by1 = b[:, 0], b[:, 1]
+    bx2, by2 = bx1 + b[:, 2], by1 + b[:, 3]
+
+    iw = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None)
+    ih = np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None)
+    inter = iw * ih
+    union = a[:, 2:3] * a[:, 3:4] + b[:, 2] * b[:, 3] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+class _Track:
+    __slots__ = ("track_id", "label", "box", "points")
+
+    def __init__(self, track_id, label, box, points):
+        self.track_id = track_id
+        self.label = label
+        self.box = box          # float [x, y, w, h], tam çözünürlük
+        self.points = points    # (K, 1, 2) float32, küçültülmüş gri karede
+
+
+class BoxTracker:
+    """
+    Tam tespit yapılmayan karelerde kutuları Lucas-Kanade optik akışı ile
+    taşır. Her tespit karesinde reset() çağrılır; yeni kutular eski
+    track'lerle IoU üzerinden eşleştirilir ki track id'leri korunsun.
+
+    track() dönen güven değeri, takip edilen noktaların başarıyla
+    izlenen oranıdır; eşik altına düşerse yeni tespit istenmelidir.
+    """
+    def __init__(self, max_width=480, iou_threshold=0.3,
+                 max_points_per_box=20, min_points=3):
+        self.max_width = max_width
+        self.iou_threshold = iou_threshold
+        self.max_points_per_box = max_points_per_box
+        self.min_points = min_points
+
+        self._tracks = []
+        self._prev_gray = None
+        self._scale = 1.0
+        self._next_id = 1
+
+    @property
+    def active(self):
+        return self._prev_gray is not None
+
+    def _prepare(self, frame_bgr):
+        h, w = frame_bgr.shape[:2]
+        gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+        if w > self.max_width:
+            self._scale = self.max_width / w
+            gray = cv2.resize(
+                gray, (self.max_width, int(h * self._scale)),
+                interpolation=cv2.INTER_AREA,
+            )
+        else:
+            self._scale = 1.0
+        return gray
+
+    def _features(self, gray, box):
+        s = self._scale
+        gh, gw = gray.shape[:2]
+        x0 = max(int(box[0] * s), 0)
+        y0 = max(int(box[1] * s), 0)
+        x1 = min(int((box[0] + box[2]) * s), gw)
+        y1 = min(int((box[1] + box[3]) * s), gh)
+        if x1 - x0 < 4 or y1 - y0 < 4:
+            return None
+
+        pts = cv2.goodFeaturesToTrack(
+            gray[y0:y1, x0:x1],
+            maxCorners=self.max_points_per_box,
+            qualityLevel=0.01,
+            minDistance=3,
+        )
+        if pts is None or len(pts) < self.min_points:
+            return None
+        pts[:, 0, 0] += x0
+        pts[:, 0, 1] += y0
+        return pts.astype(np.float32)
+
+    def reset(self, frame_bgr, boxes):
+        """Tam tespit sonrası track'leri yeni kutularla yeniler."""
+        gray = self._prepare(frame_bgr)
+
+        old = self._tracks
+        ious = iou_matrix([t.box for t in old], [b[:4] for b in boxes])
+        matched = {}
+        if ious.size:
+            # Greedy eşleştirme: en yüksek IoU'dan başla
+            for flat in np.argsort(ious, axis=None)[::-1]:
+                i, j = np.unravel_index(flat, ious.shape)
+                if ious[i, j] < self.iou_threshold:
+                    break
+                if i in matched.values() or j in matched:
+                    continue
+                if old[i].label != boxes[j][4]:
+                    continue
+                matched[j] = i
+
+        tracks = []
+        for j, (x, y, w, h, label) in enumerate(boxes):
+            box = [float(x), float(y), float(w), float(h)]
+            if j in matched:
+                track_id = old[matched[j]].track_id
+            else:
+                track_id = self._next_id
+                self._next_id += 1
+            tracks.append(_Track(track_id, label, box, self._features(gray, box)))
+
+        self._tracks = tracks
+        self._prev_gray = gray
+
+    def track(self, frame_bgr):
+        """
+        Kutuları bir sonraki kareye taşır.
+        Dönüş: (boxes [(x,y,w,h,label), ...], confidence 0..1)
+        """
+        gray = self._prepare(frame_bgr)
+        if self._prev_gray is None or self._prev_gray.shape != gray.shape:
+            self._prev_gray = gray
+            return self.boxes(), 0.0
+
+        with_pts = [t for t in self._tracks if t.points is not None]
+        confidence = 1.0
+        if with_pts:
+            all_pts = np.concatenate([t.points for t in with_pts])
+            owner = np.concatenate(
+                [np.full(len(t.points), k) for k, t in enumerate(with_pts)]
+            )
+            nxt, status, _ = cv2.calcOpticalFlowPyrLK(
+                self._prev_gray, gray, all_pts, None,
+                winSize=(15, 15), maxLevel=2,
+            )
+            ok = status.reshape(-1).astype(bool)
+
+            fractions = []
+            for k, t in enumerate(with_pts):
+                sel = owner == k
+                good = ok & sel
+                n_total = int(sel.sum())
+                n_good = int(good.sum())
+                fractions.append(n_good / n_total if n_total else 0.0)
+                if n_good < self.min_points:
+                    # Track kayboldu; kutu yerinde kalır, noktalar bırakılır
+                    t.points = None
+                    continue
+
+                old_p = all_pts[good].reshape(-1, 2)
+                new_p = nxt[good].reshape(-1, 2)
+                dx, dy = np.median(new_p - old_p, axis=0) / self._scale
+
+                # Ölçek değişimi: merkeze olan medyan uzaklık oranı
+                old_d = np.linalg.norm(old_p - old_p.mean(axis=0), axis=1)
+                new_d = np.linalg.norm(new_p - new_p.mean(axis=0), axis=1)
+                ratio = float(np.median(new_d) / max(np.median(old_d), 1e-3))
+                ratio = min(max(ratio, 0.8), 1.25)
+
+                x, y, w, h = t.box
+                cx, cy = x + w / 2 + dx, y + h / 2 + dy
+                w, h = w * ratio, h * ratio
+                t.box = [cx - w / 2, cy - h / 2, w, h]
+                t.points = new_p.reshape(-1, 1, 2)
+
+            confidence = float(np.mean(fractions))
+
+        self._prev_gray = gray
+        return self.boxes(), confidence
+
+    def boxes(self):
+        out = []
+        for t in self._tracks:
+            x, y, w, h = t.box
+            out.append((int(x), int(y), int(w), int(h), t.label))
+        return out
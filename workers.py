@@ -0,0 +1,407 @@
+"""
+Süreç modu (DETECTION_MODE=process): her stream'in decode + tespit +
+çizim işi ayrı bir worker sürecinde, mevcut VideoCamera ile çalışır.
+Web süreci sadece JPEG kodlama ve HTTP isteklerini yapar; Python
+tarafındaki tespit işleri GIL için istek işleme ile yarışmaz.
+
+İşlenmiş kareler multiprocessing.shared_memory üzerindeki bir halka
+tampondan (SharedFrameRing) geçer; pickle yoktur. Pipe üzerinden sadece
+küçük mesajlar gider: (kare no, sayaçlar) ve periyodik istatistikler.
+Worker'daki aşama süreleri (decode, hog_detect, ...) istatistiklerle
+birlikte artış olarak gönderilir ve web sürecinin /metrics
+histogramına eklenir.
+Worker çökerse web sürecindeki izleyici thread'i onu yeniden başlatır;
+FrameHub açık kaldığı için izleyiciler bağlı kalır.
+"""
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from camera import FrameHub, VideoCamera
+from metrics import STAGE_SECONDS, histogram_delta
+
+_HEADER_BYTES = 64   # slot başına int64 sıra sayacı (en fazla 8 slot)
+
+
+class SharedFrameRing:
+    """
+    slots adet sabit boyutlu BGR kare. Her slotun başındaki sayaç seqlock
+    gibi kullanılır: yazarken -1, yazma bitince kare numarası. Okuyucu
+    kopyadan önce ve sonra sayaca bakar; arada üzerine yazıldıysa kareyi
+    atar (en yeni kare kazanır, kilit yok).
+
+    Segmenti web süreci oluşturur ve siler; worker sadece bağlanır.
+    """
+    def __init__(self, shape, slots=4, name=None):
+        if not 1 <= slots <= _HEADER_BYTES // 8:
+            raise ValueError("slots 1 ile 8 arasında olmalı.")
+        self.shape = tuple(shape)
+        self.slots = slots
+        frame_bytes = int(np.prod(self.shape))
+        if name is None:
+            self.shm = shared_memory.SharedMemory(
+                create=True, size=_HEADER_BYTES + slots * frame_bytes
+            )
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self._seqs = np.ndarray((slots,), dtype=np.int64, buffer=self.shm.buf)
+        self._frames = np.ndarray(
+            (slots,) + self.shape, dtype=np.uint8,
+            buffer=self.shm.buf, offset=_HEADER_BYTES,
+        )
+        if name is None:
+            self._seqs[:] = 0
+
+    def write(self, seq, frame):
+        slot = seq % self.slots
+        self._seqs[slot] = -1
+        np.copyto(self._frames[slot], frame)
+        self._seqs[slot] = seq
+
+    def read(self, seq):
+        """seq numaralı karenin kopyası; bu arada üzerine yazıldıysa None."""
+        slot = seq % self.slots
+        if self._seqs[slot] != seq:
+            return None
+        frame = self._frames[slot].copy()
+        if self._seqs[slot] != seq:
+            return None
+        return frame
+
+    def close(self, unlink=False):
+        # numpy görünümleri bırakılmadan segment kapatılamaz
+        self._seqs = None
+        self._frames = None
+        self.shm.close()
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class _RingSink:
+    """
+    Worker sürecinde VideoCamera.hub yerine geçer: işlenen kare halkaya
+    yazılır, web sürecine kare numarası ve sayaçlar gönderilir.
+    """
+    def __init__(self, ring, conn, send_lock, camera, stats_interval=0.5):
+        self.ring = ring
+        self.conn = conn
+        self.send_lock = send_lock
+        self.camera = camera
+        self.stats_interval = stats_interval
+        self.encode_counts = {}
+        self.viewers = 0
+        self._seq = 0
+        self._last_stats = 0.0
+        self._stages_sent = {}
+
+    def _send(self, msg):
+        with self.send_lock:
+            self.conn.send(msg)
+
+    def publish(self, frame_bgr, meta=None):
+        cam = self.camera
+        if frame_bgr.shape != self.ring.shape:
+            h, w = self.ring.shape[:2]
+            frame_bgr = cv2.resize(frame_bgr, (w, h))
+        self._seq += 1
+        self.ring.write(self._seq, frame_bgr)
+        self._send(("frame", self._seq, cam.person_count, cam.vehicle_count, cam.zone_counts, meta))
+
+        now = time.monotonic()
+        if now - self._last_stats >= self.stats_interval:
+            self._last_stats = now
+            self._send_stats()
+
+    def _send_stats(self):
+        # Aşama histogramı bu süreçte kalır; son gönderimden beri artış gider
+        stages = STAGE_SECONDS.snapshot()
+        delta = histogram_delta(stages, self._stages_sent)
+        self._stages_sent = stages
+        self._send(("stats", self.camera.stats(), delta))
+
+    def close(self):
+        try:
+            self._send_stats()
+            self._send(("ended",))
+        except (OSError, ValueError):
+            pass
+
+
+def _worker_main(conn, source, stream_id):
+    """Worker süreci giriş noktası."""
+    send_lock = threading.Lock()
+    try:
+        camera = VideoCamera(source=source, stream_id=stream_id)
+    except RuntimeError as e:
+        conn.send(("error", str(e)))
+        return
+    # Halka boyutu ilk kareden: RTSP / webcam'de CAP_PROP_FRAME_WIDTH/HEIGHT
+    # 0 dönebilir (0x0 halka). Kare tamponda kalır, kaybolmaz.
+    frame = camera.reader.prime()
+    if frame is None or not frame.size:
+        camera.stop()
+        conn.send(("error", f"Kaynaktan kare alınamadı: {source}"))
+        return
+    conn.send(("ready", frame.shape))
+
+    ring = None
+    try:
+        while True:
+            try:
+                msg = conn.recv()
+            except (EOFError, OSError):
+                break   # web süreci gitti
+            kind = msg[0]
+            if kind == "ring":
+                ring = SharedFrameRing(msg[2], slots=msg[3], name=msg[1])
+                camera.hub = _RingSink(ring, conn, send_lock, camera)
+            elif kind == "config":
+                camera.apply_config(msg[1])
+            elif kind == "start" and ring is not None:
+                camera.start()
+            elif kind == "stop":
+                break
+    finally:
+        camera.stop()
+        if ring is not None:
+            ring.close()
+
+
+class ProcessCamera:
+    """
+    VideoCamera'nın süreç modundaki karşılığı; StreamManager ve route'lar
+    için aynı arayüzü (hub, start/stop, apply_config, stats, wait_stats)
+    sunar.
+    """
+    START_TIMEOUT = 30.0
+
+    def __init__(self, source=0, stream_id="default", writer=None,
+                 log_interval=5.0, slots=4):
+        self.source = source
+        self.stream_id = stream_id
+        self.writer = writer
+        self.log_interval = log_interval
+        self.slots = slots
+        self._ctx = multiprocessing.get_context("spawn")
+
+        self.config = None
+        self.hub = FrameHub()
+        self.person_count = 0
+        self.vehicle_count = 0
+        self.zone_counts = {}
+        self.last_meta = None
+        self.last_update = 0.0
+        self._last_log = 0.0
+        self._child_stats = {}
+        self.restarts = 0
+        self.torn_frames = 0
+
+        self.stats_version = 0
+        self._stats_cond = threading.Condition()
+
+        self._send_lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._started = False
+
+        self.ring = None
+        self.process = None
+        self.conn = None
+        self._spawn()
+
+    # ---------- Worker yönetimi ----------
+
+    def _spawn(self):
+        """Worker'ı başlatır, halkayı kurar. Kaynak açılamazsa RuntimeError."""
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.source, self.stream_id),
+            name=f"worker-{self.stream_id}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+
+        if not parent_conn.poll(self.START_TIMEOUT):
+            process.terminate()
+            raise RuntimeError(f"Worker başlatılamadı: {self.source}")
+        try:
+            msg = parent_conn.recv()
+        except EOFError:
+            raise RuntimeError(f"Worker başlatılırken sonlandı: {self.source}")
+        if msg[0] == "error":
+            process.join(timeout=5.0)
+            raise RuntimeError(msg[1])
+
+        shape = tuple(msg[1])
+        if self.ring is None or self.ring.shape != shape:
+            if self.ring is not None:
+                self.ring.close(unlink=True)
+            self.ring = SharedFrameRing(shape, slots=self.slots)
+
+        self.process = process
+        self.conn = parent_conn
+        self._send(("ring", self.ring.name, shape, self.slots))
+        if self.config is not None:
+            self._send(("config", self.config))
+
+    def _send(self, msg):
+        with self._send_lock:
+            self.conn.send(msg)
+
+    def _restart(self):
+        """Çöken worker'ı artan beklemeyle yeniden başlatır."""
+        delay = 1.0
+        self.conn.close()
+        while not self._stop_event.is_set():
+            if self.process is not None and self.process.is_alive():
+                self.process.terminate()
+            if self.process is not None:
+                self.process.join(timeout=5.0)
+            try:
+                self._spawn()
+                self._send(("start",))
+                self.restarts += 1
+                return True
+            except (RuntimeError, OSError) as e:
+                print(f"Worker {self.stream_id} yeniden başlatılamadı:", e)
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, 30.0)
+        return False
+
+    # ---------- VideoCamera arayüzü ----------
+
+    def apply_config(self, config):
+        self.config = dict(config)
+        self._send(("config", self.config))
+
+    def start(self):
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            if not self._started:
+                self._send(("start",))
+                self._started = True
+            self._thread = threading.Thread(
+                target=self._receive_loop,
+                name=f"worker-rx-{self.stream_id}",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        with self._thread_lock:
+            thread = self._thread
+            self._thread = None
+        try:
+            self._send(("stop",))
+        except (OSError, ValueError):
+            pass
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5.0)
+        if self.process is not None:
+            self.process.join(timeout=5.0)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(timeout=5.0)
+        self.conn.close()
+        if self.ring is not None:
+            self.ring.close(unlink=True)
+            self.ring = None
+        self.hub.close()
+        self._notify_stats()
+
+    def _receive_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                if not self.conn.poll(0.5):
+                    if not self.process.is_alive():
+                        raise EOFError
+                    continue
+                msg = self.conn.recv()
+            except (EOFError, OSError):
+                if self._stop_event.is_set() or not self._restart():
+                    break
+                continue
+
+            kind = msg[0]
+            if kind == "frame":
+                self._on_frame(*msg[1:])
+            elif kind == "stats":
+                self._child_stats = msg[1]
+                STAGE_SECONDS.merge(msg[2])
+            elif kind == "ended":
+                # Kaynak bitti (canlı kaynak koptu); worker kendiliğinden çıkar
+                break
+        self.hub.close()
+        self._notify_stats()
+
+    def _on_frame(self, seq, person_count, vehicle_count, zone_counts, meta):
+        # Sayaçlar yayından önce güncellenir; hub dinleyicileri (ör. klip
+        # kaydı) karenin kendi sayaçlarını görür
+        changed = (person_count, vehicle_count) != (self.person_count, self.vehicle_count)
+        self.person_count = person_count
+        self.vehicle_count = vehicle_count
+        self.zone_counts = zone_counts
+        self.last_meta = meta
+        self.last_update = time.time()
+
+        frame = self.ring.read(seq)
+        if frame is None:
+            self.torn_frames += 1
+        else:
+            # Halkadaki kare boyutu farklıysa kutular çizimde ölçeklenir
+            self.hub.publish(frame, meta)
+        if changed:
+            self._notify_stats()
+
+        if self.writer is not None and self.last_update - self._last_log >= self.log_interval:
+            self._last_log = self.last_update
+            self.writer.submit(self.stream_id, person_count, vehicle_count)
+
+    def _notify_stats(self):
+        with self._stats_cond:
+            self.stats_version += 1
+            self._stats_cond.notify_all()
+
+    def wait_stats(self, last_version, timeout=15.0):
+        with self._stats_cond:
+            self._stats_cond.wait_for(
+                lambda: self.stats_version != last_version, timeout
+            )
+            return self.stats_version
+
+    def stats(self):
+        stats = {
+            "frames": 0, "shed_frames": 0, "fps": 0.0, "reader": None,
+        }
+        stats.update(self._child_stats)
+        stats.update({
+            "stream_id": self.stream_id,
+            "person": self.person_count,
+            "vehicle": self.vehicle_count,
+            "zones": self.zone_counts,
+            "last_update": self.last_update,
+            "encodes": dict(self.hub.encode_counts),
+            "viewers": self.hub.viewers,
+            "worker": {
+                "pid": self.process.pid if self.process is not None else None,
+                "alive": self.process is not None and self.process.is_alive(),
+                "restarts": self.restarts,
+                "torn_frames": self.torn_frames,
+            },
+            "running": self._thread is not None and self._thread.is_alive(),
+        })
+        return stats
@@ -0,0 +1,132 @@
+"""
+Stream başına ilgi alanı (ROI) poligonları / sayım bölgeleri.
+
+Poligon köşeleri kare boyutuna oranla verilir (0..1), böylece aynı ayar
+farklı çözünürlüklerde ve JPEG katmanlarında geçerlidir:
+  [{"name": "kapi", "polygon": [[0.1, 0.2], [0.4, 0.2], [0.4, 0.9], [0.1, 0.9]]}]
+
+Tespit sadece poligonların (birleştirilmiş) dış kutularında çalışır;
+sonuçlar poligonlara göre süzülür ve bölge bazında sayılır. Bir kutunun
+bölgeye ait olup olmadığına alt-orta noktasına (ayak / tekerlek) bakılır.
+"""
+import cv2
+import numpy as np
+
+from detection import count_labels
+from motion import merge_regions
+
+MAX_ZONES = 16
+MAX_POINTS = 64
+
+
+def normalize_zones(raw):
+    """API / form'dan gelen bölge listesini doğrular: [{"name", "polygon"}]."""
+    if raw is None or raw == "":
+        return []
+    if not isinstance(raw, list):
+        raise ValueError("Bölgeler liste olmalı.")
+    if len(raw) > MAX_ZONES:
+        raise ValueError(f"En fazla {MAX_ZONES} bölge tanımlanabilir.")
+
+    zones = []
+    names = set()
+    for i, item in enumerate(raw):
+        if not isinstance(item, dict):
+            raise ValueError(f"Geçersiz bölge #{i + 1}.")
+        name = str(item.get("name") or f"zone{i + 1}").strip()
+        if name in names:
+            raise ValueError(f"Bölge adı tekrar ediyor: {name}")
+        names.add(name)
+
+        points = item.get("polygon")
+        if not isinstance(points, list) or not 3 <= len(points) <= MAX_POINTS:
+            raise ValueError(f"{name}: poligon 3 ile {MAX_POINTS} arası köşe içermeli.")
+        polygon = []
+        for p in points:
+            try:
+                x, y = float(p[0]), float(p[1])
+            except (TypeError, ValueError, IndexError, KeyError):
+                raise ValueError(f"{name}: geçersiz köşe {p!r}")
+            if not (0.0 <= x <= 1.0 and 0.0 <= y <= 1.0):
+                raise ValueError(f"{name}: köşeler 0..1 aralığında olmalı.")
+            polygon.append([x, y])
+        zones.append({"name": name, "polygon": polygon})
+    return zones
+
+
+class ZoneSet:
+    """
+    Bir kare boyutu için hazırlanmış bölgeler. Boyut değişince
+    (prepare) piksel poligonları ve ROI kutuları yeniden hesaplanır.
+    """
+    def __init__(self, zones, min_region=(64, 128)):
+        self.zones = zones
+        self.names = [z["name"] for z in zones]
+        self.min_region = min_region
+        self._size = None
+        self._polygons = []
+        self._points = []
+        self.regions = []
+
+    def prepare(self, width, height):
+        if self._size == (width, height):
+            return
+        scale = np.array([width, height], dtype=np.float32)
+        self._polygons = [
+            np.round(np.asarray(z["polygon"], dtype=np.float32) * scale).astype(np.int32)
+            for z in self.zones
+        ]
+        self._points = [
+            {"name": name, "points": poly.tolist()}
+            for name, poly in zip(self.names, self._polygons)
+        ]
+
+        boxes = []
+        min_w, min_h = self.min_region
+        for poly in self._polygons:
+            x, y, w, h = cv2.boundingRect(poly)
+            # HOG penceresi sığsın diye küçük bölgeler genişletilir
+            if w < min_w:
+                x, w = x - (min_w - w) // 2, min_w
+            if h < min_h:
+                y, h = y - (min_h - h) // 2, min_h
+            x0, y0 = max(0, x), max(0, y)
+            x1, y1 = min(width, x + w), min(height, y + h)
+            if x1 > x0 and y1 > y0:
+                boxes.append((x0, y0, x1 - x0, y1 - y0))
+        self.regions = merge_regions(boxes)
+        self._size = (width, height)
+
+    def clip_regions(self, regions):
+        """Verilen bölgelerin (ör. hareket) ROI kutularıyla kesişimleri."""
+        out = []
+        for (x, y, w, h) in regions:
+            for (rx, ry, rw, rh) in self.regions:
+                x0, y0 = max(x, rx), max(y, ry)
+                x1, y1 = min(x + w, rx + rw), min(y + h, ry + rh)
+                if x1 > x0 and y1 > y0:
+                    out.append((x0, y0, x1 - x0, y1 - y0))
+        return merge_regions(out)
+
+    def assign(self, boxes):
+        """
+        Poligonlardan birine düşen kutular ve bölge bazında sayaçlar.
+        Dönüş: (boxes, counts, zone_counts)
+        """
+        kept = []
+        zone_counts = {name: {"person": 0, "vehicle": 0} for name in self.names}
+        for box in boxes:
+            x, y, w, h, label = box
+            anchor = (float(x + w / 2.0), float(y + h))
+            inside = False
+            for name, poly in zip(self.names, self._polygons):
+                if cv2.pointPolygonTest(poly, anchor, False) >= 0:
+                    zone_counts[name][label] = zone_counts[name].get(label, 0) + 1
+                    inside = True
+            if inside:
+                kept.append(box)
+        return kept, count_labels(kept), zone_counts
+
+    def polygons(self):
+        """Piksel poligonları (metadata için): [{"name", "points"}]."""
+        return self._points